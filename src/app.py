@@ -3,24 +3,44 @@ import logging
 import os
 import uuid
 import re
-import ast
-import requests
 import asyncio
+import time
 from typing import Dict, Any, AsyncGenerator
 
 
 from backend.helpers.azure_credential_utils import get_azure_credential
 from backend.helpers.azure_credential_utils import get_azure_credential_async
-from quart import (Blueprint, Quart, jsonify, make_response, render_template,
-                   request, send_from_directory)
+from backend.helpers.azure_credential_utils import get_azure_access_token_async
+from quart import (Blueprint, Quart, abort, jsonify, make_response,
+                   render_template, request)
 
 from backend.auth.auth_utils import get_authenticated_user_details
-from backend.history.cosmosdbservice import CosmosConversationClient
+from backend.auth.group_resolver import group_resolver
+from backend.cache import (ConversationListCache, SectionContentCache,
+                           section_cache_key)
+from backend.title_generator import (TITLE_MODE_LLM, TITLE_MODE_LOCAL,
+                                     generate_local_title)
+from backend.citation_fetcher import CitationContentFetcher, CitationFetchError
+from backend.citations import (CITATION_MARKER_PATTERN, CitationMarkerParser,
+                               CitationSet, convert_citation_markers,
+                               parse_tool_output)
+from backend.history.client_manager import ConversationClientManager
+from backend.history.cosmosdbservice import (CosmosConversationClient,
+                                             start_request_memo)
+from backend.history.history_store import (decode_message_cursor,
+                                           encode_message_cursor,
+                                           is_stale_delete_job)
+from backend.history.memory_store import InMemoryHistoryStore
+from backend.history.sqlite_store import SQLiteHistoryStore
+from backend.static_files import PrecomputedResponse, StaticAssets
 from backend.settings import (
     MINIMUM_SUPPORTED_AZURE_OPENAI_PREVIEW_API_VERSION, app_settings)
-from backend.utils import (ChatType, format_as_ndjson,
-                           format_non_streaming_response,
-                           format_stream_response)
+from backend.utils import (STREAM_PROTOCOL_COMPACT, ChatType,
+                           CompactStreamFormatter, FastJSONProvider,
+                           dumps_json,
+                           format_as_ndjson, format_non_streaming_response,
+                           format_stream_response, get_stream_protocol,
+                           map_as_completed)
 from event_utils import track_event_if_configured
 from azure.monitor.opentelemetry import configure_azure_monitor
 from opentelemetry import trace
@@ -37,6 +57,7 @@ from azure.ai.agents.models import (
 from backend.api.agent.section_agent_factory import SectionAgentFactory
 from backend.api.agent.browse_agent_factory import BrowseAgentFactory
 from backend.api.agent.template_agent_factory import TemplateAgentFactory
+from backend.api.agent.thread_deletion_queue import thread_deletion_queue
 
 bp = Blueprint("routes", __name__, static_folder="static", template_folder="static")
 
@@ -67,10 +88,37 @@ logging.getLogger("azure.monitor.opentelemetry.exporter.export._base").setLevel(
 
 def create_app():
     app = Quart(__name__)
+    app.json = FastJSONProvider(app)
     app.register_blueprint(bp)
     app.config["TEMPLATES_AUTO_RELOAD"] = True
     app.config['PROVIDE_AUTOMATIC_OPTIONS'] = True
 
+    @app.before_serving
+    async def startup():
+        """
+        Warm up the shared per-worker clients before the app starts serving requests.
+        """
+        if app_settings.chat_history:
+            try:
+                await conversation_client_manager.start()
+            except Exception:
+                logging.exception("Error initializing CosmosDB client at startup")
+        try:
+            await get_index_page()
+        except Exception:
+            logging.exception("Error rendering index.html at startup")
+        try:
+            await static_assets.preload()
+        except Exception:
+            logging.exception("Error hashing the static assets at startup")
+
+    @app.before_request
+    async def start_request():
+        """
+        Give each request its own memo of the conversations it reads.
+        """
+        start_request_memo()
+
     @app.after_serving
     async def shutdown():
         """
@@ -83,6 +131,20 @@ def create_app():
             await TemplateAgentFactory.delete_agent()
             await SectionAgentFactory.delete_agent()
 
+            # Finish deleting the threads released by the agent thread pools
+            await thread_deletion_queue.drain()
+
+            # Close the shared CosmosDB and Azure OpenAI clients
+            await conversation_client_manager.close()
+            section_content_cache.close()
+            await citation_content_fetcher.close()
+            await group_resolver.close()
+            if conversation_list_cache is not None:
+                conversation_list_cache.close()
+            if getattr(app, "ai_foundry_client", None) is not None:
+                await app.ai_foundry_client.close()
+                app.ai_foundry_client = None
+
             # clear app state
             if hasattr(app, 'browse_agent') or hasattr(app, 'template_agent') or hasattr(app, 'section_agent'):
                 app.browse_agent = None
@@ -98,11 +160,32 @@ def create_app():
     return app
 
 
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+static_assets = StaticAssets(os.path.join(STATIC_DIR, "assets"))
+# index.html rendered with the UI settings, with the mtime of the template it was rendered from
+_index_page = {"mtime_ns": None, "response": None}
+
+
+async def get_index_page() -> PrecomputedResponse:
+    """
+    Return the rendered index.html.
+
+    The page only depends on the settings, so it is rendered once and only
+    rendered again when a frontend build replaces the template.
+    """
+    mtime_ns = os.stat(os.path.join(STATIC_DIR, "index.html")).st_mtime_ns
+    if _index_page["response"] is None or _index_page["mtime_ns"] != mtime_ns:
+        html = await render_template(
+            "index.html", title=app_settings.ui.title, favicon=app_settings.ui.favicon
+        )
+        _index_page["response"] = PrecomputedResponse(html.encode("utf-8"), "text/html")
+        _index_page["mtime_ns"] = mtime_ns
+    return _index_page["response"]
+
+
 @bp.route("/")
 async def index():
-    return await render_template(
-        "index.html", title=app_settings.ui.title, favicon=app_settings.ui.favicon
-    )
+    return (await get_index_page()).send(request.headers)
 
 
 @bp.route("/favicon.ico")
@@ -112,7 +195,10 @@ async def favicon():
 
 @bp.route("/assets/<path:path>")
 async def assets(path):
-    return await send_from_directory("static/assets", path)
+    response = await static_assets.send(path, request.headers)
+    if response is None:
+        abort(404)
+    return response
 
 
 # Debug settings
@@ -139,6 +225,9 @@ frontend_settings = {
     },
     "sanitize_answer": app_settings.base_settings.sanitize_answer,
 }
+frontend_settings_response = PrecomputedResponse(
+    dumps_json(frontend_settings).encode("utf-8"), "application/json"
+)
 
 
 # Enable Microsoft Defender for Cloud Integration
@@ -168,16 +257,18 @@ async def init_ai_foundry_client():
                 "AZURE_AI_AGENT_ENDPOINT is required"
             )
 
-        ai_project_client = AIProjectClient(
+        # The project client is only needed to build the Azure OpenAI client,
+        # which authenticates with the shared credential on its own
+        async with AIProjectClient(
             endpoint=app_settings.azure_ai.agent_endpoint,
             credential=await get_azure_credential_async(client_id=app_settings.base_settings.azure_client_id)
-        )
-        track_event_if_configured("AIFoundryAgentEndpointUsed", {
-            "endpoint": app_settings.azure_ai.agent_endpoint
-        })
-        ai_foundry_client = await ai_project_client.inference.get_azure_openai_client(
-            api_version=app_settings.azure_openai.preview_api_version,
-        )
+        ) as ai_project_client:
+            track_event_if_configured("AIFoundryAgentEndpointUsed", {
+                "endpoint": app_settings.azure_ai.agent_endpoint
+            })
+            ai_foundry_client = await ai_project_client.inference.get_azure_openai_client(
+                api_version=app_settings.azure_openai.preview_api_version,
+            )
         return ai_foundry_client
     except Exception as e:
         logging.exception("Exception in AI Foundry initialization", e)
@@ -185,6 +276,20 @@ async def init_ai_foundry_client():
         raise e
 
 
+ai_foundry_client_lock = asyncio.Lock()
+
+
+async def get_ai_foundry_client():
+    """
+    Return the Azure OpenAI client shared by this worker, creating it on first use.
+    """
+    if getattr(app, "ai_foundry_client", None) is None:
+        async with ai_foundry_client_lock:
+            if getattr(app, "ai_foundry_client", None) is None:
+                app.ai_foundry_client = await init_ai_foundry_client()
+    return app.ai_foundry_client
+
+
 def init_cosmosdb_client():
     cosmos_conversation_client = None
     if app_settings.chat_history:
@@ -204,6 +309,7 @@ def init_cosmosdb_client():
                 database_name=app_settings.chat_history.database,
                 container_name=app_settings.chat_history.conversations_container,
                 enable_message_feedback=app_settings.chat_history.enable_feedback,
+                conversation_list_cache=conversation_list_cache,
             )
         except Exception as e:
             logging.exception("Exception in CosmosDB initialization", e)
@@ -219,15 +325,87 @@ def init_cosmosdb_client():
     return cosmos_conversation_client
 
 
-# Conversion of citation markers
-def convert_citation_markers(text, doc_mapping):
-    def replace_marker(match):
-        key = match.group(1)
-        if key not in doc_mapping:
-            doc_mapping[key] = f"[{len(doc_mapping) + 1}]"
-        return doc_mapping[key]
+def init_history_store():
+    """
+    Build the chat history store selected by the CHAT_HISTORY_BACKEND setting.
+    """
+    if app_settings.chat_history and app_settings.chat_history.backend == "memory":
+        return InMemoryHistoryStore(enable_message_feedback=app_settings.chat_history.enable_feedback)
+    if app_settings.chat_history and app_settings.chat_history.backend == "sqlite":
+        return SQLiteHistoryStore(
+            app_settings.chat_history.sqlite_path,
+            enable_message_feedback=app_settings.chat_history.enable_feedback,
+        )
+    return init_cosmosdb_client()
+
+
+# Longest time a response waits for a conversation title generated in the background
+TITLE_WAIT_SECONDS = 10
+
+# Background tasks that outlive the request that started them
+background_tasks = set()
+
+
+def run_in_background(coro):
+    """
+    Run a coroutine in a task that is kept alive until it finishes.
+    """
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    task.add_done_callback(_log_background_task_error)
+    return task
+
+
+def _log_background_task_error(task):
+    # also marks the exception as retrieved when no request awaited the task
+    if not task.cancelled() and task.exception() is not None:
+        logging.error("Background task failed", exc_info=task.exception())
+
+
+# Long-lived chat history store client shared by all requests of this worker
+conversation_client_manager = ConversationClientManager(
+    init_history_store,
+    health_check_interval=(
+        app_settings.chat_history.health_check_interval_seconds
+        if app_settings.chat_history else 300
+    ),
+)
+
+# Generated section content shared by all requests of this worker
+section_content_cache = SectionContentCache(
+    max_size=app_settings.section_cache.max_entries,
+    ttl=app_settings.section_cache.ttl_seconds,
+    sqlite_path=app_settings.section_cache.sqlite_path,
+)
+
+
+async def get_search_access_token():
+    # Azure AD token for the search service, from the shared token cache
+    return await get_azure_access_token_async(
+        "https://search.azure.com/.default",
+        client_id=app_settings.base_settings.azure_client_id
+    )
+
+
+# Content of cited search documents shared by all requests of this worker
+citation_content_fetcher = CitationContentFetcher(
+    get_search_access_token,
+    max_size=app_settings.citation_content.cache_max_entries,
+    ttl=app_settings.citation_content.cache_ttl_seconds,
+    timeout=app_settings.citation_content.timeout_seconds,
+    connection_limit=app_settings.citation_content.connection_limit,
+)
 
-    return re.sub(r'【(\d+:\d+)†source】', replace_marker, text)
+# First page of each user's conversation list, kept across CosmosDB client reconnects
+conversation_list_cache = (
+    ConversationListCache(
+        max_size=app_settings.conversation_list_cache.max_entries,
+        ttl=app_settings.conversation_list_cache.ttl_seconds,
+        sqlite_path=app_settings.conversation_list_cache.sqlite_path,
+    )
+    if app_settings.conversation_list_cache.enabled else None
+)
 
 
 # Extract citations from run steps
@@ -240,7 +418,7 @@ async def extract_citations_from_run_steps(project_client, thread_id, run_id, an
                 if "azure_ai_search" in tool_call:
                     output_data = tool_call["azure_ai_search"].get("output")
                     if output_data:
-                        tool_output = ast.literal_eval(output_data) if isinstance(output_data, str) else output_data
+                        tool_output = parse_tool_output(output_data)
                         metadata = tool_output.get("metadata", {})
                         urls = metadata.get("get_urls", [])
                         titles = metadata.get("titles", [])
@@ -249,11 +427,7 @@ async def extract_citations_from_run_steps(project_client, thread_id, run_id, an
                             url = urls[i] if i < len(urls) else ""
 
                             if not streamed_titles or title in streamed_titles:
-                                existing = next((c for c in answer["citations"] if c["title"] == title), None)
-                                if existing:
-                                    existing["url"] = url
-                                else:
-                                    answer["citations"].append({"title": title, "url": url})
+                                answer["citations"].upsert(title, url)
 
 
 async def send_chat_request(request_body, request_headers) -> AsyncGenerator[Dict[str, Any], None]:
@@ -270,7 +444,7 @@ async def send_chat_request(request_body, request_headers) -> AsyncGenerator[Dic
     try:
         # Use AI Foundry SDK for response
         track_event_if_configured("Foundry_sdk_for_response", {"status": "success"})
-        answer: Dict[str, Any] = {"answer": "", "citations": []}
+        answer: Dict[str, Any] = {"answer": "", "citations": CitationSet()}
         run_id = None
         streamed_titles = set()
         doc_mapping = {}
@@ -285,23 +459,23 @@ async def send_chat_request(request_body, request_headers) -> AsyncGenerator[Dic
                 browse_agent_data = app.browse_agent
                 browse_project_client = browse_agent_data["client"]
                 browse_agent = browse_agent_data["agent"]
+                browse_thread_pool = browse_agent_data["thread_pool"]
 
-                thread = await browse_project_client.agents.threads.create()
-
-                for msg in request_body["messages"]:
-                    if not msg or "role" not in msg or "content" not in msg:
-                        continue
-                    if msg["role"] != "tool":
-                        await browse_project_client.agents.messages.create(
-                            thread_id=thread.id,
-                            role=msg["role"],
-                            content=msg["content"],
-                        )
+                thread, additional_messages, round_trips = await browse_thread_pool.acquire_seeded(
+                    request_body["messages"]
+                )
+                track_event_if_configured("FoundryRoundTrips", {
+                    "chat_type": "browse",
+                    "message_count": len(request_body["messages"]),
+                    "thread_setup_round_trips": round_trips
+                })
 
                 if app_settings.azure_openai.stream:
+                    citation_parser = CitationMarkerParser(doc_mapping)
                     async with await browse_project_client.agents.runs.stream(
                         thread_id=thread.id,
                         agent_id=browse_agent.id,
+                        additional_messages=additional_messages,
                         tool_choice={"type": "azure_ai_search"}
                     ) as stream:
                         async for event_type, event_data, _ in stream:
@@ -313,47 +487,51 @@ async def send_chat_request(request_body, request_headers) -> AsyncGenerator[Dic
                                     delta_text = event_data.delta.content[0].text
 
                                     if delta_text and delta_text.value:
-                                        answer["answer"] += delta_text.value
+                                        marker_count = citation_parser.marker_count
+                                        converted_text = citation_parser.feed(delta_text.value)
 
-                                        # check if citation markers are present
-                                        has_citation_markers = bool(re.search(r'【(\d+:\d+)†source】', delta_text.value))
-                                        if has_citation_markers:
+                                        # check if citation markers were converted in this delta
+                                        if citation_parser.marker_count > marker_count:
                                             yield {
-                                                "answer": convert_citation_markers(delta_text.value, doc_mapping),
-                                                "citations": json.dumps(answer["citations"])
+                                                "answer": converted_text,
+                                                "citations": answer["citations"]
                                             }
-                                        else:
+                                        elif converted_text:
                                             yield {
-                                                "answer": delta_text.value
+                                                "answer": converted_text
                                             }
 
                                     if delta_text and delta_text.annotations:
                                         for annotation in delta_text.annotations:
                                             if isinstance(annotation, MessageDeltaTextUrlCitationAnnotation):
                                                 citation = annotation.url_citation
-                                                if citation.url not in [c["url"] for c in answer["citations"]]:
-                                                    answer["citations"].append({
-                                                        "title": citation.title,
-                                                        "url": citation.url
-                                                    })
+                                                if answer["citations"].add(citation.title, citation.url):
                                                     streamed_titles.add(citation.title)  # Track titles seen in streaming
 
                     print(f"Streaming completed for thread: {thread.id}", flush=True)
 
+                    # Emit any text held back as a possible split citation marker
+                    remaining_text = citation_parser.flush()
+                    if remaining_text:
+                        yield {
+                            "answer": remaining_text
+                        }
+                    answer["answer"] = citation_parser.answer
+
                     # Post-processing citations from run_steps
                     if run_id:
                         await extract_citations_from_run_steps(browse_project_client, thread.id, run_id, answer, streamed_titles)
 
-                    has_final_citation_markers = bool(re.search(r'【(\d+:\d+)†source】', answer["answer"]))
-                    if has_final_citation_markers:
+                    if citation_parser.marker_count:
                         yield {
-                            "citations": json.dumps(answer["citations"])
+                            "citations": answer["citations"]
                         }
 
                 else:
                     run = await browse_project_client.agents.runs.create_and_process(
                         thread_id=thread.id,
                         agent_id=browse_agent.id,
+                        additional_messages=additional_messages,
                         tool_choice={"type": "azure_ai_search"}
                     )
                     if run.status == "failed":
@@ -366,12 +544,12 @@ async def send_chat_request(request_body, request_headers) -> AsyncGenerator[Dic
                                 answer["answer"] = msg.text_messages[-1].text.value
                                 break
 
-                        has_citation_markers = bool(re.search(r'【(\d+:\d+)†source】', answer["answer"]))
+                        has_citation_markers = bool(CITATION_MARKER_PATTERN.search(answer["answer"]))
 
                     if has_citation_markers:
                         yield {
                             "answer": convert_citation_markers(answer["answer"], doc_mapping),
-                            "citations": json.dumps(answer["citations"])
+                            "citations": answer["citations"]
                         }
                     else:
                         yield {
@@ -379,8 +557,8 @@ async def send_chat_request(request_body, request_headers) -> AsyncGenerator[Dic
                         }
             finally:
                 if thread:
-                    print(f"Deleting browse thread: {thread.id}", flush=True)
-                    await browse_project_client.agents.threads.delete(thread_id=thread.id)
+                    print(f"Releasing browse thread: {thread.id}", flush=True)
+                    browse_thread_pool.release(thread.id)
 
         # Generate Template
         else:
@@ -400,22 +578,21 @@ async def send_chat_request(request_body, request_headers) -> AsyncGenerator[Dic
                 template_agent_data = app.template_agent
                 template_project_client = template_agent_data["client"]
                 template_agent = template_agent_data["agent"]
+                template_thread_pool = template_agent_data["thread_pool"]
 
-                thread = await template_project_client.agents.threads.create()
-
-                for msg in request_body["messages"]:
-                    if not msg or "role" not in msg or "content" not in msg:
-                        continue
-                    if msg["role"] != "tool":
-                        await template_project_client.agents.messages.create(
-                            thread_id=thread.id,
-                            role=msg["role"],
-                            content=msg["content"],
-                        )
+                thread, additional_messages, round_trips = await template_thread_pool.acquire_seeded(
+                    request_body["messages"]
+                )
+                track_event_if_configured("FoundryRoundTrips", {
+                    "chat_type": "template",
+                    "message_count": len(request_body["messages"]),
+                    "thread_setup_round_trips": round_trips
+                })
 
                 run = await template_project_client.agents.runs.create_and_process(
                     thread_id=thread.id,
                     agent_id=template_agent.id,
+                    additional_messages=additional_messages,
                     tool_choice={"type": "azure_ai_search"}
                 )
                 if run.status == "failed":
@@ -430,13 +607,13 @@ async def send_chat_request(request_body, request_headers) -> AsyncGenerator[Dic
                             break
                 yield {
                     "answer": answer["answer"],
-                    "citations": json.dumps(answer["citations"])
+                    "citations": answer["citations"]
                 }
             finally:
                 # Clean up the thread after processing
                 if thread:
-                    print(f"Deleting template thread: {thread.id}", flush=True)
-                    await template_project_client.agents.threads.delete(thread_id=thread.id)
+                    print(f"Releasing template thread: {thread.id}", flush=True)
+                    template_thread_pool.release(thread.id)
 
     except Exception as e:
         logging.exception("Exception in send_chat_request")
@@ -448,32 +625,87 @@ async def send_chat_request(request_body, request_headers) -> AsyncGenerator[Dic
         raise e
 
 
-async def complete_chat_request(request_body, request_headers):
+async def wait_for_title(title_task):
+    """
+    Wait a bounded time for a conversation title being generated in the background.
+    """
+    if title_task is None:
+        return
+    try:
+        await asyncio.wait_for(asyncio.shield(title_task), timeout=TITLE_WAIT_SECONDS)
+    except asyncio.TimeoutError:
+        # the title is still saved and shows up in the next history list
+        track_event_if_configured("ConversationTitleNotReady", {"timeout": TITLE_WAIT_SECONDS})
+
+
+async def hold_last_chunk(chunks, title_task=None, persist_task=None):
+    """
+    Pass chunks through, holding back the latest one while background work is pending.
+
+    Every frame carries the history metadata, so releasing the last chunk only
+    once the title is ready (or the wait timed out) delivers the generated
+    title to the client without an extra frame. The last chunk also waits for
+    the user message to be saved, and a failed save is raised into the stream
+    instead of completing the answer.
+    """
+    held_chunk = None
+    async for chunk in chunks:
+        if persist_task is not None and persist_task.done():
+            persist_task.result()
+        if held_chunk is not None:
+            yield held_chunk
+            held_chunk = None
+        if any(task is not None and not task.done() for task in (title_task, persist_task)):
+            held_chunk = chunk
+        else:
+            yield chunk
+    if persist_task is not None:
+        await persist_task
+    await wait_for_title(title_task)
+    if held_chunk is not None:
+        yield held_chunk
+
+
+async def complete_chat_request(request_body, request_headers, title_task=None, persist_task=None):
     # response, apim_request_id = await send_chat_request(request_body, request_headers)
     response = None
     history_metadata = request_body.get("history_metadata", {})
 
-    async for chunk in send_chat_request(request_body, request_headers):
+    chunks = hold_last_chunk(send_chat_request(request_body, request_headers), title_task, persist_task)
+    async for chunk in chunks:
         response = chunk  # Only the last chunk matters for non-streaming
 
     return format_non_streaming_response(response, history_metadata)
 
 
-async def stream_chat_request(request_body, request_headers):
+async def stream_chat_request(request_body, request_headers, title_task=None, persist_task=None):
     track_event_if_configured("StreamChatRequestStart", {
         "has_history_metadata": "history_metadata" in request_body
     })
     # response, apim_request_id = await send_chat_request(request_body, request_headers)
     history_metadata = request_body.get("history_metadata", {})
+    stream_protocol = get_stream_protocol(request_body, request_headers)
+    track_event_if_configured("StreamProtocolSelected", {"stream_protocol": stream_protocol})
 
     async def generate():
-        async for chunk in send_chat_request(request_body, request_headers):
+        chunks = hold_last_chunk(send_chat_request(request_body, request_headers), title_task, persist_task)
+        async for chunk in chunks:
             yield format_stream_response(chunk, history_metadata)
 
+    async def generate_compact():
+        formatter = CompactStreamFormatter(history_metadata)
+        chunks = hold_last_chunk(send_chat_request(request_body, request_headers), title_task, persist_task)
+        async for chunk in chunks:
+            frame = formatter.format(chunk)
+            if frame is not None:
+                yield frame
+
+    if stream_protocol == STREAM_PROTOCOL_COMPACT:
+        return generate_compact()
     return generate()
 
 
-async def conversation_internal(request_body, request_headers):
+async def conversation_internal(request_body, request_headers, title_task=None, persist_task=None):
     try:
         chat_type = (
             ChatType.BROWSE
@@ -487,7 +719,7 @@ async def conversation_internal(request_body, request_headers):
             "streaming_enabled": app_settings.azure_openai.stream
         })
         if app_settings.azure_openai.stream and chat_type == ChatType.BROWSE:
-            result = await stream_chat_request(request_body, request_headers)
+            result = await stream_chat_request(request_body, request_headers, title_task, persist_task)
             response = await make_response(format_as_ndjson(result))
             response.timeout = None
             response.mimetype = "application/json-lines"
@@ -496,7 +728,7 @@ async def conversation_internal(request_body, request_headers):
             })
             return response
         else:
-            result = await complete_chat_request(request_body, request_headers)
+            result = await complete_chat_request(request_body, request_headers, title_task, persist_task)
             track_event_if_configured("ConversationCompleteResponsePrepared", {
                 "result": json.dumps(result)
             })
@@ -531,7 +763,7 @@ async def conversation():
 @bp.route("/frontend_settings", methods=["GET"])
 def get_frontend_settings():
     try:
-        return jsonify(frontend_settings), 200
+        return frontend_settings_response.send(request.headers)
     except Exception as e:
         logging.exception("Exception in /frontend_settings")
         span = trace.get_current_span()
@@ -556,57 +788,44 @@ async def add_conversation():
 
     try:
         # make sure cosmos is configured
-        cosmos_conversation_client = init_cosmosdb_client()
+        cosmos_conversation_client = await conversation_client_manager.get_client()
         if not cosmos_conversation_client:
             track_event_if_configured("CosmosNotConfigured", {"error": "CosmosDB is not configured"})
             raise Exception("CosmosDB is not configured or not working")
 
+        messages = request_json["messages"]
+        if not (len(messages) > 0 and messages[-1]["role"] == "user"):
+            track_event_if_configured("NoUserMessage", {"status_code": 400, "detail": "No user message found"})
+            raise Exception("No user message found")
+
         # check for the conversation_id, if the conversation is not set, we will create a new one
+        # with a local keyword title. Depending on the title mode the model generates the final
+        # title alongside the answer
         history_metadata = {}
+        title = None
+        title_task = None
         if not conversation_id:
-            title = await generate_title(request_json["messages"])
-            conversation_dict = await cosmos_conversation_client.create_conversation(
-                user_id=user_id, title=title
-            )
-            conversation_id = conversation_dict["id"]
+            conversation_id = str(uuid.uuid4())
+            title = generate_local_title(messages)
             history_metadata["title"] = title
-            history_metadata["date"] = conversation_dict["createdAt"]
 
-        # Format the incoming message object in the "chat/completions" messages format
-        # then write it to the conversation history in cosmos
-        messages = request_json["messages"]
-        if len(messages) > 0 and messages[-1]["role"] == "user":
-            createdMessageValue = await cosmos_conversation_client.create_message(
-                uuid=str(uuid.uuid4()),
-                conversation_id=conversation_id,
-                user_id=user_id,
-                input_message=messages[-1],
-            )
-
-            track_event_if_configured("MessageCreated", {
-                "conversation_id": conversation_id,
-                "message_id": json.dumps(messages[-1]),
-                "user_id": user_id
-            })
-            if createdMessageValue == "Conversation not found":
-                track_event_if_configured("ConversationNotFound", {"conversation_id": conversation_id})
-                raise Exception(
-                    "Conversation not found for the given conversation ID: "
-                    + conversation_id
-                    + "."
-                )
-        else:
-            track_event_if_configured("NoUserMessage", {"status_code": 400, "detail": "No user message found"})
-            raise Exception("No user message found")
-
-        await cosmos_conversation_client.cosmosdb_client.close()
+        # Write the conversation and the user message to cosmos while the agent answers
+        persist_task = run_in_background(persist_user_message(
+            cosmos_conversation_client, user_id, conversation_id, title, messages[-1], history_metadata
+        ))
+        if title is not None and app_settings.azure_openai.title_mode != TITLE_MODE_LOCAL:
+            upgrade_task = run_in_background(generate_conversation_title(
+                user_id, conversation_id, messages, history_metadata, persist_task
+            ))
+            # in local_then_llm mode the model title only shows up from the next history list
+            if app_settings.azure_openai.title_mode == TITLE_MODE_LLM:
+                title_task = upgrade_task
 
         # Submit request to Chat Completions for response
-        request_body = await request.get_json()
         history_metadata["conversation_id"] = conversation_id
-        request_body["history_metadata"] = history_metadata
+        request_json["history_metadata"] = history_metadata
         track_event_if_configured("ConversationHistoryGenerated", {"conversation_id": conversation_id})
-        return await conversation_internal(request_body, request.headers)
+        return await conversation_internal(request_json, request.headers, title_task, persist_task)
 
     except Exception as e:
         logging.exception("Exception in /history/generate")
@@ -631,7 +850,7 @@ async def update_conversation():
 
     try:
         # make sure cosmos is configured
-        cosmos_conversation_client = init_cosmosdb_client()
+        cosmos_conversation_client = await conversation_client_manager.get_client()
         if not cosmos_conversation_client:
             track_event_if_configured("CosmosNotConfigured", {"error": "CosmosDB is not configured"})
             raise Exception("CosmosDB is not configured or not working")
@@ -645,27 +864,21 @@ async def update_conversation():
         # then write it to the conversation history in cosmos
         messages = request_json["messages"]
         if len(messages) > 0 and messages[-1]["role"] == "assistant":
+            new_messages = []
             if len(messages) > 1 and messages[-2].get("role", None) == "tool":
-                # write the tool message first
-                await cosmos_conversation_client.create_message(
-                    uuid=str(uuid.uuid4()),
-                    conversation_id=conversation_id,
-                    user_id=user_id,
-                    input_message=messages[-2],
-                )
-            # write the assistant message
-            await cosmos_conversation_client.create_message(
-                uuid=messages[-1]["id"],
+                # the tool message goes first
+                new_messages.append((str(uuid.uuid4()), messages[-2]))
+            new_messages.append((messages[-1]["id"], messages[-1]))
+            await cosmos_conversation_client.create_messages(
                 conversation_id=conversation_id,
                 user_id=user_id,
-                input_message=messages[-1],
+                messages=new_messages,
             )
         else:
             track_event_if_configured("NoAssistantMessage", {"status_code": 400, "detail": "No bot message found"})
             raise Exception("No bot messages found")
 
         # Submit request to Chat Completions for response
-        await cosmos_conversation_client.cosmosdb_client.close()
         track_event_if_configured("ConversationHistoryUpdated", {"conversation_id": conversation_id})
         response = {"success": True}
         return jsonify(response), 200
@@ -683,7 +896,7 @@ async def update_conversation():
 async def update_message():
     authenticated_user = get_authenticated_user_details(request_headers=request.headers)
     user_id = authenticated_user["user_principal_id"]
-    cosmos_conversation_client = init_cosmosdb_client()
+    cosmos_conversation_client = await conversation_client_manager.get_client()
 
     # check request for message_id
     request_json = await request.get_json()
@@ -760,7 +973,7 @@ async def delete_conversation():
             return jsonify({"error": "conversation_id is required"}), 400
 
         # make sure cosmos is configured
-        cosmos_conversation_client = init_cosmosdb_client()
+        cosmos_conversation_client = await conversation_client_manager.get_client()
         if not cosmos_conversation_client:
             track_event_if_configured("CosmosDBNotConfigured", {
                 "user_id": user_id,
@@ -774,8 +987,6 @@ async def delete_conversation():
         # Now delete the conversation
         await cosmos_conversation_client.delete_conversation(user_id, conversation_id)
 
-        await cosmos_conversation_client.cosmosdb_client.close()
-
         track_event_if_configured("ConversationDeleted", {
             "user_id": user_id,
             "conversation_id": conversation_id,
@@ -802,12 +1013,18 @@ async def delete_conversation():
 
 @bp.route("/history/list", methods=["GET"])
 async def list_conversations():
-    offset = request.args.get("offset", 0)
+    cursor = request.args.get("cursor")
     authenticated_user = get_authenticated_user_details(request_headers=request.headers)
     user_id = authenticated_user["user_principal_id"]
 
+    # offset ends up in the query text, only a non-negative integer is accepted
+    offset = request.args.get("offset", "0")
+    if not offset.isdigit():
+        return jsonify({"error": "offset must be a non-negative integer"}), 400
+    offset = int(offset)
+
     # make sure cosmos is configured
-    cosmos_conversation_client = init_cosmosdb_client()
+    cosmos_conversation_client = await conversation_client_manager.get_client()
     if not cosmos_conversation_client:
         track_event_if_configured("CosmosDBNotConfigured", {
             "user_id": user_id,
@@ -815,9 +1032,24 @@ async def list_conversations():
         })
         raise Exception("CosmosDB is not configured or not working")
 
+    if cursor is not None:
+        # cursor paging, an empty cursor asks for the first page
+        try:
+            conversations, next_cursor = await cosmos_conversation_client.get_conversations_page(
+                user_id, limit=25, cursor=cursor
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        track_event_if_configured("ConversationsListed", {
+            "user_id": user_id,
+            "conversation_count": len(conversations),
+            "status": "success"
+        })
+        return jsonify({"conversations": conversations, "next_cursor": next_cursor}), 200
+
     # get the conversations from cosmos
     conversations = await cosmos_conversation_client.get_conversations(user_id, offset=offset, limit=25)
-    await cosmos_conversation_client.cosmosdb_client.close()
     if not isinstance(conversations, list):
         track_event_if_configured("NoConversationsFound", {
             "user_id": user_id,
@@ -851,7 +1083,7 @@ async def get_conversation():
         return jsonify({"error": "conversation_id is required"}), 400
 
     # make sure cosmos is configured
-    cosmos_conversation_client = init_cosmosdb_client()
+    cosmos_conversation_client = await conversation_client_manager.get_client()
     if not cosmos_conversation_client:
         track_event_if_configured("CosmosDBNotConfigured", {
             "user_id": user_id,
@@ -882,12 +1114,16 @@ async def get_conversation():
             404,
         )
 
-    # get the messages for the conversation from cosmos
-    conversation_messages = await cosmos_conversation_client.get_messages(
-        user_id, conversation_id
-    )
+    # optional paging, the newest "limit" messages before the "before" cursor of a previous page
+    limit = request_json.get("limit")
+    if limit is not None and (not isinstance(limit, int) or isinstance(limit, bool) or limit <= 0):
+        return jsonify({"error": "limit must be a positive integer"}), 400
+    try:
+        before = decode_message_cursor(request_json.get("before"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    # format the messages in the bot frontend format
+    # get the messages for the conversation from cosmos, one more than the limit to tell if there are older ones
     messages = [
         {
             "id": msg["id"],
@@ -896,8 +1132,13 @@ async def get_conversation():
             "createdAt": msg["createdAt"],
             "feedback": msg.get("feedback"),
         }
-        for msg in conversation_messages
+        async for msg in cosmos_conversation_client.get_messages(
+            user_id, conversation_id, limit=limit + 1 if limit else None, before=before
+        )
     ]
+    has_more = limit is not None and len(messages) > limit
+    if has_more:
+        messages = messages[1:]
 
     track_event_if_configured("ConversationRead", {
         "user_id": user_id,
@@ -905,8 +1146,11 @@ async def get_conversation():
         "message_count": len(messages),
         "status": "success"
     })
-    await cosmos_conversation_client.cosmosdb_client.close()
-    return jsonify({"conversation_id": conversation_id, "messages": messages}), 200
+    response = {"conversation_id": conversation_id, "messages": messages}
+    if limit is not None:
+        response["has_more"] = has_more
+        response["next_before"] = encode_message_cursor(messages[0]) if has_more else None
+    return jsonify(response), 200
 
 
 @bp.route("/history/rename", methods=["POST"])
@@ -927,7 +1171,7 @@ async def rename_conversation():
         return jsonify({"error": "conversation_id is required"}), 400
 
     # make sure cosmos is configured
-    cosmos_conversation_client = init_cosmosdb_client()
+    cosmos_conversation_client = await conversation_client_manager.get_client()
     if not cosmos_conversation_client:
         track_event_if_configured("CosmosDBNotConfigured", {
             "user_id": user_id,
@@ -971,7 +1215,6 @@ async def rename_conversation():
         conversation
     )
 
-    await cosmos_conversation_client.cosmosdb_client.close()
     track_event_if_configured("ConversationRenamed", {
         "user_id": user_id,
         "conversation_id": conversation_id,
@@ -989,7 +1232,7 @@ async def delete_all_conversations():
     # get conversations for user
     try:
         # make sure cosmos is configured
-        cosmos_conversation_client = init_cosmosdb_client()
+        cosmos_conversation_client = await conversation_client_manager.get_client()
         if not cosmos_conversation_client:
             track_event_if_configured("CosmosDBNotConfigured", {
                 "user_id": user_id,
@@ -997,31 +1240,54 @@ async def delete_all_conversations():
             })
             raise Exception("CosmosDB is not configured or not working")
 
-        conversations = await cosmos_conversation_client.get_conversations(
-            user_id, offset=0, limit=None
-        )
-        if not conversations:
+        conversation_ids = await cosmos_conversation_client.get_item_ids(user_id, "conversation")
+        if not conversation_ids:
             track_event_if_configured("NoConversationsToDelete", {
                 "user_id": user_id,
                 "status": "No conversations found"
             })
             return jsonify({"error": f"No conversations for {user_id} were found"}), 404
 
-        # delete each conversation
-        for conversation in conversations:
-            # delete the conversation messages from cosmos first
-            await cosmos_conversation_client.delete_messages(
-                conversation["id"], user_id
+        message_ids = await cosmos_conversation_client.get_item_ids(user_id, "message")
+        total_count = len(message_ids) + len(conversation_ids)
+        if total_count > app_settings.chat_history.delete_all_background_threshold:
+            # too large to delete within the request, hand it over to a background job
+            await cosmos_conversation_client.delete_finished_delete_jobs(user_id)
+            job = {
+                "id": str(uuid.uuid4()),
+                "status": "running",
+                "total_count": total_count,
+                "deleted_count": 0,
+            }
+            await cosmos_conversation_client.save_delete_job(user_id, job)
+            run_in_background(
+                run_delete_all_job(cosmos_conversation_client, user_id, job, message_ids, conversation_ids)
             )
-
-            # Now delete the conversation
-            await cosmos_conversation_client.delete_conversation(
-                user_id, conversation["id"]
+            track_event_if_configured("DeleteAllJobStarted", {
+                "user_id": user_id,
+                "job_id": job["id"],
+                "total_count": total_count
+            })
+            return (
+                jsonify(
+                    {
+                        "message": f"Deleting conversation and messages for user {user_id}",
+                        "job_id": job["id"],
+                        "status_url": f"/history/delete_all/status?job_id={job['id']}",
+                    }
+                ),
+                202,
             )
-        await cosmos_conversation_client.cosmosdb_client.close()
+
+        await cosmos_conversation_client.delete_user_history(
+            user_id,
+            concurrency=app_settings.chat_history.delete_concurrency,
+            message_ids=message_ids,
+            conversation_ids=conversation_ids,
+        )
         track_event_if_configured("AllConversationsDeleted", {
             "user_id": user_id,
-            "deleted_count": len(conversations)
+            "deleted_count": len(conversation_ids)
         })
         return (
             jsonify(
@@ -1041,6 +1307,91 @@ async def delete_all_conversations():
         return jsonify({"error": str(e)}), 500
 
 
+# Shortest time between two progress updates of a delete all job
+DELETE_JOB_PROGRESS_INTERVAL_SECONDS = 2
+
+
+async def run_delete_all_job(cosmos_conversation_client, user_id, job, message_ids, conversation_ids):
+    """
+    Delete the history of a user in the background and record the progress in the job.
+    """
+    last_saved = time.monotonic()
+
+    async def on_progress(count):
+        nonlocal last_saved
+        job["deleted_count"] += count
+        if time.monotonic() - last_saved >= DELETE_JOB_PROGRESS_INTERVAL_SECONDS:
+            last_saved = time.monotonic()
+            await cosmos_conversation_client.save_delete_job(user_id, job)
+
+    try:
+        job["deleted_count"] = await cosmos_conversation_client.delete_user_history(
+            user_id,
+            concurrency=app_settings.chat_history.delete_concurrency,
+            on_progress=on_progress,
+            message_ids=message_ids,
+            conversation_ids=conversation_ids,
+        )
+        job["status"] = "completed"
+        track_event_if_configured("AllConversationsDeleted", {
+            "user_id": user_id,
+            "job_id": job["id"],
+            "deleted_count": len(conversation_ids)
+        })
+    except Exception as e:
+        job["status"] = "failed"
+        job["error"] = str(e)
+        track_event_if_configured("DeleteAllJobFailed", {
+            "user_id": user_id,
+            "job_id": job["id"],
+            "error": str(e)
+        })
+        raise
+    finally:
+        await cosmos_conversation_client.save_delete_job(user_id, job)
+
+
+@bp.route("/history/delete_all/status", methods=["GET"])
+async def delete_all_status():
+    authenticated_user = get_authenticated_user_details(request_headers=request.headers)
+    user_id = authenticated_user["user_principal_id"]
+
+    job_id = request.args.get("job_id")
+    if not job_id:
+        return jsonify({"error": "job_id is required"}), 400
+
+    try:
+        # make sure cosmos is configured
+        cosmos_conversation_client = await conversation_client_manager.get_client()
+        if not cosmos_conversation_client:
+            raise Exception("CosmosDB is not configured or not working")
+
+        # jobs live in the partition of their user, so users only see their own jobs
+        job = await cosmos_conversation_client.get_delete_job(user_id, job_id)
+        if not job:
+            return jsonify({"error": f"Delete job {job_id} was not found"}), 404
+        if is_stale_delete_job(job):
+            # the process running the job stopped before finishing it
+            job["status"] = "failed"
+            job["error"] = "The delete job was interrupted, delete all conversations again to finish it"
+            await cosmos_conversation_client.save_delete_job(user_id, job)
+
+        return jsonify({
+            "job_id": job["id"],
+            "status": job["status"],
+            "total_count": job["total_count"],
+            "deleted_count": job["deleted_count"],
+            "error": job.get("error"),
+        }), 200
+    except Exception as e:
+        logging.exception("Exception in /history/delete_all/status")
+        span = trace.get_current_span()
+        if span is not None:
+            span.record_exception(e)
+            span.set_status(Status(StatusCode.ERROR, str(e)))
+        return jsonify({"error": str(e)}), 500
+
+
 @bp.route("/history/clear", methods=["POST"])
 async def clear_messages():
     # get the user id from the request headers
@@ -1056,7 +1407,7 @@ async def clear_messages():
             return jsonify({"error": "conversation_id is required"}), 400
 
         # make sure cosmos is configured
-        cosmos_conversation_client = init_cosmosdb_client()
+        cosmos_conversation_client = await conversation_client_manager.get_client()
         if not cosmos_conversation_client:
             raise Exception("CosmosDB is not configured or not working")
 
@@ -1087,16 +1438,17 @@ async def ensure_cosmos():
         return jsonify({"error": "CosmosDB is not configured"}), 404
 
     try:
-        cosmos_conversation_client = init_cosmosdb_client()
+        cosmos_conversation_client = await conversation_client_manager.get_client()
         success, err = await cosmos_conversation_client.ensure()
         if not cosmos_conversation_client or not success:
+            # force a reconnect on the next request
+            await conversation_client_manager.invalidate()
             if err:
                 track_event_if_configured("CosmosEnsureFailed", {"error": err})
                 return jsonify({"error": err}), 422
             return jsonify({"error": "CosmosDB is not configured or not working"}), 500
 
         track_event_if_configured("CosmosEnsureSuccess", {"status": "working"})
-        await cosmos_conversation_client.cosmosdb_client.close()
         return jsonify({"message": "CosmosDB is configured and working"}), 200
     except Exception as e:
         logging.exception("Exception in /history/ensure")
@@ -1152,6 +1504,59 @@ async def generate_section_content():
         return jsonify({"error": str(e)}), 500
 
 
+@bp.route("/section/generate_batch", methods=["POST"])
+async def generate_section_content_batch():
+    request_json = await request.get_json()
+    sections = request_json.get("sections") if isinstance(request_json, dict) else None
+    if not isinstance(sections, list) or not sections:
+        track_event_if_configured("GenerateSectionBatchFailed", {"error": "sections missing"})
+        return jsonify({"error": "sections is required"}), 400
+
+    for index, section in enumerate(sections):
+        if not isinstance(section, dict) or "sectionTitle" not in section or "sectionDescription" not in section:
+            track_event_if_configured("GenerateSectionBatchFailed", {"error": "invalid section", "index": index})
+            return jsonify({"error": f"sectionTitle and sectionDescription are required for section {index}"}), 400
+
+    try:
+        # create the shared section agent once, before the runs fan out
+        if getattr(app, "section_agent", None) is None:
+            app.section_agent = await SectionAgentFactory.get_agent()
+    except Exception as e:
+        logging.exception("Exception in /section/generate_batch")
+        span = trace.get_current_span()
+        if span is not None:
+            span.record_exception(e)
+            span.set_status(Status(StatusCode.ERROR, str(e)))
+        return jsonify({"error": str(e)}), 500
+
+    request_headers = request.headers
+    concurrency = app_settings.azure_ai.section_generation_concurrency
+    track_event_if_configured("GenerateSectionBatchStart", {
+        "section_count": len(sections),
+        "concurrency": concurrency
+    })
+
+    async def generate():
+        failed = 0
+        async for index, content, error in map_as_completed(
+            lambda section: get_section_content(dict(section), request_headers), sections, concurrency
+        ):
+            if error is not None:
+                failed += 1
+                yield {"index": index, "error": str(error) or "Section generation failed"}
+            else:
+                yield {"index": index, "section_content": content}
+        track_event_if_configured("GenerateSectionBatchCompleted", {
+            "section_count": len(sections),
+            "failed_count": failed
+        })
+
+    response = await make_response(format_as_ndjson(generate()))
+    response.timeout = None
+    response.mimetype = "application/json-lines"
+    return response
+
+
 # Fetch content from Azure Search API
 @bp.route("/fetch-azure-search-content", methods=["POST"])
 async def fetch_azure_search_content():
@@ -1163,44 +1568,53 @@ async def fetch_azure_search_content():
         if not url or not title:
             return jsonify({"error": "URL and title are required"}), 400
 
-        # Get Azure AD token
-        credential = get_azure_credential(client_id=app_settings.base_settings.azure_client_id)
-        token = credential.get_token("https://search.azure.com/.default")
-        access_token = token.token
+        try:
+            content = await citation_content_fetcher.fetch(url)
+        except CitationFetchError as e:
+            return jsonify({"error": str(e)}), 500
+
+        return jsonify({
+            "content": content,
+            "title": title
+        }), 200
+
+    except Exception as e:
+        logging.exception("Exception in /fetch-azure-search-content")
+        return jsonify({"error": str(e)}), 500
 
-        def fetch_content(fetch_url):
-            try:
-                response = requests.get(
-                    fetch_url,
-                    headers={
-                        "Authorization": f"Bearer {access_token}",
-                        "Content-Type": "application/json"
-                    },
-                    timeout=10
-                )
-                if response.status_code == 200:
-                    data = response.json()
-                    content = data.get("content", "")
-                    return {"success": True, "content": content}
-                else:
-                    error_msg = f"Request failed with status code {response.status_code} {response.text}"
-                    return {"success": False, "error": error_msg}
-            except Exception as e:
-                logging.exception("Error fetching content from Azure Search")
-                return {"success": False, "error": f"Exception: {str(e)}"}
 
-        result = await asyncio.to_thread(fetch_content, url)
+@bp.route("/fetch-azure-search-content/batch", methods=["POST"])
+async def fetch_azure_search_content_batch():
+    try:
+        request_json = await request.get_json()
+        citations = request_json.get("citations") if isinstance(request_json, dict) else None
 
-        if result["success"]:
+        if not isinstance(citations, list) or not citations:
+            return jsonify({"error": "citations must be a non-empty list"}), 400
+        if len(citations) > app_settings.citation_content.batch_max_size:
             return jsonify({
-                "content": result["content"],
-                "title": title
-            }), 200
-        else:
-            return jsonify({"error": result["error"]}), 500
+                "error": f"At most {app_settings.citation_content.batch_max_size} citations can be fetched at once"
+            }), 400
+        for citation in citations:
+            if not isinstance(citation, dict) or not citation.get("url") or not citation.get("title"):
+                return jsonify({"error": "URL and title are required for every citation"}), 400
+
+        # results keep the order of the request, failed citations carry their error
+        results = [{"url": citation["url"], "title": citation["title"]} for citation in citations]
+        async for index, content, error in map_as_completed(
+            citation_content_fetcher.fetch,
+            [citation["url"] for citation in citations],
+            app_settings.citation_content.batch_concurrency,
+        ):
+            if error is not None:
+                results[index]["error"] = str(error)
+            else:
+                results[index]["content"] = content
+
+        return jsonify({"citations": results}), 200
 
     except Exception as e:
-        logging.exception("Exception in /fetch-azure-search-content")
+        logging.exception("Exception in /fetch-azure-search-content/batch")
         return jsonify({"error": str(e)}), 500
 
 
@@ -1218,7 +1632,7 @@ async def generate_title(conversation_messages):
         response = None
         # Use Foundry SDK for title generation
         track_event_if_configured("Foundry_sdk_for_title", {"status": "success"})
-        ai_foundry_client = await init_ai_foundry_client()
+        ai_foundry_client = await get_ai_foundry_client()
         response = await ai_foundry_client.chat.completions.create(
             model=app_settings.azure_openai.model,
             messages=messages,
@@ -1241,7 +1655,61 @@ async def generate_title(conversation_messages):
         return title
     except Exception as e:
         logging.exception("Exception in generate_title" + str(e))
-        return messages[-2]["content"]
+        return generate_local_title(conversation_messages)
+
+
+async def persist_user_message(cosmos_conversation_client, user_id, conversation_id, title, message, history_metadata):
+    """
+    Save the user message of a /history/generate request, creating the conversation first when ``title`` is set.
+
+    The conversation's creation date is added to ``history_metadata`` in place.
+    """
+    if title is not None:
+        conversation_dict = await cosmos_conversation_client.create_conversation(
+            user_id=user_id, title=title, conversation_id=conversation_id
+        )
+        history_metadata["date"] = conversation_dict["createdAt"]
+
+    createdMessageValue = await cosmos_conversation_client.create_message(
+        uuid=str(uuid.uuid4()),
+        conversation_id=conversation_id,
+        user_id=user_id,
+        input_message=message,
+    )
+    track_event_if_configured("MessageCreated", {
+        "conversation_id": conversation_id,
+        "message_id": json.dumps(message),
+        "user_id": user_id
+    })
+    if createdMessageValue == "Conversation not found":
+        track_event_if_configured("ConversationNotFound", {"conversation_id": conversation_id})
+        raise Exception(
+            "Conversation not found for the given conversation ID: "
+            + conversation_id
+            + "."
+        )
+
+
+async def generate_conversation_title(user_id, conversation_id, conversation_messages, history_metadata,
+                                      persist_task=None):
+    """
+    Generate the title of a new conversation and save it.
+
+    ``history_metadata`` is updated in place so that stream frames formatted
+    from then on carry the generated title. The title is written once
+    ``persist_task`` has created the conversation.
+    """
+    title = await generate_title(conversation_messages)
+    history_metadata["title"] = title
+    try:
+        if persist_task is not None:
+            await persist_task
+        cosmos_conversation_client = await conversation_client_manager.get_client()
+        await cosmos_conversation_client.update_conversation_title(user_id, conversation_id, title)
+        track_event_if_configured("ConversationTitleUpdated", {"conversation_id": conversation_id})
+    except Exception:
+        logging.exception("Error saving the generated conversation title")
+    return title
 
 
 async def get_section_content(request_body, request_headers):
@@ -1255,6 +1723,23 @@ async def get_section_content(request_body, request_headers):
     thread = None
     response_text = ""
 
+    cache_key = None
+    if app_settings.section_cache.enabled:
+        cache_key = section_cache_key(
+            request_body["sectionTitle"],
+            request_body["sectionDescription"],
+            app_settings.azure_openai.generate_section_content_prompt,
+            getattr(app_settings.datasource, "index", None),
+            app_settings.section_cache.index_version,
+        )
+        cached_content = await section_content_cache.get(cache_key, bypass=bool(request_body.get("regenerate")))
+        if cached_content is not None:
+            track_event_if_configured("SectionContentCacheHit", {
+                "sectionTitle": request_body["sectionTitle"],
+                **section_content_cache.metrics()
+            })
+            return cached_content
+
     try:
         # Use Foundry SDK for section content generation
         track_event_if_configured("Foundry_sdk_for_section", {"status": "success"})
@@ -1265,23 +1750,21 @@ async def get_section_content(request_body, request_headers):
         section_agent_data = app.section_agent
         section_project_client = section_agent_data["client"]
         section_agent = section_agent_data["agent"]
+        section_thread_pool = section_agent_data["thread_pool"]
 
-        thread = await section_project_client.agents.threads.create()
-
-        for msg in request_body["messages"]:
-            if not msg or "role" not in msg or "content" not in msg:
-                continue  # skip malformed messages
-
-            if msg["role"] != "tool":
-                await section_project_client.agents.messages.create(
-                    thread_id=thread.id,
-                    role=msg["role"],
-                    content=msg["content"],
-                )
+        thread, additional_messages, round_trips = await section_thread_pool.acquire_seeded(
+            request_body["messages"]
+        )
+        track_event_if_configured("FoundryRoundTrips", {
+            "chat_type": "section",
+            "message_count": len(request_body["messages"]),
+            "thread_setup_round_trips": round_trips
+        })
 
         run = await section_project_client.agents.runs.create_and_process(
             thread_id=thread.id,
             agent_id=section_agent.id,
+            additional_messages=additional_messages,
             tool_choice={"type": "azure_ai_search"}
         )
         if run.status == "failed":
@@ -1296,10 +1779,16 @@ async def get_section_content(request_body, request_headers):
             if message:
                 response_text = message.text.value
                 # Remove markers from section content
-                response_text = re.sub(r'【(\d+:\d+)†source】', '', response_text)
+                response_text = CITATION_MARKER_PATTERN.sub('', response_text)
         track_event_if_configured("SectionContentGenerated", {
             "sectionTitle": request_body["sectionTitle"]
         })
+        if cache_key is not None and response_text:
+            await section_content_cache.set(cache_key, response_text)
+            track_event_if_configured("SectionContentCached", {
+                "sectionTitle": request_body["sectionTitle"],
+                **section_content_cache.metrics()
+            })
 
     except Exception as e:
         logging.exception("Exception in get_section_content")
@@ -1312,8 +1801,8 @@ async def get_section_content(request_body, request_headers):
 
     finally:
         if thread:
-            print("Deleting section thread", flush=True)
-            await section_project_client.agents.threads.delete(thread_id=thread.id)
+            print("Releasing section thread", flush=True)
+            section_thread_pool.release(thread.id)
 
     return response_text
 
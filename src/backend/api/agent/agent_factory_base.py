@@ -2,6 +2,9 @@ import asyncio
 from abc import ABC, abstractmethod
 from typing import Optional
 
+from backend.api.agent.thread_pool import AgentThreadPool
+from backend.settings import app_settings
+
 
 class BaseAgentFactory(ABC):
     """Base factory class for creating and managing agent instances."""
@@ -13,7 +16,15 @@ class BaseAgentFactory(ABC):
         """Get or create an agent instance using singleton pattern."""
         async with cls._lock:
             if cls._agent is None:
-                cls._agent = await cls.create_or_get_agent()
+                agent = await cls.create_or_get_agent()
+                thread_pool = AgentThreadPool(
+                    agent["client"],
+                    size=app_settings.azure_ai.thread_pool_size,
+                    max_idle_age=app_settings.azure_ai.thread_pool_max_idle_seconds,
+                )
+                thread_pool.start()
+                agent["thread_pool"] = thread_pool
+                cls._agent = agent
         return cls._agent
 
     @classmethod
@@ -21,6 +32,7 @@ class BaseAgentFactory(ABC):
         """Delete the current agent instance."""
         async with cls._lock:
             if cls._agent is not None:
+                await cls._agent["thread_pool"].close()
                 await cls._delete_agent_instance(cls._agent)
                 cls._agent = None
 
@@ -0,0 +1,123 @@
+import asyncio
+import logging
+
+from azure.core.exceptions import ResourceNotFoundError
+from event_utils import track_event_if_configured
+
+
+class ThreadDeletionQueue:
+    """Deletes agent threads in the background, off the request path.
+
+    Handlers hand off thread IDs with ``enqueue`` and return immediately. A
+    single worker per process drains the bounded queue in batches, retrying
+    failed deletes with a linear backoff. ``drain`` is awaited at shutdown so
+    that queued threads are not leaked.
+    """
+
+    def __init__(self, max_size: int = 1000, batch_size: int = 10, max_attempts: int = 3, retry_delay: float = 1.0):
+        self._max_size = max_size
+        self._batch_size = batch_size
+        self._max_attempts = max_attempts
+        self._retry_delay = retry_delay
+        self._queue = None
+        self._worker = None
+        self._overflow_tasks = set()
+        self.deleted = 0
+        self.retried = 0
+        self.failed = 0
+        self.overflowed = 0
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def metrics(self) -> dict:
+        return {
+            "queue_depth": self.depth,
+            "deleted": self.deleted,
+            "retried": self.retried,
+            "failed": self.failed,
+            "overflowed": self.overflowed,
+        }
+
+    def enqueue(self, project_client, thread_id: str):
+        """Schedule a thread for deletion."""
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((project_client, thread_id))
+        except asyncio.QueueFull:
+            # never make the caller wait, delete this one on its own instead
+            self.overflowed += 1
+            logging.warning(f"Thread deletion queue is full, deleting thread {thread_id} directly")
+            task = asyncio.create_task(self._delete(project_client, thread_id))
+            self._overflow_tasks.add(task)
+            task.add_done_callback(self._overflow_tasks.discard)
+
+    async def drain(self, timeout: float = 30):
+        """Wait for every queued deletion to finish, then stop the worker."""
+        if self._worker is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+            if self._overflow_tasks:
+                await asyncio.wait_for(
+                    asyncio.gather(*self._overflow_tasks, return_exceptions=True), timeout=timeout
+                )
+        except asyncio.TimeoutError:
+            logging.warning(f"Timed out draining thread deletion queue, {self.depth} threads left")
+        finally:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+            track_event_if_configured("ThreadDeletionQueueDrained", self.metrics())
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._worker.get_loop() is not loop:
+            self._queue = asyncio.Queue(maxsize=self._max_size)
+            self._worker = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self._batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await asyncio.gather(*(self._delete(client, thread_id) for client, thread_id in batch))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _delete(self, project_client, thread_id: str):
+        for attempt in range(1, self._max_attempts + 1):
+            try:
+                await project_client.agents.threads.delete(thread_id=thread_id)
+                self.deleted += 1
+                return
+            except ResourceNotFoundError:
+                # already gone
+                return
+            except Exception as e:
+                if attempt == self._max_attempts:
+                    self.failed += 1
+                    logging.exception(f"Error deleting agent thread {thread_id}")
+                    track_event_if_configured("ThreadDeletionFailed", {
+                        "thread_id": thread_id,
+                        "error": str(e),
+                        **self.metrics()
+                    })
+                    return
+                self.retried += 1
+                track_event_if_configured("ThreadDeletionRetried", {
+                    "thread_id": thread_id,
+                    "attempt": attempt,
+                    **self.metrics()
+                })
+                await asyncio.sleep(self._retry_delay * attempt)
+
+
+# Process-wide queue shared by every agent thread pool
+thread_deletion_queue = ThreadDeletionQueue()
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import List, Tuple
+
+from azure.ai.agents.models import ThreadMessageOptions
+
+from backend.api.agent.thread_deletion_queue import thread_deletion_queue
+
+# Most conversation messages sent inline with a run, older ones are added to the thread first
+MAX_INLINE_MESSAGES = 32
+
+
+class AgentThreadPool:
+    """Keeps a stock of pre-created empty threads for one agent project client.
+
+    ``acquire`` hands out an idle thread without a remote call whenever one is
+    available and tops the pool back up in the background. Used threads are
+    handed back with ``release`` and deleted off the request path by the
+    deletion queue, since a thread that already holds messages cannot be
+    reused for another run.
+    """
+
+    def __init__(self, project_client, size: int = 4, max_idle_age: float = 600, deletion_queue=None):
+        self._project_client = project_client
+        self._size = size
+        self._max_idle_age = max_idle_age
+        self._deletion_queue = deletion_queue or thread_deletion_queue
+        self._idle = deque()
+        self._refill_task = None
+        self._closed = False
+
+    @property
+    def idle_count(self) -> int:
+        return len(self._idle)
+
+    def start(self):
+        """Start filling the pool in the background."""
+        self._schedule_refill()
+
+    async def acquire(self):
+        """Return an empty thread, preferring a pre-created one."""
+        thread = self._take_idle()
+        if thread is None:
+            thread = await self._project_client.agents.threads.create()
+        return thread
+
+    async def acquire_seeded(self, messages: List[dict]) -> Tuple[object, List[ThreadMessageOptions], int]:
+        """
+        Acquire a thread for a run over the given conversation messages.
+
+        The most recent messages are returned as ``ThreadMessageOptions`` to be
+        sent as the run's ``additional_messages``, so they cost no extra call.
+        Conversations longer than ``MAX_INLINE_MESSAGES`` get a new thread
+        created with their oldest messages in the create call itself; a
+        pre-created thread would need one call per message to catch up.
+
+        Returns:
+            tuple: The thread, the messages to pass to the run and the number
+            of remote calls made to set the thread up.
+        """
+        thread_messages = [
+            ThreadMessageOptions(role=msg["role"], content=msg["content"])
+            for msg in messages
+            if msg and "role" in msg and "content" in msg and msg["role"] != "tool"
+        ]
+        backlog = thread_messages[:-MAX_INLINE_MESSAGES]
+        thread = self._take_idle() if not backlog else None
+        round_trips = 0
+        if thread is None:
+            thread = await self._project_client.agents.threads.create(messages=backlog or None)
+            round_trips += 1
+        return thread, thread_messages[-MAX_INLINE_MESSAGES:], round_trips
+
+    def _take_idle(self):
+        """Pop a fresh idle thread, or return None if there is none."""
+        while self._idle:
+            thread, created_at = self._idle.popleft()
+            if time.monotonic() - created_at <= self._max_idle_age:
+                self._schedule_refill()
+                return thread
+            # too old to trust, replace it
+            self._discard(thread.id)
+
+        self._schedule_refill()
+        return None
+
+    def release(self, thread_id: str):
+        """Hand back a used thread. It is queued for deletion."""
+        self._discard(thread_id)
+
+    async def close(self):
+        """Stop refilling and queue every idle thread for deletion."""
+        self._closed = True
+        if self._refill_task is not None and not self._refill_task.done():
+            self._refill_task.cancel()
+            try:
+                await self._refill_task
+            except asyncio.CancelledError:
+                pass
+
+        while self._idle:
+            thread, _ = self._idle.popleft()
+            self._discard(thread.id)
+
+    def _schedule_refill(self):
+        if self._closed or self._size <= 0:
+            return
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = asyncio.create_task(self._refill())
+
+    async def _refill(self):
+        try:
+            while not self._closed and len(self._idle) < self._size:
+                thread = await self._project_client.agents.threads.create()
+                self._idle.append((thread, time.monotonic()))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logging.exception("Error pre-creating agent threads")
+
+    def _discard(self, thread_id: str):
+        self._deletion_queue.enqueue(self._project_client, thread_id)
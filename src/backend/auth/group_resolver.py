@@ -0,0 +1,152 @@
+import asyncio
+import hashlib
+import logging
+import time
+from typing import List, Optional
+
+import aiohttp
+
+from backend.cache import TTLCache
+
+GRAPH_MEMBER_OF_URL = "https://graph.microsoft.com/v1.0/me/transitiveMemberOf?$select=id"
+
+# Time the groups of a user are served from the cache
+GROUP_CACHE_TTL_SECONDS = 900
+# Age after which cached groups are still served but refreshed in the background
+GROUP_REFRESH_AFTER_SECONDS = 300
+# Group ids per search.in clause of the filter
+MAX_GROUPS_PER_CLAUSE = 500
+
+
+def token_key(user_token: str) -> str:
+    # the token itself is never kept in memory as a cache key
+    return hashlib.sha256(user_token.encode("utf-8")).hexdigest()
+
+
+def build_group_filter(column: str, group_ids: List[str], max_groups_per_clause: int = MAX_GROUPS_PER_CLAUSE) -> str:
+    """
+    Build the search filter matching documents permitted to any of the groups.
+
+    Group ids are sorted so that the same group set always gives the same
+    filter, and split over several search.in clauses of at most
+    ``max_groups_per_clause`` ids for users in a very large number of groups.
+    """
+    group_ids = sorted(set(group_ids))
+    if not group_ids:
+        return f"{column}/any(g:search.in(g, ''))"
+    clauses = [
+        f"{column}/any(g:search.in(g, '{','.join(group_ids[i:i + max_groups_per_clause])}', ','))"
+        for i in range(0, len(group_ids), max_groups_per_clause)
+    ]
+    return " or ".join(clauses)
+
+
+class _GroupEntry:
+    def __init__(self, group_ids: List[str]):
+        self.group_ids = group_ids
+        self.fetched_at = time.monotonic()
+        # filters built from this group set, by column
+        self.filters = {}
+
+
+class GroupResolver:
+    """
+    Resolves the Entra ID groups of a user through Microsoft Graph.
+
+    Pages of transitiveMemberOf are followed asynchronously over a shared
+    aiohttp session. The groups are cached per user token, keyed by a hash
+    of the token, for ``ttl`` seconds. Entries older than ``refresh_after``
+    are served while they are refreshed in the background, so a chat turn
+    only waits for Graph on the first request of a token. Concurrent
+    lookups of the same token share one Graph walk.
+    """
+
+    def __init__(
+        self,
+        graph_url: str = GRAPH_MEMBER_OF_URL,
+        ttl: float = GROUP_CACHE_TTL_SECONDS,
+        refresh_after: float = GROUP_REFRESH_AFTER_SECONDS,
+        max_size: int = 1024,
+        timeout: float = 10,
+    ):
+        self._graph_url = graph_url
+        self._refresh_after = refresh_after
+        self._timeout = timeout
+        self._cache = TTLCache(max_size=max_size, ttl=ttl)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._in_flight = {}
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self._timeout))
+        return self._session
+
+    async def _fetch_group_ids(self, user_token: str) -> Optional[List[str]]:
+        # walks all the pages, None when Graph could not be read
+        headers = {"Authorization": "bearer " + user_token}
+        group_ids = []
+        endpoint = self._graph_url
+        try:
+            while endpoint:
+                async with self._get_session().get(endpoint, headers=headers) as response:
+                    if response.status != 200:
+                        logging.error(f"Error fetching user groups: {response.status} {await response.text()}")
+                        return None
+                    page = await response.json(content_type=None)
+                group_ids.extend(group["id"] for group in page.get("value", []))
+                endpoint = page.get("@odata.nextLink")
+        except Exception as e:
+            logging.error(f"Exception in fetching user groups: {e}")
+            return None
+        return group_ids
+
+    async def _refresh(self, key: str, user_token: str) -> Optional[_GroupEntry]:
+        try:
+            group_ids = await self._fetch_group_ids(user_token)
+            if group_ids is None:
+                return None
+            entry = _GroupEntry(group_ids)
+            self._cache.set(key, entry)
+            return entry
+        finally:
+            del self._in_flight[key]
+
+    def _start_refresh(self, key: str, user_token: str) -> asyncio.Task:
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._refresh(key, user_token))
+            self._in_flight[key] = task
+        return task
+
+    async def _get_entry(self, user_token: str) -> Optional[_GroupEntry]:
+        key = token_key(user_token)
+        entry = self._cache.get(key)
+        if entry is not None:
+            if time.monotonic() - entry.fetched_at >= self._refresh_after:
+                self._start_refresh(key, user_token)
+            return entry
+        return await asyncio.shield(self._start_refresh(key, user_token))
+
+    async def get_group_ids(self, user_token: str) -> List[str]:
+        """Ids of the groups of the user, empty when they could not be resolved."""
+        entry = await self._get_entry(user_token)
+        return list(entry.group_ids) if entry is not None else []
+
+    async def get_filter(self, user_token: str, column: str) -> str:
+        """Search filter on ``column`` for the documents the user's groups are permitted to."""
+        entry = await self._get_entry(user_token)
+        if entry is None:
+            logging.debug("No user groups found")
+            return build_group_filter(column, [])
+        if column not in entry.filters:
+            entry.filters[column] = build_group_filter(column, entry.group_ids)
+        return entry.filters[column]
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+# Shared by all requests of this worker
+group_resolver = GroupResolver()
@@ -0,0 +1,319 @@
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class TTLCache:
+    """In-memory LRU cache whose entries expire after ``ttl`` seconds."""
+
+    def __init__(self, max_size: int = 512, ttl: float = 86400):
+        self._max_size = max_size
+        self._ttl = ttl
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        if self._max_size <= 0:
+            return
+        self._entries[key] = (value, time.monotonic() + self._ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    def delete(self, key):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+class SQLiteCache:
+    """
+    On-disk cache tier backed by a SQLite file, shared by every worker on the host.
+
+    Queries run in a worker thread so they never block the event loop.
+    """
+
+    def __init__(self, path: str, ttl: float = 86400):
+        self._path = path
+        self._ttl = ttl
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._connection is None:
+            self._connection = sqlite3.connect(self._path, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._connection.commit()
+        return self._connection
+
+    def _get(self, key):
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def _set(self, key, value):
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + self._ttl)
+            )
+            connection.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+            connection.commit()
+
+    def _delete(self, key):
+        with self._lock:
+            connection = self._connect()
+            connection.execute("DELETE FROM cache WHERE key = ?", (key,))
+            connection.commit()
+
+    async def get(self, key) -> Optional[str]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key, value: str):
+        await asyncio.to_thread(self._set, key, value)
+
+    async def delete(self, key):
+        await asyncio.to_thread(self._delete, key)
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+def _normalize(text: str) -> str:
+    return " ".join(str(text or "").split()).casefold()
+
+
+def section_cache_key(title: str, description: str, prompt: str, index_name: str, index_version: str) -> str:
+    """
+    Build the cache key of a generated section.
+
+    Title and description are compared case and whitespace insensitively.
+    The section prompt and the search index name and version are part of the
+    key, so changing the prompt or bumping the index version after a reindex
+    never serves stale content.
+    """
+    prompt_hash = hashlib.sha256(str(prompt or "").encode("utf-8")).hexdigest()
+    parts = [_normalize(title), _normalize(description), prompt_hash, str(index_name or ""), str(index_version or "")]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class SectionContentCache:
+    """
+    Two tier cache for generated section content.
+
+    Lookups go to the in-memory LRU first and then to the optional SQLite
+    tier, whose hits are promoted to memory. Cache errors are logged and
+    treated as misses so that generation never fails because of the cache.
+    """
+
+    def __init__(self, max_size: int = 512, ttl: float = 86400, sqlite_path: Optional[str] = None):
+        self._memory = TTLCache(max_size=max_size, ttl=ttl)
+        self._disk = SQLiteCache(sqlite_path, ttl=ttl) if sqlite_path else None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    def metrics(self) -> dict:
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "size": len(self._memory),
+        }
+
+    async def get(self, key: str, bypass: bool = False) -> Optional[str]:
+        """
+        Return the cached value, or None on a miss or when ``bypass`` is set.
+        """
+        if bypass:
+            self.bypassed += 1
+            return None
+
+        value = self._memory.get(key)
+        if value is not None:
+            self.memory_hits += 1
+            return value
+
+        if self._disk is not None:
+            try:
+                value = await self._disk.get(key)
+            except Exception:
+                logging.exception("Error reading section content cache")
+                value = None
+            if value is not None:
+                self.disk_hits += 1
+                self._memory.set(key, value)
+                return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: str):
+        self._memory.set(key, value)
+        if self._disk is not None:
+            try:
+                await self._disk.set(key, value)
+            except Exception:
+                logging.exception("Error writing section content cache")
+
+    def close(self):
+        if self._disk is not None:
+            self._disk.close()
+
+
+# Marks a cached page that was listed by offset and has no next cursor
+_NO_CURSOR = object()
+
+
+class ConversationListCache:
+    """
+    Cache of the first page of each user's conversation list.
+
+    Entries live in a per-worker in-memory LRU or, when ``sqlite_path`` is
+    set, in a SQLite file shared by every worker on the host. Writes to a
+    conversation update the cached page in place, and the short TTL bounds
+    how long a worker can serve a page that another worker changed. Cache
+    errors are logged and treated as misses.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 30, sqlite_path: Optional[str] = None):
+        self._memory = TTLCache(max_size=max_size, ttl=ttl) if not sqlite_path else None
+        self._shared = SQLiteCache(sqlite_path, ttl=ttl) if sqlite_path else None
+        self.hits = 0
+        self.misses = 0
+
+    async def _load(self, user_id) -> Optional[dict]:
+        try:
+            if self._shared is None:
+                return self._memory.get(user_id)
+            value = await self._shared.get(f"conversations:{user_id}")
+            return json.loads(value) if value is not None else None
+        except Exception:
+            logging.exception("Error reading conversation list cache")
+            return None
+
+    async def _store(self, user_id, entry: dict):
+        try:
+            if self._shared is None:
+                self._memory.set(user_id, entry)
+            else:
+                await self._shared.set(f"conversations:{user_id}", json.dumps(entry))
+        except Exception:
+            logging.exception("Error writing conversation list cache")
+
+    async def invalidate(self, user_id):
+        try:
+            if self._shared is None:
+                self._memory.delete(user_id)
+            else:
+                await self._shared.delete(f"conversations:{user_id}")
+        except Exception:
+            logging.exception("Error writing conversation list cache")
+
+    async def get(self, user_id, limit: int, with_cursor: bool = False) -> Optional[dict]:
+        """
+        Return the cached first page as ``{"conversations", "next_cursor"}``, or None on a miss.
+
+        ``with_cursor`` asks for a page cached together with its next cursor.
+        """
+        entry = await self._load(user_id)
+        if entry is None or entry["limit"] != limit or (with_cursor and "next_cursor" not in entry):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return {
+            "conversations": [dict(conversation) for conversation in entry["conversations"]],
+            "next_cursor": entry.get("next_cursor"),
+        }
+
+    async def set(self, user_id, limit: int, conversations: list, next_cursor=_NO_CURSOR):
+        entry = {"limit": limit, "conversations": [dict(conversation) for conversation in conversations]}
+        if next_cursor is not _NO_CURSOR:
+            entry["next_cursor"] = next_cursor
+        await self._store(user_id, entry)
+
+    async def _update(self, user_id, change):
+        # change edits the cached conversations in place, or returns False when the page can't be patched
+        entry = await self._load(user_id)
+        if entry is None:
+            return
+        conversations = [dict(conversation) for conversation in entry["conversations"]]
+        if change(conversations, entry) is False:
+            await self.invalidate(user_id)
+            return
+        await self._store(user_id, {**entry, "conversations": conversations})
+
+    async def add(self, user_id, conversation: dict):
+        """Put a new or updated conversation at the top of the cached page."""
+        def change(conversations, entry):
+            conversations[:] = [c for c in conversations if c["id"] != conversation["id"]]
+            conversations.insert(0, dict(conversation))
+            if len(conversations) > entry["limit"]:
+                # the last conversation moves to the next page, which the cached cursor starts after
+                if "next_cursor" in entry:
+                    return False
+                del conversations[entry["limit"]:]
+        await self._update(user_id, change)
+
+    async def update(self, user_id, conversation_id, **fields):
+        """Change fields, such as the title, of a conversation on the cached page."""
+        def change(conversations, entry):
+            for cached in conversations:
+                if cached["id"] == conversation_id:
+                    cached.update(fields)
+        await self._update(user_id, change)
+
+    async def touch(self, user_id, conversation_id, updated_at: str):
+        """Move a conversation that got a new message to the top of the cached page."""
+        def change(conversations, entry):
+            for position, cached in enumerate(conversations):
+                if cached["id"] == conversation_id:
+                    conversations.insert(0, {**conversations.pop(position), "updatedAt": updated_at})
+                    return True
+            # an older conversation moves onto the first page, its title is not known here
+            return False
+        await self._update(user_id, change)
+
+    async def remove(self, user_id, conversation_id):
+        """Drop a deleted conversation from the cached page."""
+        def change(conversations, entry):
+            remaining = [c for c in conversations if c["id"] != conversation_id]
+            # a full page is refilled from the next one, which only a new query can do
+            if len(remaining) < len(conversations) and len(conversations) >= entry["limit"]:
+                return False
+            conversations[:] = remaining
+        await self._update(user_id, change)
+
+    def close(self):
+        if self._shared is not None:
+            self._shared.close()
@@ -0,0 +1,98 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+import aiohttp
+
+from backend.cache import TTLCache
+
+
+class CitationFetchError(Exception):
+    """Raised when the content of a citation could not be fetched."""
+
+
+class CitationContentFetcher:
+    """
+    Fetches the content of cited search documents.
+
+    Requests go through one aiohttp session, so connections to the search
+    service are pooled and kept alive. Fetched content is kept in an LRU
+    cache with a TTL, keyed by URL. Concurrent fetches of a URL that is not
+    cached yet share a single request. Failures are not cached.
+    """
+
+    def __init__(
+        self,
+        token_provider: Callable[[], Awaitable[str]],
+        max_size: int = 256,
+        ttl: float = 600,
+        timeout: float = 10,
+        connection_limit: int = 20,
+    ):
+        self._token_provider = token_provider
+        self._cache = TTLCache(max_size=max_size, ttl=ttl)
+        self._timeout = timeout
+        self._connection_limit = connection_limit
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._in_flight = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # created on first use, inside the event loop of the worker
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self._connection_limit, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=self._timeout),
+            )
+        return self._session
+
+    async def _download(self, url: str) -> str:
+        access_token = await self._token_provider()
+        headers = {"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"}
+        try:
+            async with self._get_session().get(url, headers=headers) as response:
+                if response.status != 200:
+                    raise CitationFetchError(
+                        f"Request failed with status code {response.status} {await response.text()}"
+                    )
+                data = await response.json(content_type=None)
+                if not isinstance(data, dict):
+                    raise ValueError(f"Expected a JSON object, got {type(data).__name__}")
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            logging.exception("Error fetching content from Azure Search")
+            raise CitationFetchError(f"Exception: {str(e)}") from e
+        return data.get("content", "")
+
+    async def _fetch_and_cache(self, url: str) -> str:
+        try:
+            content = await self._download(url)
+            self._cache.set(url, content)
+            return content
+        finally:
+            del self._in_flight[url]
+
+    async def fetch(self, url: str) -> str:
+        """
+        Return the content of the document at ``url``.
+
+        Raises:
+            CitationFetchError: If the search service did not return the document.
+        """
+        content = self._cache.get(url)
+        if content is not None:
+            self.hits += 1
+            return content
+
+        self.misses += 1
+        task = self._in_flight.get(url)
+        if task is None:
+            task = asyncio.create_task(self._fetch_and_cache(url))
+            self._in_flight[url] = task
+        # shielded so that a caller that goes away does not cancel the fetch for the others
+        return await asyncio.shield(task)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
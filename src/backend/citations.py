@@ -0,0 +1,202 @@
+import ast
+import json
+import re
+
+# Citation markers emitted by the Azure AI Search tool, e.g. 【3:0†source】
+CITATION_MARKER_PATTERN = re.compile(r'【(\d+:\d+)†source】')
+_MARKER_START = "【"
+_MARKER_END = "】"
+_MARKER_SUFFIX = "†source"
+_MARKER_PREFIX_PATTERN = re.compile(r'【\d*(?::\d*)?')
+_MAX_MARKER_LENGTH = 32
+
+
+def _marker_replacer(doc_mapping):
+    def replace_marker(match):
+        key = match.group(1)
+        if key not in doc_mapping:
+            doc_mapping[key] = f"[{len(doc_mapping) + 1}]"
+        return doc_mapping[key]
+
+    return replace_marker
+
+
+def convert_citation_markers(text, doc_mapping):
+    """
+    Replace citation markers with numbered references such as [1].
+
+    ``doc_mapping`` maps each marker key to its reference and is updated in
+    place, so the same document keeps its number across calls.
+    """
+    return CITATION_MARKER_PATTERN.sub(_marker_replacer(doc_mapping), text)
+
+
+def _is_partial_marker(text):
+    match = _MARKER_PREFIX_PATTERN.match(text)
+    if not match:
+        return False
+    return _MARKER_SUFFIX.startswith(text[match.end():])
+
+
+class CitationMarkerParser:
+    """
+    Incrementally converts citation markers in a streamed answer.
+
+    Each delta is scanned once. A trailing fragment that may be the start of a
+    marker split across deltas is held back until the next delta (or
+    ``flush``) completes it, so converted text is emitted in time
+    proportional to the delta. The raw answer is kept in a list of parts and
+    joined only when requested.
+    """
+
+    def __init__(self, doc_mapping=None):
+        self.doc_mapping = doc_mapping if doc_mapping is not None else {}
+        self.marker_count = 0
+        self._parts = []
+        self._pending = ""
+
+    @property
+    def answer(self):
+        """The raw, unconverted answer received so far."""
+        return "".join(self._parts)
+
+    def feed(self, delta):
+        """
+        Consume the next delta and return the converted text that can be emitted.
+        """
+        self._parts.append(delta)
+        text = self._pending + delta
+        self._pending = ""
+
+        start = text.rfind(_MARKER_START)
+        if start == -1:
+            return text
+        if (
+            _MARKER_END not in text[start:]
+            and len(text) - start < _MAX_MARKER_LENGTH
+            and _is_partial_marker(text[start:])
+        ):
+            self._pending = text[start:]
+            text = text[:start]
+        return self._convert(text)
+
+    def flush(self):
+        """
+        Return any held back text once the stream has ended.
+        """
+        text, self._pending = self._pending, ""
+        return self._convert(text)
+
+    def _convert(self, text):
+        if _MARKER_START not in text:
+            return text
+        converted, markers = CITATION_MARKER_PATTERN.subn(_marker_replacer(self.doc_mapping), text)
+        self.marker_count += markers
+        return converted
+
+
+def parse_tool_output(output):
+    """
+    Decode the output of a tool call.
+
+    Outputs are tried as JSON first and only fall back to ``ast.literal_eval``
+    for Python literal syntax (e.g. single-quoted dicts), which is far slower.
+    """
+    if not isinstance(output, str):
+        return output
+    try:
+        return json.loads(output)
+    except ValueError:
+        return ast.literal_eval(output)
+
+
+class CitationSet:
+    """
+    Ordered collection of citations indexed by title and URL.
+
+    Lookups by title or URL are constant time, so adding citations stays
+    linear in their number. The JSON serialization is cached until the next
+    change.
+    """
+
+    def __init__(self):
+        self._citations = []
+        # title -> position in _citations of the first citation with that title
+        self._by_title = {}
+        self._url_counts = {}
+        self._json = None
+        self._modified_from = None
+
+    def __len__(self):
+        return len(self._citations)
+
+    def __iter__(self):
+        return iter(self._citations)
+
+    def add(self, title, url):
+        """
+        Add a citation unless one with the same URL already exists.
+
+        Returns:
+            bool: Whether the citation was added.
+        """
+        if url in self._url_counts:
+            return False
+        self._append(title, url)
+        return True
+
+    def upsert(self, title, url):
+        """
+        Set the URL of the citation with the given title, adding it if missing.
+        """
+        index = self._by_title.get(title)
+        if index is None:
+            self._append(title, url)
+            return
+        existing = self._citations[index]
+        if existing["url"] != url:
+            self._remove_url(existing["url"])
+            existing["url"] = url
+            self._url_counts[url] = self._url_counts.get(url, 0) + 1
+            self._json = None
+            if self._modified_from is None or index < self._modified_from:
+                self._modified_from = index
+
+    def to_list(self):
+        return list(self._citations)
+
+    def take_changes(self, sent_count):
+        """
+        Return the citations a client holding the first ``sent_count`` needs.
+
+        Covers citations added since then and any earlier citation whose URL
+        was updated since the last call.
+
+        Returns:
+            tuple: The index of the first changed citation and the citations
+            from that index on.
+        """
+        offset = sent_count
+        if self._modified_from is not None:
+            offset = min(offset, self._modified_from)
+            self._modified_from = None
+        return offset, self._citations[offset:]
+
+    def to_json(self):
+        if self._json is None:
+            self._json = json.dumps(self._citations)
+        return self._json
+
+    def _append(self, title, url):
+        citation = {"title": title, "url": url}
+        self._by_title.setdefault(title, len(self._citations))
+        self._citations.append(citation)
+        self._url_counts[url] = self._url_counts.get(url, 0) + 1
+        self._json = None
+
+    def _remove_url(self, url):
+        count = self._url_counts.get(url, 0) - 1
+        if count > 0:
+            self._url_counts[url] = count
+        else:
+            self._url_counts.pop(url, None)
@@ -1,6 +1,21 @@
+import asyncio
+import logging
 import os
+import time
 from azure.identity import ManagedIdentityCredential, DefaultAzureCredential
 from azure.identity.aio import ManagedIdentityCredential as AioManagedIdentityCredential, DefaultAzureCredential as AioDefaultAzureCredential
+from event_utils import track_event_if_configured
+
+# Shared credentials keyed by (sync/async, dev environment, client_id)
+_credentials = {}
+
+# Shared access token caches keyed like the async credential they use
+_token_caches = {}
+
+
+def _credential_key(mode, client_id):
+    is_dev = os.getenv("APP_ENV", "prod").lower() == 'dev'
+    return (mode, is_dev, client_id)
 
 
 async def get_azure_credential_async(client_id=None):
@@ -10,16 +25,23 @@ async def get_azure_credential_async(client_id=None):
     If the environment is 'dev', it uses AioDefaultAzureCredential.
     Otherwise, it uses AioManagedIdentityCredential.
 
+    Credentials are created once per client ID and shared by all callers.
+
     Args:
         client_id (str, optional): The client ID for the Managed Identity Credential.
 
     Returns:
         Credential object: Either AioDefaultAzureCredential or AioManagedIdentityCredential.
     """
-    if os.getenv("APP_ENV", "prod").lower() == 'dev':
-        return AioDefaultAzureCredential()  # CodeQL [SM05139] Okay use of DefaultAzureCredential as it is only used in development
-    else:
-        return AioManagedIdentityCredential(client_id=client_id)
+    key = _credential_key("async", client_id)
+    credential = _credentials.get(key)
+    if credential is None:
+        if key[1]:
+            credential = AioDefaultAzureCredential()  # CodeQL [SM05139] Okay use of DefaultAzureCredential as it is only used in development
+        else:
+            credential = AioManagedIdentityCredential(client_id=client_id)
+        _credentials[key] = credential
+    return credential
 
 
 def get_azure_credential(client_id=None):
@@ -29,13 +51,120 @@ def get_azure_credential(client_id=None):
     If the environment is 'dev', it uses DefaultAzureCredential.
     Otherwise, it uses ManagedIdentityCredential.
 
+    Credentials are created once per client ID and shared by all callers.
+
     Args:
         client_id (str, optional): The client ID for the Managed Identity Credential.
 
     Returns:
         Credential object: Either DefaultAzureCredential or ManagedIdentityCredential.
     """
-    if os.getenv("APP_ENV", "prod").lower() == 'dev':
-        return DefaultAzureCredential()  # CodeQL [SM05139] Okay use of DefaultAzureCredential as it is only used in development
-    else:
-        return ManagedIdentityCredential(client_id=client_id)
+    key = _credential_key("sync", client_id)
+    credential = _credentials.get(key)
+    if credential is None:
+        if key[1]:
+            credential = DefaultAzureCredential()  # CodeQL [SM05139] Okay use of DefaultAzureCredential as it is only used in development
+        else:
+            credential = ManagedIdentityCredential(client_id=client_id)
+        _credentials[key] = credential
+    return credential
+
+
+def clear_credential_cache():
+    """
+    Forgets all shared credentials and cached access tokens.
+    """
+    _credentials.clear()
+    _token_caches.clear()
+
+
+class AccessTokenCache:
+    """
+    Caches access tokens per scope for an async credential.
+
+    Tokens are served from memory while valid. Once a token enters the refresh
+    window it is still served, and a single background task fetches its
+    replacement, so requests never wait on IMDS/AAD unless there is no valid
+    token at all.
+    """
+
+    def __init__(self, credential, refresh_margin: int = 300, min_validity: int = 30):
+        self._credential = credential
+        self._refresh_margin = refresh_margin
+        self._min_validity = min_validity
+        self._tokens = {}
+        self._locks = {}
+        self._refresh_tasks = {}
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+    async def get_token(self, scope: str) -> str:
+        """
+        Returns a valid access token string for the given scope.
+        """
+        token = self._tokens.get(scope)
+        remaining = token.expires_on - time.time() if token else 0
+        if remaining > self._min_validity:
+            self.hits += 1
+            if remaining <= self._refresh_margin:
+                self._schedule_refresh(scope)
+            return token.token
+
+        self.misses += 1
+        token = await self._refresh(scope)
+        return token.token
+
+    def metrics(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+        }
+
+    def _schedule_refresh(self, scope: str):
+        task = self._refresh_tasks.get(scope)
+        if task is None or task.done():
+            self._refresh_tasks[scope] = asyncio.create_task(self._background_refresh(scope))
+
+    async def _background_refresh(self, scope: str):
+        try:
+            await self._refresh(scope)
+        except Exception:
+            self.refresh_failures += 1
+            logging.exception(f"Background access token refresh failed for scope {scope}")
+
+    async def _refresh(self, scope: str):
+        lock = self._locks.setdefault(scope, asyncio.Lock())
+        async with lock:
+            # another coroutine may have refreshed the token while we waited
+            token = self._tokens.get(scope)
+            if token and token.expires_on - time.time() > self._refresh_margin:
+                return token
+
+            token = await self._credential.get_token(scope)
+            self._tokens[scope] = token
+            self.refreshes += 1
+            track_event_if_configured("AccessTokenRefreshed", {"scope": scope, **self.metrics()})
+            return token
+
+
+async def get_azure_access_token_async(scope, client_id=None):
+    """
+    Returns an access token for the given scope from the shared token cache.
+
+    Args:
+        scope (str): The scope to request the token for.
+        client_id (str, optional): The client ID for the Managed Identity Credential.
+
+    Returns:
+        str: The access token.
+    """
+    key = _credential_key("async", client_id)
+    token_cache = _token_caches.get(key)
+    if token_cache is None:
+        credential = await get_azure_credential_async(client_id=client_id)
+        token_cache = _token_caches.setdefault(key, AccessTokenCache(credential))
+    return await token_cache.get_token(scope)
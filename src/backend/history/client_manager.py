@@ -0,0 +1,88 @@
+import asyncio
+import logging
+from typing import Callable, Optional
+
+
+class ConversationClientManager:
+    """Owns a single long-lived conversation history client per worker process.
+
+    The client is built lazily (or eagerly via ``start`` from the app's
+    ``before_serving`` hook) and shared by every request coroutine of the
+    worker. Its ``ensure()`` health check never runs on the request path: it
+    runs once at startup and then on a timer in the background, and the
+    client is rebuilt when the check fails or when a caller reports it as
+    broken through ``invalidate()``.
+    """
+
+    def __init__(self, client_builder: Callable[[], Optional[object]], health_check_interval: float = 300):
+        self._client_builder = client_builder
+        self._health_check_interval = health_check_interval
+        self._lock = asyncio.Lock()
+        self._client = None
+        self._health_check_task: Optional[asyncio.Task] = None
+
+    async def get_client(self):
+        """Return the shared client, creating it if required."""
+        client = self._client
+        if client is not None:
+            return client
+
+        async with self._lock:
+            if self._client is None:
+                self._client = self._client_builder()
+            return self._client
+
+    async def start(self):
+        """Build and check the client, then keep checking it in the background."""
+        await self.get_client()
+        await self.check_health()
+        if self._health_check_task is None and self._health_check_interval > 0:
+            self._health_check_task = asyncio.create_task(self._run_health_checks())
+
+    async def check_health(self) -> bool:
+        """Run ``ensure()`` on the current client and drop it when the check fails."""
+        client = self._client
+        if client is None:
+            return False
+        success, err = await client.ensure()
+        if not success:
+            logging.warning(f"Conversation history client health check failed, reconnecting: {err}")
+            async with self._lock:
+                # unless a caller already replaced it
+                if self._client is client:
+                    await self._close_client(client)
+                    self._client = None
+        return success
+
+    async def invalidate(self):
+        """Drop the current client so that the next ``get_client`` reconnects."""
+        async with self._lock:
+            if self._client is not None:
+                await self._close_client(self._client)
+                self._client = None
+
+    async def close(self):
+        """Stop the health checks and close the shared client. Called from the app's ``after_serving`` hook."""
+        if self._health_check_task is not None:
+            self._health_check_task.cancel()
+            try:
+                await self._health_check_task
+            except asyncio.CancelledError:
+                pass
+            self._health_check_task = None
+        await self.invalidate()
+
+    async def _run_health_checks(self):
+        while True:
+            await asyncio.sleep(self._health_check_interval)
+            try:
+                await self.check_health()
+            except Exception:
+                logging.exception("Error checking the conversation history client")
+
+    @staticmethod
+    async def _close_client(client):
+        try:
+            await client.close()
+        except Exception:
+            logging.exception("Error closing conversation history client")
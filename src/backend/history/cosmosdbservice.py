@@ -1,11 +1,58 @@
-import uuid
+import asyncio
+import logging
+from contextvars import ContextVar
 from datetime import datetime
+from typing import Optional
 
+from azure.core.async_paging import AsyncItemPaged
 from azure.cosmos import exceptions
 from azure.cosmos.aio import CosmosClient
+from backend.history.history_store import (CONVERSATION_LIST_FIELDS,
+                                           MESSAGE_FIELDS, HistoryStore,
+                                           decode_cursor, encode_cursor,
+                                           project)
+from event_utils import track_event_if_configured
 
+# Cosmos DB transactional batches hold at most 100 operations
+MAX_BATCH_OPERATIONS = 100
 
-class CosmosConversationClient:
+# Delete batches in flight at once
+DELETE_CONCURRENCY = 4
+
+# Response header holding the request units consumed by a request
+REQUEST_CHARGE_HEADER = "x-ms-request-charge"
+
+# Time a finished delete job record is kept
+DELETE_JOB_TTL_SECONDS = 86400
+
+MESSAGE_QUERY_FIELDS = ", ".join(f"c.{field}" for field in MESSAGE_FIELDS)
+
+CONVERSATION_LIST_QUERY = (
+    f"SELECT {', '.join(f'c.{field}' for field in CONVERSATION_LIST_FIELDS)} FROM c "
+    "where c.userId = @userId and c.type='conversation'"
+)
+
+
+# Conversations read during the current request, keyed by (user_id, conversation_id)
+_conversation_memo: ContextVar[Optional[dict]] = ContextVar("conversation_memo", default=None)
+
+
+def start_request_memo():
+    """
+    Start an empty conversation memo for the current request.
+
+    Without a memo, e.g. outside of a request, every lookup reads from Cosmos DB.
+    """
+    _conversation_memo.set({})
+
+
+def _forget_conversation(user_id, conversation_id):
+    memo = _conversation_memo.get()
+    if memo is not None:
+        memo.pop((user_id, conversation_id), None)
+
+
+class CosmosConversationClient(HistoryStore):
     def __init__(
         self,
         cosmosdb_endpoint: str,
@@ -13,12 +60,17 @@ class CosmosConversationClient:
         database_name: str,
         container_name: str,
         enable_message_feedback: bool = False,
+        conversation_list_cache=None,
     ):
         self.cosmosdb_endpoint = cosmosdb_endpoint
         self.credential = credential
         self.database_name = database_name
         self.container_name = container_name
         self.enable_message_feedback = enable_message_feedback
+        # optional ConversationListCache of the first page of each user's conversations
+        self.conversation_list_cache = conversation_list_cache
+        # total RU charge per operation name since the client was created
+        self.request_charges = {}
         try:
             self.cosmosdb_client = CosmosClient(
                 self.cosmosdb_endpoint, credential=credential
@@ -65,133 +117,420 @@ class CosmosConversationClient:
 
         return True, "CosmosDB client initialized successfully"
 
-    async def create_conversation(self, user_id, title=""):
-        conversation = {
-            "id": str(uuid.uuid4()),
-            "type": "conversation",
-            "createdAt": datetime.utcnow().isoformat(),
-            "updatedAt": datetime.utcnow().isoformat(),
-            "userId": user_id,
-            "title": title,
-        }
+    async def close(self):
+        await self.cosmosdb_client.close()
+
+    async def create_conversation(self, user_id, title="", conversation_id=None):
+        conversation = self._new_conversation(user_id, title, conversation_id)
         # TODO: add some error handling based on the output of the upsert_item call
-        resp = await self.container_client.upsert_item(conversation)
+        _forget_conversation(user_id, conversation["id"])
+        resp = await self.container_client.upsert_item(
+            conversation, response_hook=self._charge_hook("create_conversation")
+        )
         if resp:
+            if self.conversation_list_cache is not None:
+                await self.conversation_list_cache.add(user_id, project(resp, CONVERSATION_LIST_FIELDS))
             return resp
         else:
             return False
 
     async def upsert_conversation(self, conversation):
-        resp = await self.container_client.upsert_item(conversation)
+        _forget_conversation(conversation.get("userId"), conversation.get("id"))
+        resp = await self.container_client.upsert_item(
+            conversation, response_hook=self._charge_hook("upsert_conversation")
+        )
         if resp:
+            if self.conversation_list_cache is not None:
+                await self.conversation_list_cache.update(resp["userId"], resp["id"], **project(resp, CONVERSATION_LIST_FIELDS))
             return resp
         else:
             return False
 
-    async def delete_conversation(self, user_id, conversation_id):
-        conversation = await self.container_client.read_item(
-            item=conversation_id, partition_key=user_id
+    async def update_conversation_title(self, user_id, conversation_id, title):
+        _forget_conversation(user_id, conversation_id)
+        resp = await self.container_client.patch_item(
+            item=conversation_id,
+            partition_key=user_id,
+            patch_operations=[{"op": "set", "path": "/title", "value": title}],
+            response_hook=self._charge_hook("update_conversation_title"),
         )
-        if conversation:
+        if self.conversation_list_cache is not None:
+            await self.conversation_list_cache.update(user_id, conversation_id, title=title)
+        return resp
+
+    async def delete_conversation(self, user_id, conversation_id):
+        # point delete, a conversation that is already gone counts as deleted
+        _forget_conversation(user_id, conversation_id)
+        if self.conversation_list_cache is not None:
+            await self.conversation_list_cache.remove(user_id, conversation_id)
+        try:
             resp = await self.container_client.delete_item(
-                item=conversation_id, partition_key=user_id
+                item=conversation_id, partition_key=user_id,
+                response_hook=self._charge_hook("delete_conversation"),
             )
-            return resp
-        else:
+        except exceptions.CosmosResourceNotFoundError:
             return True
+        return resp
+
+    async def get_item_ids(self, user_id, item_type, conversation_id=None):
+        parameters = [
+            {"name": "@userId", "value": user_id},
+            {"name": "@type", "value": item_type},
+        ]
+        query = "SELECT VALUE c.id FROM c WHERE c.userId = @userId AND c.type = @type"
+        if conversation_id is not None:
+            parameters.append({"name": "@conversationId", "value": conversation_id})
+            query += " AND c.conversationId = @conversationId"
+
+        return [
+            item_id async for item_id in self.container_client.query_items(
+                query=query, parameters=parameters, partition_key=user_id,
+                response_hook=self._charge_hook("get_item_ids"),
+            )
+        ]
+
+    async def delete_items(self, user_id, item_ids, concurrency=None, on_progress=None):
+        """
+        Delete items of a user by id with transactional batches.
 
-    async def delete_messages(self, conversation_id, user_id):
-        # get a list of all the messages in the conversation
-        messages = await self.get_messages(user_id, conversation_id)
-        response_list = []
-        if messages:
-            for message in messages:
-                resp = await self.container_client.delete_item(
-                    item=message["id"], partition_key=user_id
-                )
-                response_list.append(resp)
-            return response_list
+        Ids are deleted in batches of up to ``MAX_BATCH_OPERATIONS`` with at
+        most ``concurrency`` batches in flight. A batch that fails, e.g.
+        because one of its items is already gone, is retried as individual
+        point deletes. ``on_progress`` is awaited with the number of items
+        deleted after each batch.
+
+        Returns:
+            int: The number of items processed.
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency or DELETE_CONCURRENCY))
+
+        async def delete_chunk(chunk):
+            async with semaphore:
+                try:
+                    await self.container_client.execute_item_batch(
+                        batch_operations=[("delete", (item_id,)) for item_id in chunk],
+                        partition_key=user_id,
+                        response_hook=self._charge_hook("delete_batch"),
+                    )
+                except exceptions.CosmosHttpResponseError as e:
+                    self._report_error_charge("delete_batch", e)
+                    for item_id in chunk:
+                        try:
+                            await self.container_client.delete_item(
+                                item=item_id, partition_key=user_id, response_hook=self._charge_hook("delete_item")
+                            )
+                        except exceptions.CosmosResourceNotFoundError:
+                            pass
+                if on_progress is not None:
+                    await on_progress(len(chunk))
+                return len(chunk)
+
+        chunks = [item_ids[i:i + MAX_BATCH_OPERATIONS] for i in range(0, len(item_ids), MAX_BATCH_OPERATIONS)]
+        return sum(await asyncio.gather(*(delete_chunk(chunk) for chunk in chunks)))
+
+    async def delete_user_history(self, user_id, concurrency=None, on_progress=None,
+                                  message_ids=None, conversation_ids=None):
+        if self.conversation_list_cache is not None:
+            await self.conversation_list_cache.invalidate(user_id)
+        return await super().delete_user_history(user_id, concurrency, on_progress, message_ids, conversation_ids)
+
+    async def save_delete_job(self, user_id, job: dict):
+        # ttl only takes effect on containers with time to live enabled, as deployed by the infra;
+        # finished jobs are also deleted when the user starts a new one
+        job = {
+            **job,
+            "type": "delete_job",
+            "userId": user_id,
+            "updatedAt": datetime.utcnow().isoformat(),
+            "ttl": DELETE_JOB_TTL_SECONDS,
+        }
+        return await self.container_client.upsert_item(job, response_hook=self._charge_hook("save_delete_job"))
+
+    async def get_delete_job(self, user_id, job_id):
+        try:
+            job = await self.container_client.read_item(
+                item=job_id, partition_key=user_id, response_hook=self._charge_hook("get_delete_job")
+            )
+        except exceptions.CosmosResourceNotFoundError:
+            return None
+        return job if job.get("type") == "delete_job" else None
 
     async def get_conversations(self, user_id, limit, sort_order="DESC", offset=0):
+        # offset and limit are formatted into the query, as integers only
+        offset = int(offset)
+        cache = self.conversation_list_cache
+        first_page = cache is not None and limit is not None and sort_order == "DESC" and offset == 0
+        if first_page:
+            cached = await cache.get(user_id, limit)
+            if cached is not None:
+                return cached["conversations"]
+
         parameters = [{"name": "@userId", "value": user_id}]
-        query = f"SELECT * FROM c where c.userId = @userId and c.type='conversation' order by c.updatedAt {sort_order}"
+        query = f"{CONVERSATION_LIST_QUERY} order by c.updatedAt {sort_order}"
         if limit is not None:
-            query += f" offset {offset} limit {limit}"
+            query += f" offset {offset} limit {int(limit)}"
 
         conversations = []
         async for item in self.container_client.query_items(
-            query=query, parameters=parameters
+            query=query, parameters=parameters, partition_key=user_id,
+            response_hook=self._charge_hook("get_conversations"),
         ):
             conversations.append(item)
 
+        if first_page:
+            await cache.set(user_id, limit, conversations)
         return conversations
 
-    async def get_conversation(self, user_id, conversation_id):
-        parameters = [
-            {"name": "@conversationId", "value": conversation_id},
-            {"name": "@userId", "value": user_id},
-        ]
-        query = "SELECT * FROM c where c.id = @conversationId and c.type='conversation' and c.userId = @userId"
+    async def get_conversations_page(self, user_id, limit, cursor=None, sort_order="DESC"):
+        """
+        Get one page of conversations and the cursor of the next page.
+
+        The cursor wraps the Cosmos DB continuation token, so every page costs
+        the same however deep it is, unlike OFFSET which scans all the earlier
+        results. The cursor of the last page is None.
+
+        Raises:
+            ValueError: If the cursor is not one returned by this method.
+        """
+        cache = self.conversation_list_cache
+        first_page = cache is not None and not cursor and sort_order == "DESC"
+        if first_page:
+            cached = await cache.get(user_id, limit, with_cursor=True)
+            if cached is not None:
+                return cached["conversations"], cached["next_cursor"]
+
+        parameters = [{"name": "@userId", "value": user_id}]
+        query = f"{CONVERSATION_LIST_QUERY} order by c.updatedAt {sort_order}"
+        pages = self.container_client.query_items(
+            query=query, parameters=parameters, partition_key=user_id, max_item_count=limit,
+            response_hook=self._charge_hook("get_conversations_page"),
+        ).by_page(decode_cursor(cursor))
+
         conversations = []
-        async for item in self.container_client.query_items(
-            query=query, parameters=parameters
-        ):
-            conversations.append(item)
+        try:
+            async for page in pages:
+                async for item in page:
+                    conversations.append(item)
+                break
+        except exceptions.CosmosHttpResponseError as e:
+            # a malformed continuation token is rejected as a bad request
+            if cursor and e.status_code == 400:
+                raise ValueError("Invalid cursor") from e
+            raise
 
-        # if no conversations are found, return None
-        if len(conversations) == 0:
+        next_cursor = encode_cursor(pages.continuation_token)
+        if first_page:
+            await cache.set(user_id, limit, conversations, next_cursor)
+        return conversations, next_cursor
+
+    async def get_conversation(self, user_id, conversation_id):
+        """
+        Point read of a conversation of the user, None when there is no such conversation.
+
+        Within a request the result is memoized, see ``start_request_memo``.
+        """
+        memo = _conversation_memo.get()
+        key = (user_id, conversation_id)
+        if memo is not None and key in memo:
+            return memo[key]
+
+        try:
+            conversation = await self.container_client.read_item(
+                item=conversation_id, partition_key=user_id, response_hook=self._charge_hook("get_conversation")
+            )
+        except exceptions.CosmosResourceNotFoundError:
+            conversation = None
+        # the id could belong to another item type of the same partition
+        if conversation is not None and conversation.get("type") != "conversation":
+            conversation = None
+
+        if memo is not None:
+            memo[key] = conversation
+        return conversation
+
+    def _charge_hook(self, operation):
+        """
+        Return a ``response_hook`` recording the RU charge of each response of ``operation``.
+
+        The charge is read from the headers handed to the hook, which belong to
+        that response. The client's ``last_response_headers`` are shared by
+        every coroutine using the client and may already be another request's.
+        """
+        def response_hook(headers, result=None):
+            # query_items also calls the hook with the pager before any request is made
+            if isinstance(result, AsyncItemPaged):
+                return
+            self._report_request_charge(operation, (headers or {}).get(REQUEST_CHARGE_HEADER))
+        return response_hook
+
+    def _report_error_charge(self, operation, error):
+        # failed requests are charged too
+        self._report_request_charge(operation, (getattr(error, "headers", None) or {}).get(REQUEST_CHARGE_HEADER))
+
+    def _report_request_charge(self, operation, charge):
+        """
+        Record the RU charge of an operation.
+        """
+        try:
+            charge = float(charge)
+        except (TypeError, ValueError):
+            return
+        self.request_charges[operation] = self.request_charges.get(operation, 0.0) + charge
+        track_event_if_configured("CosmosRequestCharge", {"operation": operation, "request_charge": charge})
+
+    async def _touch_conversation(self, user_id, conversation_id, updated_at):
+        # update the parent conversations's updatedAt field with the current message's createdAt datetime value.
+        # Patched rather than read and rewritten so that concurrent updates, such as the title, are not lost
+        _forget_conversation(user_id, conversation_id)
+        try:
+            await self.container_client.patch_item(
+                item=conversation_id,
+                partition_key=user_id,
+                patch_operations=[{"op": "set", "path": "/updatedAt", "value": updated_at}],
+                response_hook=self._charge_hook("patch_conversation"),
+            )
+        except exceptions.CosmosResourceNotFoundError:
+            return False
+        if self.conversation_list_cache is not None:
+            await self.conversation_list_cache.touch(user_id, conversation_id, updated_at)
+        return True
+
+    async def _write_messages_batch(self, conversation_id, user_id, items):
+        """
+        Upsert the messages and patch the conversation's updatedAt in one transactional batch.
+
+        Returns the upserted messages, "Conversation not found" when the
+        conversation does not exist (nothing is written then), or None when
+        the batch could not run and the caller should fall back to separate
+        operations.
+        """
+        _forget_conversation(user_id, conversation_id)
+        batch_operations = [("upsert", (item,)) for item in items]
+        batch_operations.append((
+            "patch",
+            (conversation_id, [{"op": "set", "path": "/updatedAt", "value": items[-1]["createdAt"]}]),
+        ))
+        try:
+            results = await self.container_client.execute_item_batch(
+                batch_operations=batch_operations, partition_key=user_id,
+                response_hook=self._charge_hook("message_batch"),
+            )
+        except exceptions.CosmosBatchOperationError as e:
+            self._report_error_charge("message_batch", e)
+            failed = (e.operation_responses or [{}])[e.error_index or 0]
+            if e.error_index == len(items) and int(failed.get("statusCode", 0)) == 404:
+                return "Conversation not found"
+            logging.warning(f"Message batch failed at operation {e.error_index}, writing messages separately")
             return None
-        else:
-            return conversations[0]
+        except exceptions.CosmosHttpResponseError as e:
+            self._report_error_charge("message_batch", e)
+            logging.warning(f"Message batch could not run ({e.status_code}), writing messages separately")
+            return None
+
+        for (operation, _), result in zip(batch_operations, results):
+            self._report_request_charge(f"message_batch_{operation}", result.get("requestCharge"))
+        if self.conversation_list_cache is not None:
+            await self.conversation_list_cache.touch(user_id, conversation_id, items[-1]["createdAt"])
+        return [result.get("resourceBody") or item for result, item in zip(results, items)]
 
     async def create_message(self, uuid, conversation_id, user_id, input_message: dict):
-        message = {
-            "id": uuid,
-            "type": "message",
-            "userId": user_id,
-            "createdAt": datetime.utcnow().isoformat(),
-            "updatedAt": datetime.utcnow().isoformat(),
-            "conversationId": conversation_id,
-            "role": input_message["role"],
-            "content": input_message["content"],
-        }
+        message = self._new_message(uuid, conversation_id, user_id, input_message, datetime.utcnow().isoformat())
 
-        if self.enable_message_feedback:
-            message["feedback"] = ""
+        written = await self._write_messages_batch(conversation_id, user_id, [message])
+        if written is not None:
+            return written if isinstance(written, str) else written[0]
 
-        resp = await self.container_client.upsert_item(message)
+        # patch-only fallback: the message and the conversation's updatedAt in two operations
+        resp = await self.container_client.upsert_item(message, response_hook=self._charge_hook("upsert_message"))
         if resp:
-            # update the parent conversations's updatedAt field with the current message's createdAt datetime value
-            conversation = await self.get_conversation(user_id, conversation_id)
-            if not conversation:
+            if not await self._touch_conversation(user_id, conversation_id, message["createdAt"]):
                 return "Conversation not found"
-            conversation["updatedAt"] = message["createdAt"]
-            await self.upsert_conversation(conversation)
             return resp
         else:
             return False
 
+    async def create_messages(self, conversation_id, user_id, messages):
+        """
+        Write several messages of a conversation.
+
+        ``messages`` is a list of ``(uuid, input_message)`` pairs in
+        conversation order. Their createdAt timestamps increase in that order,
+        so reads ordered by createdAt return them in sequence. The messages and
+        the conversation's updatedAt are written in one transactional batch,
+        falling back to concurrent upserts and a single patch.
+        """
+        items = self._new_messages(conversation_id, user_id, messages)
+        if not items:
+            return False
+
+        if len(items) < MAX_BATCH_OPERATIONS:
+            written = await self._write_messages_batch(conversation_id, user_id, items)
+            if written is not None:
+                return written
+
+        charge_hook = self._charge_hook("upsert_message")
+        responses = await asyncio.gather(*(
+            self.container_client.upsert_item(item, response_hook=charge_hook) for item in items
+        ))
+        if not all(responses):
+            return False
+        if not await self._touch_conversation(user_id, conversation_id, items[-1]["createdAt"]):
+            return "Conversation not found"
+        return responses
+
     async def update_message_feedback(self, user_id, message_id, feedback):
         message = await self.container_client.read_item(
-            item=message_id, partition_key=user_id
+            item=message_id, partition_key=user_id, response_hook=self._charge_hook("read_message")
         )
         if message:
             message["feedback"] = feedback
-            resp = await self.container_client.upsert_item(message)
+            resp = await self.container_client.upsert_item(message, response_hook=self._charge_hook("upsert_message"))
             return resp
         else:
             return False
 
-    async def get_messages(self, user_id, conversation_id):
+    async def get_messages(self, user_id, conversation_id, limit=None, before=None):
+        """
+        Iterate over the messages of a conversation, oldest first.
+
+        With ``limit`` only the newest ``limit`` messages before ``before``
+        (a ``(createdAt, id)`` pair, optional) are returned, so the tail of
+        a long conversation can be loaded first and older messages page by page.
+        Ordering by createdAt and id needs the composite index of the container.
+        """
         parameters = [
             {"name": "@conversationId", "value": conversation_id},
             {"name": "@userId", "value": user_id},
         ]
-        query = "SELECT * FROM c WHERE c.conversationId = @conversationId AND c.type='message' AND c.userId = @userId ORDER BY c.timestamp ASC"
-        messages = []
-        async for item in self.container_client.query_items(
-            query=query, parameters=parameters
-        ):
-            messages.append(item)
+        condition = "c.conversationId = @conversationId AND c.type='message' AND c.userId = @userId"
+        if before is not None:
+            before_created_at, before_id = before
+            parameters.append({"name": "@beforeCreatedAt", "value": before_created_at})
+            parameters.append({"name": "@beforeId", "value": before_id})
+            condition += (
+                " AND (c.createdAt < @beforeCreatedAt OR (c.createdAt = @beforeCreatedAt AND c.id < @beforeId))"
+            )
+
+        if limit is None:
+            query = f"SELECT {MESSAGE_QUERY_FIELDS} FROM c WHERE {condition} ORDER BY c.createdAt ASC, c.id ASC"
+            async for item in self.container_client.query_items(
+                query=query, parameters=parameters, partition_key=user_id,
+                response_hook=self._charge_hook("get_messages"),
+            ):
+                yield item
+            return
 
-        return messages
+        # newest first to apply the limit, then handed out in chronological order
+        parameters.append({"name": "@limit", "value": limit})
+        query = (
+            f"SELECT TOP @limit {MESSAGE_QUERY_FIELDS} FROM c WHERE {condition} "
+            "ORDER BY c.createdAt DESC, c.id DESC"
+        )
+        messages = [
+            item async for item in self.container_client.query_items(
+                query=query, parameters=parameters, partition_key=user_id,
+                response_hook=self._charge_hook("get_messages"),
+            )
+        ]
+        for item in reversed(messages):
+            yield item
@@ -0,0 +1,240 @@
+import base64
+import json
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+
+# Conversation fields returned by the conversation list
+CONVERSATION_LIST_FIELDS = ("id", "title", "createdAt", "updatedAt")
+
+# Message fields returned when reading a conversation
+MESSAGE_FIELDS = ("id", "role", "content", "createdAt", "feedback")
+
+# A running delete all job saves its progress every few seconds; one that has
+# not been updated for this long was lost with the process that ran it
+DELETE_JOB_STALE_SECONDS = 300
+
+
+def encode_cursor(value: str):
+    if not value:
+        return None
+    return base64.urlsafe_b64encode(value.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        return base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid cursor")
+
+
+def encode_keyset_cursor(conversation: dict):
+    # position after the given conversation in the updatedAt DESC, id DESC order
+    return encode_cursor(json.dumps([conversation["updatedAt"], conversation["id"]]))
+
+
+def decode_keyset_cursor(cursor):
+    value = decode_cursor(cursor)
+    if value is None:
+        return None
+    try:
+        updated_at, conversation_id = json.loads(value)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    return str(updated_at), str(conversation_id)
+
+
+def encode_message_cursor(message: dict):
+    # position before the given message in the createdAt, id order
+    return encode_cursor(json.dumps([message["createdAt"], message["id"]]))
+
+
+def decode_message_cursor(cursor):
+    """The (createdAt, id) of the message a cursor points before, None for no cursor."""
+    return decode_keyset_cursor(cursor)
+
+
+def is_stale_delete_job(job: dict, now=None) -> bool:
+    """Whether a delete all job still marked as running is no longer being run."""
+    if job.get("status") != "running" or not job.get("updatedAt"):
+        return False
+    now = now or datetime.utcnow()
+    return now - datetime.fromisoformat(job["updatedAt"]) > timedelta(seconds=DELETE_JOB_STALE_SECONDS)
+
+
+def project(item: dict, fields) -> dict:
+    """Keep the given fields of an item, skipping the ones it does not have."""
+    return {field: item[field] for field in fields if field in item}
+
+
+class HistoryStore(ABC):
+    """
+    Storage of the chat history: conversations, their messages and delete jobs.
+
+    Items belong to a user and are addressed by id within the user, the way
+    the Cosmos DB container partitions them by userId. Conversation lists are
+    ordered by updatedAt, newest first, and messages by createdAt.
+    """
+
+    enable_message_feedback = False
+
+    async def ensure(self):
+        """Check that the store is usable, returns a (success, message) pair."""
+        return True, "History store initialized successfully"
+
+    async def close(self):
+        pass
+
+    def _new_conversation(self, user_id, title="", conversation_id=None):
+        now = datetime.utcnow().isoformat()
+        return {
+            "id": conversation_id or str(uuid.uuid4()),
+            "type": "conversation",
+            "createdAt": now,
+            "updatedAt": now,
+            "userId": user_id,
+            "title": title,
+        }
+
+    def _new_message(self, uuid, conversation_id, user_id, input_message: dict, created_at: str):
+        message = {
+            "id": uuid,
+            "type": "message",
+            "userId": user_id,
+            "createdAt": created_at,
+            "updatedAt": created_at,
+            "conversationId": conversation_id,
+            "role": input_message["role"],
+            "content": input_message["content"],
+        }
+
+        if self.enable_message_feedback:
+            message["feedback"] = ""
+        return message
+
+    def _new_messages(self, conversation_id, user_id, messages):
+        # createdAt increases in conversation order, so reads ordered by createdAt return them in sequence
+        now = datetime.utcnow()
+        return [
+            self._new_message(message_id, conversation_id, user_id, input_message,
+                              (now + timedelta(microseconds=index)).isoformat())
+            for index, (message_id, input_message) in enumerate(messages)
+        ]
+
+    @abstractmethod
+    async def create_conversation(self, user_id, title="", conversation_id=None):
+        """Create a conversation, returns it or False."""
+
+    @abstractmethod
+    async def upsert_conversation(self, conversation):
+        """Write a whole conversation, returns it or False."""
+
+    @abstractmethod
+    async def update_conversation_title(self, user_id, conversation_id, title):
+        """Set the title of a conversation."""
+
+    @abstractmethod
+    async def delete_conversation(self, user_id, conversation_id):
+        """Delete a conversation, one that does not exist counts as deleted."""
+
+    @abstractmethod
+    async def get_conversations(self, user_id, limit, sort_order="DESC", offset=0):
+        """List conversations by offset, ``limit`` None lists all of them."""
+
+    @abstractmethod
+    async def get_conversations_page(self, user_id, limit, cursor=None, sort_order="DESC"):
+        """
+        Get one page of conversations and the cursor of the next page, None on the last page.
+
+        Raises:
+            ValueError: If the cursor is not one returned by this method.
+        """
+
+    @abstractmethod
+    async def get_conversation(self, user_id, conversation_id):
+        """Get a conversation of the user, None when there is no such conversation."""
+
+    @abstractmethod
+    async def create_message(self, uuid, conversation_id, user_id, input_message: dict):
+        """Add a message, returns it, "Conversation not found" or False."""
+
+    @abstractmethod
+    async def create_messages(self, conversation_id, user_id, messages):
+        """
+        Add several messages of a conversation, given as ``(uuid, input_message)`` pairs in order.
+
+        Returns the messages, "Conversation not found" or False.
+        """
+
+    @abstractmethod
+    async def update_message_feedback(self, user_id, message_id, feedback):
+        """Set the feedback of a message, returns it or False."""
+
+    @abstractmethod
+    def get_messages(self, user_id, conversation_id, limit=None, before=None):
+        """
+        Iterate over the messages of a conversation, oldest first.
+
+        With ``limit`` only the newest ``limit`` messages before ``before``
+        (a ``(createdAt, id)`` pair, optional) are returned. Messages are
+        ordered by createdAt then id, so messages created at the same time
+        are neither skipped nor repeated across pages.
+        """
+
+    @abstractmethod
+    async def get_item_ids(self, user_id, item_type, conversation_id=None):
+        """Ids of the user's items of a type, "conversation", "message" or "delete_job"."""
+
+    @abstractmethod
+    async def delete_items(self, user_id, item_ids, concurrency=None, on_progress=None):
+        """
+        Delete items of a user by id, returns the number of items processed.
+
+        ``on_progress`` is awaited with the number of items deleted as the deletion goes.
+        """
+
+    @abstractmethod
+    async def save_delete_job(self, user_id, job: dict):
+        """Write the state of a delete all job."""
+
+    @abstractmethod
+    async def get_delete_job(self, user_id, job_id):
+        """Get a delete all job of the user, None when there is no such job."""
+
+    async def delete_finished_delete_jobs(self, user_id):
+        """
+        Delete the delete all jobs of a user that are not running anymore.
+
+        Stores that cannot expire items, such as a Cosmos DB container
+        without time to live, otherwise keep every job forever.
+        """
+        job_ids = await self.get_item_ids(user_id, "delete_job")
+        jobs = [await self.get_delete_job(user_id, job_id) for job_id in job_ids]
+        finished = [
+            job["id"] for job in jobs
+            if job is not None and (job["status"] != "running" or is_stale_delete_job(job))
+        ]
+        return await self.delete_items(user_id, finished)
+
+    async def delete_messages(self, conversation_id, user_id):
+        message_ids = await self.get_item_ids(user_id, "message", conversation_id=conversation_id)
+        return await self.delete_items(user_id, message_ids)
+
+    async def delete_user_history(self, user_id, concurrency=None, on_progress=None,
+                                  message_ids=None, conversation_ids=None):
+        """
+        Delete all the messages and then all the conversations of a user.
+
+        Messages go first so that an interrupted run never leaves messages
+        whose conversation is gone. Ids that were already queried can be
+        passed in to skip the queries.
+        """
+        if message_ids is None:
+            message_ids = await self.get_item_ids(user_id, "message")
+        if conversation_ids is None:
+            conversation_ids = await self.get_item_ids(user_id, "conversation")
+        deleted = await self.delete_items(user_id, message_ids, concurrency, on_progress)
+        deleted += await self.delete_items(user_id, conversation_ids, concurrency, on_progress)
+        return deleted
@@ -0,0 +1,144 @@
+from datetime import datetime
+
+from backend.history.history_store import (CONVERSATION_LIST_FIELDS,
+                                           MESSAGE_FIELDS, HistoryStore,
+                                           decode_keyset_cursor,
+                                           encode_keyset_cursor, project)
+
+
+class InMemoryHistoryStore(HistoryStore):
+    """
+    Chat history kept in the memory of the worker process.
+
+    Meant for load tests and benchmarks of the history API and for single
+    worker deployments that do not need the history to survive a restart.
+    Every operation completes without awaiting, so no locking is needed.
+    """
+
+    def __init__(self, enable_message_feedback: bool = False):
+        self.enable_message_feedback = enable_message_feedback
+        # items of each user by id, like the partitions of the Cosmos DB container
+        self._partitions = {}
+
+    def _items(self, user_id) -> dict:
+        return self._partitions.setdefault(user_id, {})
+
+    def _get(self, user_id, item_id, item_type):
+        item = self._partitions.get(user_id, {}).get(item_id)
+        return item if item is not None and item["type"] == item_type else None
+
+    def _sorted_conversations(self, user_id, sort_order):
+        conversations = [item for item in self._items(user_id).values() if item["type"] == "conversation"]
+        conversations.sort(key=lambda c: (c["updatedAt"], c["id"]), reverse=sort_order == "DESC")
+        return conversations
+
+    def _touch_conversation(self, user_id, conversation_id, updated_at):
+        conversation = self._get(user_id, conversation_id, "conversation")
+        if conversation is None:
+            return False
+        conversation["updatedAt"] = updated_at
+        return True
+
+    async def create_conversation(self, user_id, title="", conversation_id=None):
+        conversation = self._new_conversation(user_id, title, conversation_id)
+        self._items(user_id)[conversation["id"]] = conversation
+        return dict(conversation)
+
+    async def upsert_conversation(self, conversation):
+        self._items(conversation["userId"])[conversation["id"]] = dict(conversation)
+        return dict(conversation)
+
+    async def update_conversation_title(self, user_id, conversation_id, title):
+        conversation = self._get(user_id, conversation_id, "conversation")
+        if conversation is None:
+            return None
+        conversation["title"] = title
+        return dict(conversation)
+
+    async def delete_conversation(self, user_id, conversation_id):
+        if self._get(user_id, conversation_id, "conversation") is not None:
+            del self._items(user_id)[conversation_id]
+        return True
+
+    async def get_conversations(self, user_id, limit, sort_order="DESC", offset=0):
+        conversations = self._sorted_conversations(user_id, sort_order)
+        offset = int(offset)
+        if limit is not None:
+            conversations = conversations[offset:offset + limit]
+        return [project(c, CONVERSATION_LIST_FIELDS) for c in conversations]
+
+    async def get_conversations_page(self, user_id, limit, cursor=None, sort_order="DESC"):
+        conversations = self._sorted_conversations(user_id, sort_order)
+        after = decode_keyset_cursor(cursor)
+        if after is not None:
+            if sort_order == "DESC":
+                conversations = [c for c in conversations if (c["updatedAt"], c["id"]) < after]
+            else:
+                conversations = [c for c in conversations if (c["updatedAt"], c["id"]) > after]
+
+        page = conversations[:limit]
+        next_cursor = encode_keyset_cursor(page[-1]) if len(conversations) > limit else None
+        return [project(c, CONVERSATION_LIST_FIELDS) for c in page], next_cursor
+
+    async def get_conversation(self, user_id, conversation_id):
+        conversation = self._get(user_id, conversation_id, "conversation")
+        return dict(conversation) if conversation is not None else None
+
+    async def create_message(self, uuid, conversation_id, user_id, input_message: dict):
+        message = self._new_message(uuid, conversation_id, user_id, input_message, datetime.utcnow().isoformat())
+        if not self._touch_conversation(user_id, conversation_id, message["createdAt"]):
+            return "Conversation not found"
+        self._items(user_id)[message["id"]] = message
+        return dict(message)
+
+    async def create_messages(self, conversation_id, user_id, messages):
+        items = self._new_messages(conversation_id, user_id, messages)
+        if not items:
+            return False
+        if not self._touch_conversation(user_id, conversation_id, items[-1]["createdAt"]):
+            return "Conversation not found"
+        for item in items:
+            self._items(user_id)[item["id"]] = item
+        return [dict(item) for item in items]
+
+    async def update_message_feedback(self, user_id, message_id, feedback):
+        message = self._get(user_id, message_id, "message")
+        if message is None:
+            return False
+        message["feedback"] = feedback
+        return dict(message)
+
+    async def get_messages(self, user_id, conversation_id, limit=None, before=None):
+        messages = [
+            item for item in self._items(user_id).values()
+            if item["type"] == "message" and item["conversationId"] == conversation_id
+            and (before is None or (item["createdAt"], item["id"]) < tuple(before))
+        ]
+        messages.sort(key=lambda m: (m["createdAt"], m["id"]))
+        if limit is not None:
+            messages = messages[-limit:]
+        for message in messages:
+            yield project(message, MESSAGE_FIELDS)
+
+    async def get_item_ids(self, user_id, item_type, conversation_id=None):
+        return [
+            item["id"] for item in self._items(user_id).values()
+            if item["type"] == item_type and (conversation_id is None or item.get("conversationId") == conversation_id)
+        ]
+
+    async def delete_items(self, user_id, item_ids, concurrency=None, on_progress=None):
+        items = self._items(user_id)
+        for item_id in item_ids:
+            items.pop(item_id, None)
+        if on_progress is not None and item_ids:
+            await on_progress(len(item_ids))
+        return len(item_ids)
+
+    async def save_delete_job(self, user_id, job: dict):
+        job = {**job, "type": "delete_job", "userId": user_id, "updatedAt": datetime.utcnow().isoformat()}
+        self._items(user_id)[job["id"]] = job
+        return dict(job)
+
+    async def get_delete_job(self, user_id, job_id):
+        job = self._get(user_id, job_id, "delete_job")
+        return dict(job) if job is not None else None
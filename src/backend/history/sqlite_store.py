@@ -0,0 +1,248 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import aiosqlite
+
+from backend.history.history_store import (CONVERSATION_LIST_FIELDS,
+                                           MESSAGE_FIELDS, HistoryStore,
+                                           decode_keyset_cursor,
+                                           encode_keyset_cursor, project)
+
+# Items are stored as JSON documents, the columns next to them are what queries filter and sort on
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    user_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    conversation_id TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    body TEXT NOT NULL,
+    PRIMARY KEY (user_id, id)
+);
+CREATE INDEX IF NOT EXISTS items_by_updated_at ON items (user_id, type, updated_at, id);
+CREATE INDEX IF NOT EXISTS items_by_conversation ON items (user_id, conversation_id, type, created_at);
+"""
+
+# Seconds a write waits for another worker's transaction on the same file
+BUSY_TIMEOUT_SECONDS = 5
+
+
+class SQLiteHistoryStore(HistoryStore):
+    """
+    Chat history in a SQLite file.
+
+    The file can be shared by the workers of a single node. It runs in WAL
+    mode so that readers do not block the writer.
+    """
+
+    def __init__(self, path: str, enable_message_feedback: bool = False):
+        self.path = path
+        self.enable_message_feedback = enable_message_feedback
+        self._connection = None
+        self._connect_lock = asyncio.Lock()
+        # the connection is shared, so its write transactions run one at a time
+        self._write_lock = asyncio.Lock()
+
+    async def _db(self) -> aiosqlite.Connection:
+        if self._connection is None:
+            async with self._connect_lock:
+                if self._connection is None:
+                    connection = await aiosqlite.connect(self.path, timeout=BUSY_TIMEOUT_SECONDS)
+                    connection.row_factory = aiosqlite.Row
+                    await connection.execute("PRAGMA journal_mode=WAL")
+                    await connection.executescript(SCHEMA)
+                    await connection.commit()
+                    self._connection = connection
+        return self._connection
+
+    @asynccontextmanager
+    async def _transaction(self):
+        db = await self._db()
+        async with self._write_lock:
+            try:
+                yield db
+            except BaseException:
+                await db.rollback()
+                raise
+            await db.commit()
+
+    async def ensure(self):
+        try:
+            db = await self._db()
+            await db.execute("SELECT 1")
+        except Exception as e:
+            return False, f"SQLite history store {self.path} not working: {e}"
+        return True, "SQLite history store initialized successfully"
+
+    async def close(self):
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+    async def _write(self, db, item: dict):
+        await db.execute(
+            "INSERT OR REPLACE INTO items (user_id, id, type, conversation_id, created_at, updated_at, body) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (item["userId"], item["id"], item["type"], item.get("conversationId"),
+             item.get("createdAt", ""), item.get("updatedAt", ""), json.dumps(item)),
+        )
+
+    async def _read(self, user_id, item_id, item_type):
+        db = await self._db()
+        async with db.execute(
+            "SELECT body FROM items WHERE user_id = ? AND id = ? AND type = ?", (user_id, item_id, item_type)
+        ) as cursor:
+            row = await cursor.fetchone()
+        return json.loads(row["body"]) if row else None
+
+    async def _set_fields(self, db, user_id, item_id, item_type, **fields):
+        # updates single fields in place, so that concurrent updates of other fields are not lost
+        assignments = ", ".join("body = json_set(body, ?, ?)" for _ in fields)
+        parameters = [value for name, value in fields.items() for value in (f"$.{name}", value)]
+        columns = ""
+        if "updatedAt" in fields:
+            columns = ", updated_at = ?"
+            parameters.append(fields["updatedAt"])
+        cursor = await db.execute(
+            f"UPDATE items SET {assignments}{columns} WHERE user_id = ? AND id = ? AND type = ?",
+            (*parameters, user_id, item_id, item_type),
+        )
+        return cursor.rowcount > 0
+
+    async def create_conversation(self, user_id, title="", conversation_id=None):
+        conversation = self._new_conversation(user_id, title, conversation_id)
+        async with self._transaction() as db:
+            await self._write(db, conversation)
+        return conversation
+
+    async def upsert_conversation(self, conversation):
+        async with self._transaction() as db:
+            await self._write(db, conversation)
+        return conversation
+
+    async def update_conversation_title(self, user_id, conversation_id, title):
+        async with self._transaction() as db:
+            updated = await self._set_fields(db, user_id, conversation_id, "conversation", title=title)
+        return await self.get_conversation(user_id, conversation_id) if updated else None
+
+    async def delete_conversation(self, user_id, conversation_id):
+        async with self._transaction() as db:
+            await db.execute(
+                "DELETE FROM items WHERE user_id = ? AND id = ? AND type = 'conversation'", (user_id, conversation_id)
+            )
+        return True
+
+    async def _query_conversations(self, sql, parameters):
+        db = await self._db()
+        async with db.execute(sql, parameters) as cursor:
+            rows = await cursor.fetchall()
+        return [project(json.loads(row["body"]), CONVERSATION_LIST_FIELDS) for row in rows]
+
+    async def get_conversations(self, user_id, limit, sort_order="DESC", offset=0):
+        order = "DESC" if sort_order == "DESC" else "ASC"
+        sql = (
+            "SELECT body FROM items WHERE user_id = ? AND type = 'conversation' "
+            f"ORDER BY updated_at {order}, id {order}"
+        )
+        parameters = [user_id]
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            parameters += [limit, int(offset)]
+        return await self._query_conversations(sql, parameters)
+
+    async def get_conversations_page(self, user_id, limit, cursor=None, sort_order="DESC"):
+        # keyset paging on the (updated_at, id) index, every page is an index range scan
+        order, comparison = ("DESC", "<") if sort_order == "DESC" else ("ASC", ">")
+        condition = "user_id = ? AND type = 'conversation'"
+        parameters = [user_id]
+        after = decode_keyset_cursor(cursor)
+        if after is not None:
+            condition += f" AND (updated_at, id) {comparison} (?, ?)"
+            parameters += list(after)
+
+        conversations = await self._query_conversations(
+            f"SELECT body FROM items WHERE {condition} ORDER BY updated_at {order}, id {order} LIMIT ?",
+            parameters + [limit + 1],
+        )
+        next_cursor = encode_keyset_cursor(conversations[limit - 1]) if len(conversations) > limit else None
+        return conversations[:limit], next_cursor
+
+    async def get_conversation(self, user_id, conversation_id):
+        return await self._read(user_id, conversation_id, "conversation")
+
+    async def create_message(self, uuid, conversation_id, user_id, input_message: dict):
+        messages = await self.create_messages(conversation_id, user_id, [(uuid, input_message)])
+        return messages if isinstance(messages, str) else messages[0]
+
+    async def create_messages(self, conversation_id, user_id, messages):
+        items = self._new_messages(conversation_id, user_id, messages)
+        if not items:
+            return False
+
+        # the messages and the conversation's updatedAt in one transaction
+        async with self._transaction() as db:
+            if not await self._set_fields(db, user_id, conversation_id, "conversation",
+                                          updatedAt=items[-1]["createdAt"]):
+                return "Conversation not found"
+            for item in items:
+                await self._write(db, item)
+        return items
+
+    async def update_message_feedback(self, user_id, message_id, feedback):
+        async with self._transaction() as db:
+            updated = await self._set_fields(db, user_id, message_id, "message", feedback=feedback)
+        return await self._read(user_id, message_id, "message") if updated else False
+
+    async def get_messages(self, user_id, conversation_id, limit=None, before=None):
+        condition = "user_id = ? AND conversation_id = ? AND type = 'message'"
+        parameters = [user_id, conversation_id]
+        if before is not None:
+            before_created_at, before_id = before
+            condition += " AND (created_at < ? OR (created_at = ? AND id < ?))"
+            parameters.extend([before_created_at, before_created_at, before_id])
+
+        if limit is None:
+            sql = f"SELECT body FROM items WHERE {condition} ORDER BY created_at ASC, id ASC"
+        else:
+            # newest first to apply the limit, then handed out in chronological order
+            sql = (
+                f"SELECT body FROM (SELECT body, created_at, id FROM items WHERE {condition} "
+                "ORDER BY created_at DESC, id DESC LIMIT ?) ORDER BY created_at ASC, id ASC"
+            )
+            parameters.append(limit)
+
+        db = await self._db()
+        async with db.execute(sql, parameters) as cursor:
+            async for row in cursor:
+                yield project(json.loads(row["body"]), MESSAGE_FIELDS)
+
+    async def get_item_ids(self, user_id, item_type, conversation_id=None):
+        sql = "SELECT id FROM items WHERE user_id = ? AND type = ?"
+        parameters = [user_id, item_type]
+        if conversation_id is not None:
+            sql += " AND conversation_id = ?"
+            parameters.append(conversation_id)
+        db = await self._db()
+        async with db.execute(sql, parameters) as cursor:
+            return [row["id"] for row in await cursor.fetchall()]
+
+    async def delete_items(self, user_id, item_ids, concurrency=None, on_progress=None):
+        async with self._transaction() as db:
+            await db.executemany(
+                "DELETE FROM items WHERE user_id = ? AND id = ?", [(user_id, item_id) for item_id in item_ids]
+            )
+        if on_progress is not None and item_ids:
+            await on_progress(len(item_ids))
+        return len(item_ids)
+
+    async def save_delete_job(self, user_id, job: dict):
+        job = {**job, "type": "delete_job", "userId": user_id, "updatedAt": datetime.utcnow().isoformat()}
+        async with self._transaction() as db:
+            await self._write(db, job)
+        return job
+
+    async def get_delete_job(self, user_id, job_id):
+        return await self._read(user_id, job_id, "delete_job")
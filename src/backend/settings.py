@@ -42,11 +42,74 @@ class _ChatHistorySettings(BaseSettings):
         env_ignore_empty=True,
     )
 
-    database: str
-    account: str
+    # Where the history is kept: Cosmos DB, the memory of each worker, or a SQLite file
+    backend: Literal["cosmosdb", "memory", "sqlite"] = Field(
+        default="cosmosdb", validation_alias="CHAT_HISTORY_BACKEND"
+    )
+    sqlite_path: str = Field(default="chat_history.db", validation_alias="CHAT_HISTORY_SQLITE_PATH")
+    database: Optional[str] = None
+    account: Optional[str] = None
     account_key: Optional[str] = None
-    conversations_container: str
+    conversations_container: Optional[str] = None
     enable_feedback: bool = False
+    health_check_interval_seconds: int = 300
+    delete_concurrency: int = 4
+    delete_all_background_threshold: int = 1000
+
+    @model_validator(mode="after")
+    def validate_cosmosdb_settings(self) -> Self:
+        if self.backend == "cosmosdb" and not (self.database and self.account and self.conversations_container):
+            raise ValueError("database, account and conversations_container are required for the cosmosdb backend")
+        return self
+
+
+class _SectionCacheSettings(BaseSettings):
+    model_config = SettingsConfigDict(
+        env_prefix="SECTION_CACHE_",
+        env_file=DOTENV_PATH,
+        extra="ignore",
+        env_ignore_empty=True,
+    )
+
+    enabled: bool = True
+    max_entries: int = 512
+    ttl_seconds: int = 86400
+    sqlite_path: Optional[str] = None
+    # Bump after reindexing the search index to stop serving cached sections
+    index_version: str = "1"
+
+
+class _ConversationListCacheSettings(BaseSettings):
+    model_config = SettingsConfigDict(
+        env_prefix="CONVERSATION_LIST_CACHE_",
+        env_file=DOTENV_PATH,
+        extra="ignore",
+        env_ignore_empty=True,
+    )
+
+    enabled: bool = True
+    max_entries: int = 1024
+    # Kept short so that workers without a shared sqlite_path catch up with each other's writes
+    ttl_seconds: int = 30
+    # A SQLite file shared by all the workers on the host, instead of a cache per worker
+    sqlite_path: Optional[str] = None
+
+
+class _CitationContentSettings(BaseSettings):
+    model_config = SettingsConfigDict(
+        env_prefix="CITATION_CONTENT_",
+        env_file=DOTENV_PATH,
+        extra="ignore",
+        env_ignore_empty=True,
+    )
+
+    cache_max_entries: int = 256
+    cache_ttl_seconds: int = 600
+    timeout_seconds: int = 10
+    connection_limit: int = 20
+    # Citations fetched at once by /fetch-azure-search-content/batch
+    batch_concurrency: int = 4
+    batch_max_size: int = 20
 
 
 class _PromptflowSettings(BaseSettings):
@@ -118,6 +181,8 @@ class _AzureOpenAISettings(BaseSettings):
     title_prompt: str = (
         'Summarize the conversation so far into a 4-word or less title. Do not use any quotation marks or punctuation. Respond with a json object in the format {{"title": string}}. Do not include any other commentary or description.'
     )
+    # local: keyword title only, llm: model title, local_then_llm: keyword title upgraded by the model in the background
+    title_mode: Literal["local", "llm", "local_then_llm"] = "local"
 
     @field_validator("tools", mode="before")
     @classmethod
@@ -196,6 +261,9 @@ class _AzureAISettings(BaseSettings):
     agent_endpoint: Optional[str] = None
     agent_model_deployment_name: Optional[str] = None
     agent_api_version: Optional[str] = None
+    thread_pool_size: int = 4
+    thread_pool_max_idle_seconds: int = 600
+    section_generation_concurrency: int = 4
 
 
 class _SearchCommonSettings(BaseSettings):
@@ -314,7 +382,8 @@ class _AzureSearchSettings(BaseSettings, DatasourcePayloadConstructor):
     def set_query_type(self) -> Self:
         self.query_type = to_snake(self.query_type)
 
-    def _set_filter_string(self, request: Request) -> str:
+    async def resolve_filter(self, request: Request) -> Optional[str]:
+        """Document-level access filter for the user of the request, None when it is disabled."""
         if self.permitted_groups_column:
             user_token = request.headers.get("X-MS-TOKEN-AAD-ACCESS-TOKEN", "")
             logging.debug(
@@ -324,16 +393,16 @@ class _AzureSearchSettings(BaseSettings, DatasourcePayloadConstructor):
                     "Document-level access control is enabled, but user access token could not be fetched."
                 )
 
-            filter_string = generateFilterString(user_token)
+            filter_string = await generateFilterString(user_token)
             logging.debug(f"FILTER: {filter_string}")
             return filter_string
 
         return None
 
     def construct_payload_configuration(self, *args, **kwargs):
-        request = kwargs.pop("request", None)
-        if request and self.permitted_groups_column:
-            self.filter = self._set_filter_string(request)
+        # the per-user filter is resolved beforehand with resolve_filter and
+        # never stored on these settings, which are shared by all requests
+        user_filter = kwargs.pop("filter", None)
 
         self.embedding_dependency = (
             self._settings.azure_openai.extract_embedding_dependency()
@@ -342,6 +411,8 @@ class _AzureSearchSettings(BaseSettings, DatasourcePayloadConstructor):
         parameters.update(
             self._settings.search.model_dump(exclude_none=True, by_alias=True)
         )
+        if user_filter:
+            parameters["filter"] = user_filter
 
         return {"type": self._type, "parameters": parameters}
 
@@ -366,6 +437,9 @@ class _AppSettings(BaseModel):
     azure_openai: _AzureOpenAISettings = _AzureOpenAISettings()
     azure_ai: _AzureAISettings = _AzureAISettings()
     search: _SearchCommonSettings = _SearchCommonSettings()
+    section_cache: _SectionCacheSettings = _SectionCacheSettings()
+    conversation_list_cache: _ConversationListCacheSettings = _ConversationListCacheSettings()
+    citation_content: _CitationContentSettings = _CitationContentSettings()
     ui: Optional[_UiSettings] = _UiSettings()
 
     # Constructed properties
@@ -0,0 +1,205 @@
+import asyncio
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from typing import Dict, Optional
+
+from quart import Response, send_file
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - in-memory bodies are then only gzipped
+    brotli = None
+
+# Content encodings in order of preference, with the suffix of the
+# precompressed files written next to the assets by the frontend build
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+# Vite names the files it emits "<name>-<8 character hash>.<ext>"
+HASHED_ASSET_PATTERN = re.compile(r"-[A-Za-z0-9_-]{8}\.[A-Za-z0-9]+$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Revalidated with the ETag on every use
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Bodies smaller than this are not worth compressing
+COMPRESS_MIN_SIZE = 1024
+
+
+def parse_accept_encoding(header: Optional[str]) -> Dict[str, float]:
+    """Map each coding of an Accept-Encoding header to its q-value."""
+    codings = {}
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        codings[coding] = quality
+    return codings
+
+
+def choose_encoding(accept_encoding: Optional[str], available) -> Optional[str]:
+    """The preferred encoding among ``available`` accepted by the client, None for identity."""
+    codings = parse_accept_encoding(accept_encoding)
+    for encoding in ENCODING_SUFFIXES:
+        if encoding in available and codings.get(encoding, codings.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+def _etag(digest: str, encoding: Optional[str]) -> str:
+    # each encoding is a different representation and gets its own strong ETag
+    return f'"{digest}-{encoding}"' if encoding else f'"{digest}"'
+
+
+def _matches(if_none_match: Optional[str], digest: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        # weak comparison, a client holding any encoding of the body is current
+        if tag.strip('"').split("-", 1)[0] == digest:
+            return True
+    return False
+
+
+def _not_modified(etag: str, cache_control: str) -> Response:
+    response = Response(b"", status=304)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
+
+
+class StaticAsset:
+    """A file of the frontend build and its precompressed variants."""
+
+    def __init__(self, path: str, stat: os.stat_result):
+        self.path = path
+        self.mtime_ns = stat.st_mtime_ns
+        self.size = stat.st_size
+        self.mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        with open(path, "rb") as file:
+            self.digest = hashlib.sha256(file.read()).hexdigest()[:16]
+        self.variants = {
+            encoding: path + suffix
+            for encoding, suffix in ENCODING_SUFFIXES.items()
+            if os.path.isfile(path + suffix)
+        }
+        hashed = HASHED_ASSET_PATTERN.search(os.path.basename(path)) is not None
+        self.cache_control = IMMUTABLE_CACHE_CONTROL if hashed else REVALIDATE_CACHE_CONTROL
+
+
+class StaticAssets:
+    """
+    Serves the built frontend assets of a directory.
+
+    Each file is hashed once for its ETag and looked up with the ``.br`` and
+    ``.gz`` variants produced by the frontend build, which are served to the
+    clients that accept them. Hashed file names never change content and are
+    cached by browsers for a year; other files are revalidated. Files are read
+    and hashed in a thread, off the event loop.
+    """
+
+    def __init__(self, directory: str):
+        self._directory = directory
+        self._assets: Dict[str, StaticAsset] = {}
+
+    async def preload(self):
+        """Hash every file of the directory ahead of the first requests."""
+        await asyncio.to_thread(self._preload)
+
+    def _preload(self):
+        for root, _, files in os.walk(self._directory):
+            for name in files:
+                full_path = os.path.join(root, name)
+                if not name.endswith(tuple(ENCODING_SUFFIXES.values())):
+                    self._assets[full_path] = StaticAsset(full_path, os.stat(full_path))
+
+    async def get(self, path: str) -> Optional[StaticAsset]:
+        full_path = safe_join(self._directory, path)
+        if full_path is None or path.endswith(tuple(ENCODING_SUFFIXES.values())):
+            return None
+        try:
+            stat = os.stat(full_path)
+        except OSError:
+            self._assets.pop(full_path, None)
+            return None
+        asset = self._assets.get(full_path)
+        # a rebuild of the frontend replaces the file
+        if asset is None or asset.mtime_ns != stat.st_mtime_ns or asset.size != stat.st_size:
+            if not os.path.isfile(full_path):
+                return None
+            asset = self._assets[full_path] = await asyncio.to_thread(StaticAsset, full_path, stat)
+        return asset
+
+    async def send(self, path: str, headers) -> Optional[Response]:
+        """Response for the asset at ``path`` given the request headers, None when there is no such file."""
+        asset = await self.get(path)
+        if asset is None:
+            return None
+        encoding = choose_encoding(headers.get("Accept-Encoding"), asset.variants)
+        etag = _etag(asset.digest, encoding)
+        if _matches(headers.get("If-None-Match"), asset.digest):
+            return _not_modified(etag, asset.cache_control)
+
+        response = await send_file(
+            asset.variants[encoding] if encoding else asset.path,
+            mimetype=asset.mimetype,
+            add_etags=False,
+        )
+        # caching is governed by Cache-Control alone
+        response.headers.pop("Expires", None)
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = asset.cache_control
+        response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+
+class PrecomputedResponse:
+    """
+    A response body built once, kept with its compressed variants and ETag.
+
+    Used for the pages and payloads that only depend on the configuration,
+    so that serving them costs no rendering or serialization.
+    """
+
+    def __init__(self, body: bytes, mimetype: str, cache_control: str = REVALIDATE_CACHE_CONTROL):
+        self.mimetype = mimetype
+        self.cache_control = cache_control
+        self.digest = hashlib.sha256(body).hexdigest()[:16]
+        self.bodies = {None: body}
+        if len(body) >= COMPRESS_MIN_SIZE:
+            self.bodies["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+            if brotli is not None:
+                self.bodies["br"] = brotli.compress(body)
+
+    def send(self, headers) -> Response:
+        encoding = choose_encoding(headers.get("Accept-Encoding"), self.bodies)
+        etag = _etag(self.digest, encoding)
+        if _matches(headers.get("If-None-Match"), self.digest):
+            return _not_modified(etag, self.cache_control)
+
+        response = Response(self.bodies[encoding], mimetype=self.mimetype)
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = self.cache_control
+        response.headers["Vary"] = "Accept-Encoding"
+        return response
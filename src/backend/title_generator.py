@@ -0,0 +1,74 @@
+import re
+from collections import Counter
+
+# Title modes for new conversations
+TITLE_MODE_LOCAL = "local"
+TITLE_MODE_LLM = "llm"
+TITLE_MODE_LOCAL_THEN_LLM = "local_then_llm"
+
+MAX_TITLE_WORDS = 4
+DEFAULT_TITLE = "New conversation"
+
+_WORD_PATTERN = re.compile(r"[^\W_]+(?:['’-][^\W_]+)*")
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below
+between both but by can could create did do does doing down draft during each explain few find for from
+further generate get give had has have having he her here hers herself him himself his how i if in into
+is it its itself just let like list me more most my myself need no nor not now of off on once only or
+other our ours ourselves out over own please same she should show so some summarize summary tell than
+that the their theirs them themselves then there these they this those through to too under until up
+us very want was we were what when where which while who whom why will with would write you your yours
+yourself yourselves
+""".split())
+
+
+def _user_text(conversation_messages):
+    # first user message, or the last message if there is none
+    for message in conversation_messages:
+        if message.get("role") == "user" and message.get("content"):
+            return message["content"]
+    if conversation_messages:
+        return conversation_messages[-1].get("content") or ""
+    return ""
+
+
+def generate_local_title(conversation_messages, max_words: int = MAX_TITLE_WORDS) -> str:
+    """
+    Build a conversation title from keywords of the first user message.
+
+    Words are ranked by how often they occur, ties keeping the order in which
+    they first appear, after dropping stop words, numbers-only tokens and one
+    letter words. The chosen keywords are emitted in their original order.
+    Falls back to the first words of the message when it has no keywords.
+    """
+    text = str(_user_text(conversation_messages))
+    words = _WORD_PATTERN.findall(text)
+    if not words:
+        return DEFAULT_TITLE
+
+    first_seen = {}
+    counts = Counter()
+    spelling = {}
+    for position, word in enumerate(words):
+        key = word.casefold()
+        if key in STOPWORDS or len(key) < 2 or key.isdigit():
+            continue
+        counts[key] += 1
+        if key not in first_seen:
+            first_seen[key] = position
+            spelling[key] = word
+
+    if not counts:
+        return " ".join(words[:max_words])
+
+    keywords = sorted(counts, key=lambda key: (-counts[key], first_seen[key]))[:max_words]
+    keywords.sort(key=first_seen.get)
+    return " ".join(_capitalize(spelling[key]) for key in keywords)
+
+
+def _capitalize(word: str) -> str:
+    # keep acronyms and mixed case words such as "NDA" or "iPhone" as written
+    if word.islower():
+        return word[0].upper() + word[1:]
+    return word
@@ -1,13 +1,23 @@
+import asyncio
 import dataclasses
 import json
 import logging
 import os
 from enum import Enum
 from typing import List
-import requests
 import uuid
 import time
 
+from quart.json.provider import DefaultJSONProvider
+
+from backend.auth.group_resolver import group_resolver
+from backend.citations import CitationSet
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - the stdlib encoder is used instead
+    orjson = None
+
 DEBUG = os.environ.get("DEBUG", "false")
 if DEBUG.lower() == "true":
     logging.basicConfig(level=logging.DEBUG)
@@ -16,6 +26,12 @@ AZURE_SEARCH_PERMITTED_GROUPS_COLUMN = os.environ.get(
     "AZURE_SEARCH_PERMITTED_GROUPS_COLUMN"
 )
 
+# Stream protocols for /conversation, negotiated with the "stream_protocol"
+# request field or the X-Stream-Protocol header
+STREAM_PROTOCOL_FULL = "full"
+STREAM_PROTOCOL_COMPACT = "compact"
+STREAM_PROTOCOL_HEADER = "X-Stream-Protocol"
+
 
 class ChatType(Enum):
     TEMPLATE = "template"
@@ -29,59 +45,104 @@ class JSONEncoder(json.JSONEncoder):
         return super().default(o)
 
 
+def _orjson_default(o):
+    # orjson serializes dataclasses natively, anything else it cannot handle
+    # goes through the same fallbacks as the stdlib encoder
+    return JSONEncoder().default(o)
+
+
+def dumps_json(obj) -> str:
+    """
+    Serialize an object to compact JSON.
+
+    Uses orjson when it is installed and the stdlib encoder otherwise. Both
+    produce the same compact, UTF-8 (non ASCII-escaped) output.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(obj, cls=JSONEncoder, ensure_ascii=False, separators=(",", ":"))
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Quart JSON provider backed by orjson when it is installed.
+
+    Used for ``jsonify``, ``request.get_json`` and JSON responses. Calls that
+    ask for options orjson does not support, such as a custom encoder class,
+    fall back to the default provider.
+    """
+
+    def dumps(self, obj, **kwargs) -> str:
+        if orjson is None or kwargs.get("cls") is not None or kwargs.get("indent") not in (None, 2):
+            return super().dumps(obj, **kwargs)
+        # datetimes go through the default handler, which writes them as HTTP
+        # dates like the default provider rather than as ISO 8601
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if kwargs.get("indent") == 2:
+            option |= orjson.OPT_INDENT_2
+        if kwargs.get("sort_keys", self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=kwargs.get("default", self.default), option=option).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+
 async def format_as_ndjson(r):
     try:
         async for event in r:
-            yield json.dumps(event, cls=JSONEncoder) + "\n"
+            yield dumps_json(event) + "\n"
     except Exception as error:
         logging.exception(
             "Exception while generating response stream: %s", error)
-        yield json.dumps({"error": str(error)})
+        yield dumps_json({"error": str(error)})
 
 
-def parse_multi_columns(columns: str) -> list:
-    if "|" in columns:
-        return columns.split("|")
-    else:
-        return columns.split(",")
+async def map_as_completed(func, items, concurrency: int):
+    """
+    Run ``func`` on every item with at most ``concurrency`` calls in flight.
 
+    Yields ``(index, result, error)`` tuples in completion order, where
+    ``error`` is the exception raised for that item, if any. Calls still
+    running when the consumer stops iterating are cancelled.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
 
-def fetchUserGroups(userToken, nextLink=None):
-    # Recursively fetch group membership
-    if nextLink:
-        endpoint = nextLink
-    else:
-        endpoint = "https://graph.microsoft.com/v1.0/me/transitiveMemberOf?$select=id"
+    async def run(index, item):
+        async with semaphore:
+            try:
+                return index, await func(item), None
+            except Exception as e:
+                return index, None, e
 
-    headers = {"Authorization": "bearer " + userToken}
+    tasks = [asyncio.create_task(run(index, item)) for index, item in enumerate(items)]
     try:
-        r = requests.get(endpoint, headers=headers)
-        if r.status_code != 200:
-            logging.error(
-                f"Error fetching user groups: {r.status_code} {r.text}")
-            return []
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
 
-        r = r.json()
-        if "@odata.nextLink" in r:
-            nextLinkData = fetchUserGroups(userToken, r["@odata.nextLink"])
-            r["value"].extend(nextLinkData)
 
-        return r["value"]
-    except Exception as e:
-        logging.error(f"Exception in fetchUserGroups: {e}")
-        return []
+def parse_multi_columns(columns: str) -> list:
+    if "|" in columns:
+        return columns.split("|")
+    else:
+        return columns.split(",")
 
 
-def generateFilterString(userToken):
-    # Get list of groups user is a member of
-    userGroups = fetchUserGroups(userToken)
+async def generateFilterString(userToken):
+    # Groups of the user are resolved asynchronously and cached per token
+    return await group_resolver.get_filter(userToken, AZURE_SEARCH_PERMITTED_GROUPS_COLUMN)
 
-    # Construct filter string
-    if not userGroups:
-        logging.debug("No user groups found")
 
-    group_ids = ", ".join([obj["id"] for obj in userGroups])
-    return f"{AZURE_SEARCH_PERMITTED_GROUPS_COLUMN}/any(g:search.in(g, '{group_ids}'))"
+def _citations_content(citations):
+    # tool message content is the citation list as a JSON string
+    if isinstance(citations, CitationSet):
+        return citations.to_json()
+    return citations
 
 
 def format_non_streaming_response(chunk, history_metadata):
@@ -104,11 +165,12 @@ def format_non_streaming_response(chunk, history_metadata):
             "content": chunk["answer"]
         })
 
-    if "citations" in chunk and chunk["citations"]:
+    citations = _citations_content(chunk.get("citations"))
+    if citations:
         has_data = True
         response_obj["choices"][0]["messages"].append({
             "role": "tool",
-            "content": chunk["citations"]
+            "content": citations
         })
 
     if not has_data:
@@ -136,11 +198,12 @@ def format_stream_response(chunk, history_metadata):
             "content": chunk["answer"]
         })
 
-    if "citations" in chunk and chunk["citations"]:
+    citations = _citations_content(chunk.get("citations"))
+    if citations:
         has_data = True
         response_obj["choices"][0]["messages"].append({
             "role": "tool",
-            "content": chunk["citations"]
+            "content": citations
         })
 
     if not has_data:
@@ -148,6 +211,72 @@ def format_stream_response(chunk, history_metadata):
     return response_obj
 
 
+def get_stream_protocol(request_body, request_headers) -> str:
+    """
+    Return the stream protocol requested by the client, defaulting to the full one.
+    """
+    protocol = request_body.get("stream_protocol")
+    if not protocol and request_headers is not None:
+        protocol = request_headers.get(STREAM_PROTOCOL_HEADER)
+    if protocol and protocol.lower() == STREAM_PROTOCOL_COMPACT:
+        return STREAM_PROTOCOL_COMPACT
+    return STREAM_PROTOCOL_FULL
+
+
+class CompactStreamFormatter:
+    """
+    Formats streamed chunks for the compact stream protocol.
+
+    The first frame carries the response envelope (``id``, ``model``,
+    ``created`` and ``history_metadata``) once. Every frame then carries only
+    what changed: the answer text as ``delta`` and the new or updated
+    citations as a list in ``citations``, to be written into the client's
+    citation list starting at ``citation_offset``. The history metadata is
+    sent again only when it changes, e.g. once a generated title is ready.
+    """
+
+    def __init__(self, history_metadata):
+        self._history_metadata = history_metadata
+        self._sent_envelope = False
+        self._sent_history_metadata = None
+        self._citation_count = 0
+
+    def format(self, chunk):
+        """
+        Return the frame for a chunk, or None if there is nothing new to send.
+        """
+        frame = {}
+        if chunk.get("answer"):
+            frame["delta"] = chunk["answer"]
+
+        citations = chunk.get("citations")
+        if isinstance(citations, CitationSet):
+            offset, changed = citations.take_changes(self._citation_count)
+            if changed:
+                frame["citations"] = changed
+                frame["citation_offset"] = offset
+                self._citation_count = len(citations)
+
+        if not frame:
+            return None
+        if self._sent_envelope and self._history_metadata != self._sent_history_metadata:
+            frame["history_metadata"] = self._history_metadata
+            self._sent_history_metadata = dict(self._history_metadata)
+        if not self._sent_envelope:
+            from backend.settings import app_settings
+            self._sent_envelope = True
+            self._sent_history_metadata = dict(self._history_metadata)
+            frame = {
+                "protocol": STREAM_PROTOCOL_COMPACT,
+                "id": str(uuid.uuid4()),
+                "model": app_settings.azure_ai.agent_model_deployment_name,
+                "created": int(time.time()),
+                "history_metadata": self._history_metadata,
+                **frame
+            }
+        return frame
+
+
 def comma_separated_string_to_list(s: str) -> List[str]:
     """
     Split comma-separated values into a list.
@@ -1,5 +1,7 @@
 import { chatHistorySampleData } from '../constants/chatHistory'
 
+import { COMPACT_STREAM_PROTOCOL, STREAM_PROTOCOL_HEADER } from './compactStream'
+
 import {
   ChatMessage,
   Conversation,
@@ -19,7 +21,8 @@ export async function conversationApi(
   const response = await fetch('/conversation', {
     method: 'POST',
     headers: {
-      'Content-Type': 'application/json'
+      'Content-Type': 'application/json',
+      [STREAM_PROTOCOL_HEADER]: COMPACT_STREAM_PROTOCOL
     },
     body: JSON.stringify({
       messages: options.messages,
@@ -49,10 +52,28 @@ export const fetchChatHistoryInit = (): Conversation[] | null => {
   return chatHistorySampleData
 }
 
+// Conversations per page of /history/list
+const HISTORY_PAGE_SIZE = 25
+// Cursor of the next page of the conversation list, keyed by the offset the page is requested with
+const historyListCursors = new Map<number, string>()
+
 export const historyList = async (offset = 0): Promise<Conversation[] | null> => {
   try {
-    const res = await fetch(`/history/list?offset=${offset}`, { method: 'GET' });
-    const payload = await res.json();
+    if (offset === 0) {
+      historyListCursors.clear()
+    }
+    // follow the cursor of the previous page, so deep pages cost the same as the first
+    const cursor = offset === 0 ? '' : historyListCursors.get(offset)
+    const query = cursor !== undefined ? `cursor=${encodeURIComponent(cursor)}` : `offset=${offset}`
+    const res = await fetch(`/history/list?${query}`, { method: 'GET' });
+    let payload = await res.json();
+
+    if (payload && Array.isArray(payload.conversations)) {
+      if (payload.next_cursor) {
+        historyListCursors.set(offset + HISTORY_PAGE_SIZE, payload.next_cursor)
+      }
+      payload = payload.conversations
+    }
 
     if (!Array.isArray(payload)) {
       console.error('There was an issue fetching your data.');
@@ -85,11 +106,15 @@ export const historyList = async (offset = 0): Promise<Conversation[] | null> =>
   }
 };
 
-export const historyRead = async (convId: string): Promise<ChatMessage[]> => {
+// Reads the whole conversation, or with limit only its newest messages before "before",
+// the next_before cursor of the previous page
+export const historyRead = async (convId: string, limit?: number, before?: string): Promise<ChatMessage[]> => {
   const response = await fetch('/history/read', {
     method: 'POST',
     body: JSON.stringify({
-      conversation_id: convId
+      conversation_id: convId,
+      limit,
+      before
     }),
     headers: {
       'Content-Type': 'application/json'
@@ -144,7 +169,8 @@ export const historyGenerate = async (
   const response = await fetch('/history/generate', {
     method: 'POST',
     headers: {
-      'Content-Type': 'application/json'
+      'Content-Type': 'application/json',
+      [STREAM_PROTOCOL_HEADER]: COMPACT_STREAM_PROTOCOL
     },
     body: body,
     signal: abortSignal
@@ -370,7 +396,8 @@ export const historyMessageFeedback = async (messageId: string, feedback: string
 export const sectionGenerate = async (options: SectionGenerateRequest): Promise<Response> => {
   let body = JSON.stringify({
     sectionTitle: options.sectionTitle,
-    sectionDescription: options.sectionDescription
+    sectionDescription: options.sectionDescription,
+    regenerate: options.regenerate
   })
 
   const response = await fetch('/section/generate', {
@@ -393,6 +420,128 @@ export const sectionGenerate = async (options: SectionGenerateRequest): Promise<
   return response
 }
 
+export const sectionGenerateBatch = async (sections: SectionGenerateRequest[]): Promise<Response> => {
+  const response = await fetch('/section/generate_batch', {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json'
+    },
+    body: JSON.stringify({
+      sections: sections.map(section => ({
+        sectionTitle: section.sectionTitle,
+        sectionDescription: section.sectionDescription,
+        regenerate: section.regenerate
+      }))
+    })
+  })
+    .then(res => {
+      return res
+    })
+    .catch(_err => {
+      console.error('There was an issue fetching your data.')
+      return new Response()
+    })
+
+  return response
+}
+
+// Section requests made within this window are sent together in one /section/generate_batch call
+export const SECTION_BATCH_WINDOW_MS = 50
+
+type PendingSection = {
+  request: SectionGenerateRequest
+  resolve: (response: Response) => void
+}
+
+let pendingSections: PendingSection[] = []
+let sectionBatchTimer: ReturnType<typeof setTimeout> | null = null
+
+const readSectionBatch = async (response: Response, batch: PendingSection[], resolved: Set<number>) => {
+  if (!response.ok || !response.body) {
+    return
+  }
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder('utf-8')
+  let buffer = ''
+  const resolveLine = (line: string) => {
+    if (!line.trim()) {
+      return
+    }
+    const result = JSON.parse(line)
+    if (typeof result.index === 'number' && batch[result.index] && !resolved.has(result.index)) {
+      resolved.add(result.index)
+      batch[result.index].resolve(new Response(JSON.stringify(result)))
+    }
+  }
+  while (true) {
+    const { done, value } = await reader.read()
+    if (done) {
+      break
+    }
+    buffer += decoder.decode(value, { stream: true })
+    const lines = buffer.split('\n')
+    buffer = lines.pop() ?? ''
+    lines.forEach(resolveLine)
+  }
+  resolveLine(buffer)
+}
+
+const flushSectionBatch = async () => {
+  const batch = pendingSections
+  pendingSections = []
+  sectionBatchTimer = null
+
+  if (batch.length === 1) {
+    batch[0].resolve(await sectionGenerate(batch[0].request))
+    return
+  }
+
+  // each section is resolved as soon as its line of the stream arrives
+  const resolved = new Set<number>()
+  try {
+    await readSectionBatch(await sectionGenerateBatch(batch.map(item => item.request)), batch, resolved)
+  } catch (_err) {
+    console.error('There was an issue fetching your data.')
+  }
+  // sections the batch did not answer are requested on their own
+  await Promise.all(
+    batch.map(async (item, index) => {
+      if (!resolved.has(index)) {
+        item.resolve(await sectionGenerate(item.request))
+      }
+    })
+  )
+}
+
+// Generates a section like sectionGenerate, batching it with the other sections requested at the same time
+export const sectionGenerateBatched = (options: SectionGenerateRequest): Promise<Response> =>
+  new Promise(resolve => {
+    pendingSections.push({ request: options, resolve })
+    if (sectionBatchTimer === null) {
+      sectionBatchTimer = setTimeout(flushSectionBatch, SECTION_BATCH_WINDOW_MS)
+    }
+  })
+
+// Fetches the content of several citations in one request, each result has either content or an error
+export const fetchCitationContents = async (citations: { url: string; title: string }[]): Promise<Response> => {
+  const response = await fetch('/fetch-azure-search-content/batch', {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json'
+    },
+    body: JSON.stringify({ citations })
+  })
+    .then(res => {
+      return res
+    })
+    .catch(_err => {
+      console.error('There was an issue fetching your data.')
+      return new Response()
+    })
+
+  return response
+}
+
 export const documentRead = async (docId: string): Promise<Response> => {
   const response = await fetch('/document/' + docId, {
     method: 'GET',
@@ -0,0 +1,77 @@
+import { COMPACT_STREAM_PROTOCOL, CompactStreamDecoder } from './compactStream'
+import { ChatCompletionType, ChatResponse } from './models'
+
+describe('CompactStreamDecoder', () => {
+  const historyMetadata = { conversation_id: 'conv-1', title: 'Title', date: '2025-01-01T00:00:00' }
+
+  it('expands compact frames into chat responses', () => {
+    const decoder = new CompactStreamDecoder()
+
+    const first = decoder.decode({
+      protocol: COMPACT_STREAM_PROTOCOL,
+      id: 'resp-1',
+      model: 'gpt-4o',
+      created: 1,
+      history_metadata: historyMetadata,
+      delta: 'Hello'
+    })
+    expect(first).toEqual({
+      id: 'resp-1',
+      model: 'gpt-4o',
+      created: 1,
+      history_metadata: historyMetadata,
+      object: ChatCompletionType.ChatCompletionChunk,
+      choices: [{ messages: [{ id: 'resp-1', role: 'assistant', content: 'Hello', date: '' }] }]
+    })
+
+    const second = decoder.decode({ delta: ' [1]', citations: [{ title: 'doc1', url: 'https://a' }], citation_offset: 0 })
+    expect(second.history_metadata).toEqual(historyMetadata)
+    expect(second.choices[0].messages.map(m => m.role)).toEqual(['assistant', 'tool'])
+    expect(JSON.parse(second.choices[0].messages[1].content)).toEqual([{ title: 'doc1', url: 'https://a' }])
+  })
+
+  it('applies citation changes at their offset', () => {
+    const decoder = new CompactStreamDecoder()
+    decoder.decode({ protocol: COMPACT_STREAM_PROTOCOL, id: 'resp-1', delta: 'a' })
+    decoder.decode({
+      citations: [
+        { title: 'doc1', url: 'https://a' },
+        { title: 'doc2', url: 'https://b' }
+      ],
+      citation_offset: 0
+    })
+
+    const result = decoder.decode({ citations: [{ title: 'doc2', url: 'https://b2' }], citation_offset: 1 })
+    expect(JSON.parse(result.choices[0].messages[0].content)).toEqual([
+      { title: 'doc1', url: 'https://a' },
+      { title: 'doc2', url: 'https://b2' }
+    ])
+  })
+
+  it('picks up updated history metadata', () => {
+    const decoder = new CompactStreamDecoder()
+    decoder.decode({ protocol: COMPACT_STREAM_PROTOCOL, id: 'resp-1', history_metadata: historyMetadata, delta: 'a' })
+
+    const updatedMetadata = { ...historyMetadata, title: 'Generated title' }
+    const result = decoder.decode({ delta: 'b', history_metadata: updatedMetadata })
+    expect(result.history_metadata).toEqual(updatedMetadata)
+    expect(decoder.decode({ delta: 'c' }).history_metadata).toEqual(updatedMetadata)
+  })
+
+  it('returns full protocol frames and errors unchanged', () => {
+    const decoder = new CompactStreamDecoder()
+    const frame = {
+      id: 'resp-1',
+      model: 'gpt-4o',
+      created: 1,
+      object: ChatCompletionType.ChatCompletionChunk,
+      history_metadata: historyMetadata,
+      choices: [{ messages: [{ id: '', role: 'assistant', content: 'Hello', date: '' }] }]
+    } as ChatResponse
+    expect(decoder.decode(frame)).toBe(frame)
+
+    const error = { error: 'failed' }
+    decoder.decode({ protocol: COMPACT_STREAM_PROTOCOL, id: 'resp-1', delta: 'a' })
+    expect(decoder.decode(error)).toBe(error)
+  })
+})
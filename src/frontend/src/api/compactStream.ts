@@ -0,0 +1,70 @@
+import { ChatCompletionType, ChatMessage, ChatResponse } from './models'
+
+export const STREAM_PROTOCOL_HEADER = 'X-Stream-Protocol'
+export const COMPACT_STREAM_PROTOCOL = 'compact'
+
+export type CompactStreamCitation = {
+  title: string
+  url: string
+}
+
+export type CompactStreamFrame = {
+  protocol?: string
+  id?: string
+  model?: string
+  created?: number
+  history_metadata?: ChatResponse['history_metadata']
+  delta?: string
+  citations?: CompactStreamCitation[]
+  citation_offset?: number
+  error?: any
+}
+
+type Envelope = Pick<ChatResponse, 'id' | 'model' | 'created' | 'history_metadata'>
+
+/**
+ * Expands the frames of a compact /conversation stream into ChatResponse objects.
+ *
+ * The first compact frame carries the envelope, later frames only carry the answer delta,
+ * citation changes and updated history metadata. Frames of the full protocol are returned
+ * unchanged, so the same decoder can be used whichever protocol the server answered with.
+ */
+export class CompactStreamDecoder {
+  private envelope: Envelope | null = null
+  private citations: CompactStreamCitation[] = []
+
+  decode(frame: CompactStreamFrame | ChatResponse): ChatResponse {
+    if ('protocol' in frame && frame.protocol === COMPACT_STREAM_PROTOCOL) {
+      this.envelope = {
+        id: frame.id ?? '',
+        model: frame.model ?? '',
+        created: frame.created ?? 0,
+        history_metadata: frame.history_metadata ?? ({} as ChatResponse['history_metadata'])
+      }
+    }
+    if (!this.envelope || 'choices' in frame || frame.error) {
+      return frame as ChatResponse
+    }
+
+    const compactFrame = frame as CompactStreamFrame
+    if (compactFrame.history_metadata) {
+      // sent again when it changes, e.g. once the conversation title is generated
+      this.envelope = { ...this.envelope, history_metadata: compactFrame.history_metadata }
+    }
+    const messages: ChatMessage[] = []
+    if (compactFrame.delta) {
+      messages.push({ id: this.envelope.id, role: 'assistant', content: compactFrame.delta, date: '' })
+    }
+    if (compactFrame.citations) {
+      const offset = compactFrame.citation_offset ?? this.citations.length
+      this.citations = [...this.citations.slice(0, offset), ...compactFrame.citations]
+      messages.push({ id: this.envelope.id, role: 'tool', content: JSON.stringify(this.citations), date: '' })
+    }
+
+    return {
+      ...this.envelope,
+      object: ChatCompletionType.ChatCompletionChunk,
+      choices: [{ messages }]
+    }
+  }
+}
@@ -83,6 +83,7 @@ export type DraftedDocument = {
 export type SectionGenerateRequest = {
   sectionTitle: string
   sectionDescription: string
+  regenerate?: boolean
 }
 
 export type UserInfo = {
@@ -0,0 +1,56 @@
+import { sectionGenerateBatched } from './api'
+
+const ndjson = (...lines: object[]) => new Response(lines.map(line => JSON.stringify(line)).join('\n') + '\n')
+
+describe('sectionGenerateBatched', () => {
+  const fetchMock = jest.fn()
+
+  beforeEach(() => {
+    fetchMock.mockReset()
+    global.fetch = fetchMock
+  })
+
+  it('sends the sections requested together in one batch request', async () => {
+    fetchMock.mockResolvedValueOnce(
+      ndjson({ index: 1, section_content: 'Scope content' }, { index: 0, section_content: 'Intro content' })
+    )
+
+    const [intro, scope] = await Promise.all([
+      sectionGenerateBatched({ sectionTitle: 'Intro', sectionDescription: 'The intro' }),
+      sectionGenerateBatched({ sectionTitle: 'Scope', sectionDescription: 'The scope' })
+    ])
+
+    expect(fetchMock).toHaveBeenCalledTimes(1)
+    expect(fetchMock.mock.calls[0][0]).toBe('/section/generate_batch')
+    expect(JSON.parse(fetchMock.mock.calls[0][1].body).sections.map((s: any) => s.sectionTitle)).toEqual([
+      'Intro',
+      'Scope'
+    ])
+    expect((await intro.json()).section_content).toBe('Intro content')
+    expect((await scope.json()).section_content).toBe('Scope content')
+  })
+
+  it('passes errors through and requests unanswered sections on their own', async () => {
+    fetchMock
+      .mockResolvedValueOnce(ndjson({ index: 0, error: 'Error code: 429' }))
+      .mockResolvedValueOnce(new Response(JSON.stringify({ section_content: 'Scope content' })))
+
+    const [intro, scope] = await Promise.all([
+      sectionGenerateBatched({ sectionTitle: 'Intro', sectionDescription: 'The intro' }),
+      sectionGenerateBatched({ sectionTitle: 'Scope', sectionDescription: 'The scope' })
+    ])
+
+    expect((await intro.json()).error).toContain('429')
+    expect(fetchMock.mock.calls[1][0]).toBe('/section/generate')
+    expect((await scope.json()).section_content).toBe('Scope content')
+  })
+
+  it('sends a single section to /section/generate', async () => {
+    fetchMock.mockResolvedValueOnce(new Response(JSON.stringify({ section_content: 'Intro content' })))
+
+    const intro = await sectionGenerateBatched({ sectionTitle: 'Intro', sectionDescription: 'The intro' })
+
+    expect(fetchMock.mock.calls[0][0]).toBe('/section/generate')
+    expect((await intro.json()).section_content).toBe('Intro content')
+  })
+})
@@ -3,7 +3,7 @@ import { render, screen, fireEvent, waitFor } from '@testing-library/react'
 import '@testing-library/jest-dom'
 import SectionCard from './SectionCard'
 import { AppStateContext } from '../../state/AppProvider'
-import { sectionGenerate } from '../../api'
+import { sectionGenerate, sectionGenerateBatched } from '../../api'
 import { MemoryRouter } from 'react-router-dom'
 
 import { ChatHistoryLoadingState } from '../../api/models'
@@ -12,16 +12,19 @@ import { act } from 'react-dom/test-utils'
 import {defaultMockState} from '../../test/test.utils';
 
 // Mock the API
-jest.mock('../../api/api', () => ({
-  sectionGenerate: jest.fn(() =>
+jest.mock('../../api/api', () => {
+  const generatedResponse = () =>
     Promise.resolve({
       json: () =>
         Promise.resolve({
           section_content: 'Generated content'
         })
     })
-  )
-}))
+  return {
+    sectionGenerate: jest.fn(generatedResponse),
+    sectionGenerateBatched: jest.fn(generatedResponse)
+  }
+})
 
 // Mock the Generate Icon
 jest.mock('../../assets/Generate.svg', () => 'mocked-generate-icon')
@@ -110,7 +113,7 @@ describe('SectionCard Component', () => {
   it('fetches section content when content is empty', async () => {
     renderWithContext()
     await waitFor(() => {
-      expect(sectionGenerate).toHaveBeenCalledWith({
+      expect(sectionGenerateBatched).toHaveBeenCalledWith({
         sectionTitle: 'Introduction',
         sectionDescription: 'This is an introduction'
       })
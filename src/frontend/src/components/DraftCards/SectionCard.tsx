@@ -1,7 +1,7 @@
 import React, { useContext, useEffect, useState } from 'react'
 import { Stack } from '@fluentui/react'
 import { AppStateContext } from '../../state/AppProvider'
-import { sectionGenerate, SectionGenerateRequest } from '../../api'
+import { sectionGenerate, sectionGenerateBatched, SectionGenerateRequest } from '../../api'
 import { Section } from '../../api/models'
 import { Spinner } from '@fluentui/react'
 import GenerateIcon from '../../assets/Generate.svg'
@@ -157,9 +157,17 @@ const SectionCard = ({ sectionIdx  }: SectionCardProps) => {
   async function fetchSectionContent(sectionTitle: string, sectionDescription: string , isReqFrom = '') {
     setIsLoading(true)
     
-    const sectionGenerateRequest: SectionGenerateRequest = { sectionTitle, sectionDescription }
-
-    const response = await sectionGenerate(sectionGenerateRequest)
+    // an explicit regenerate skips the server side section cache
+    const sectionGenerateRequest: SectionGenerateRequest =
+      isReqFrom === 'regenerate'
+        ? { sectionTitle, sectionDescription, regenerate: true }
+        : { sectionTitle, sectionDescription }
+
+    // the sections of a new draft are generated together in one batch request
+    const response =
+      isReqFrom === 'regenerate'
+        ? await sectionGenerate(sectionGenerateRequest)
+        : await sectionGenerateBatched(sectionGenerateRequest)
     const responseBody = await response.json()
 
     if(responseBody?.error?.includes("429")) {
@@ -265,7 +273,7 @@ const SectionCard = ({ sectionIdx  }: SectionCardProps) => {
                   appStateContext?.dispatch({ type: 'UPDATE_IS_LOADED_SECTIONS', payload: {section : null, 'title' : sectionTitle ,'act' :'removeItem'  } })
 
                   setIsPopoverOpen(false)
-                  fetchSectionContent(sectionTitle, updatedSectionDescription)
+                  fetchSectionContent(sectionTitle, updatedSectionDescription, 'regenerate')
                 }}
                 data-testid="generate-btn-in-popover"
                 className={classes.popoverGenerateButton}>
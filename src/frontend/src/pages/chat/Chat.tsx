@@ -28,6 +28,7 @@ import {
   Citation,
   ToolMessageContent,
   ChatResponse,
+  CompactStreamDecoder,
   getUserInfo,
   Conversation,
   historyGenerate,
@@ -335,6 +336,7 @@ const Chat = ({ type = ChatType.Browse }: Props) => {
       if (response?.body) {
         const reader = response.body.getReader()
 
+        const streamDecoder = new CompactStreamDecoder()
         let runningText = ''
         while (true) {
           setProcessMessages(messageStatus.Processing)
@@ -347,7 +349,7 @@ const Chat = ({ type = ChatType.Browse }: Props) => {
             try {
               if (obj !== '' && obj !== '{}') {
                 runningText += obj
-                result = JSON.parse(runningText)
+                result = streamDecoder.decode(JSON.parse(runningText))
                 if (result.choices?.length > 0) {
                   result.choices[0].messages.forEach(msg => {
                     msg.id = result.id
@@ -503,6 +505,7 @@ const Chat = ({ type = ChatType.Browse }: Props) => {
       if (response?.body) {
         const reader = response.body.getReader()
 
+        const streamDecoder = new CompactStreamDecoder()
         let runningText = ''
         while (true) {
           setProcessMessages(messageStatus.Processing)
@@ -515,7 +518,7 @@ const Chat = ({ type = ChatType.Browse }: Props) => {
             try {
               if (obj !== '' && obj !== '{}') {
                 runningText += obj
-                result = JSON.parse(runningText)
+                result = streamDecoder.decode(JSON.parse(runningText))
                 if (!result.choices?.[0]?.messages?.[0].content) {
                   errorResponseMessage = NO_CONTENT_ERROR
                   throw Error()
@@ -1,9 +1,53 @@
+import { readFile, writeFile } from 'node:fs/promises'
+import { join } from 'node:path'
+import { promisify } from 'node:util'
+import { brotliCompress, constants, gzip } from 'node:zlib'
+
 import react from '@vitejs/plugin-react'
-import { defineConfig } from 'vite'
+import { defineConfig, type Plugin } from 'vite'
+
+const brotliCompressAsync = promisify(brotliCompress)
+const gzipAsync = promisify(gzip)
+
+const COMPRESSIBLE_ASSET = /^assets\/.*\.(js|mjs|css|svg|json|txt|html)$/
+const COMPRESS_MIN_SIZE = 1024
+
+// Writes .br and .gz variants next to the built assets, served by the backend
+// to the browsers that accept them so nothing is compressed per request
+function precompressAssets(): Plugin {
+  return {
+    name: 'precompress-assets',
+    apply: 'build',
+    async writeBundle(options, bundle) {
+      const outDir = options.dir ?? ''
+      await Promise.all(
+        Object.keys(bundle)
+          .filter(fileName => COMPRESSIBLE_ASSET.test(fileName))
+          .map(async fileName => {
+            const path = join(outDir, fileName)
+            const source = await readFile(path)
+            if (source.length < COMPRESS_MIN_SIZE) {
+              return
+            }
+            const [brotli, gzipped] = await Promise.all([
+              brotliCompressAsync(source, {
+                params: {
+                  [constants.BROTLI_PARAM_QUALITY]: constants.BROTLI_MAX_QUALITY,
+                  [constants.BROTLI_PARAM_SIZE_HINT]: source.length
+                }
+              }),
+              gzipAsync(source, { level: constants.Z_BEST_COMPRESSION })
+            ])
+            await Promise.all([writeFile(`${path}.br`, brotli), writeFile(`${path}.gz`, gzipped)])
+          })
+      )
+    }
+  }
+}
 
 // https://vitejs.dev/config/
 export default defineConfig({
-  plugins: [react()],
+  plugins: [react(), precompressAssets()],
   build: {
     outDir: '../static',
     emptyOutDir: true,
@@ -0,0 +1,73 @@
+"""
+Micro-benchmark for converting citation markers in a streamed browse answer.
+
+Compares the previous per-delta approach (string concatenation, uncompiled
+regex search per delta and a full re-scan of the answer at the end) with
+CitationMarkerParser on long synthetic streams.
+
+Usage (from src/):
+    python tests/benchmarks/bench_citation_stream.py
+"""
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from backend.citations import CitationMarkerParser, convert_citation_markers  # noqa: E402
+
+
+def synthetic_stream(delta_count, seed=0):
+    rng = random.Random(seed)
+    text = []
+    for i in range(delta_count):
+        if i % 40 == 0:
+            text.append(f"【{rng.randint(0, 9)}:{rng.randint(0, 4)}†source】")
+        text.append(" ".join(rng.choice(["lorem", "ipsum", "dolor", "sit", "amet"]) for _ in range(3)) + " ")
+    joined = "".join(text)
+    # cut into uneven deltas so that some markers are split across deltas
+    deltas = []
+    position = 0
+    while position < len(joined):
+        size = rng.randint(1, 12)
+        deltas.append(joined[position:position + size])
+        position += size
+    return deltas
+
+
+def previous_approach(deltas):
+    answer = ""
+    doc_mapping = {}
+    out = []
+    for delta in deltas:
+        answer += delta
+        if re.search(r'【(\d+:\d+)†source】', delta):
+            out.append(convert_citation_markers(delta, doc_mapping))
+        else:
+            out.append(delta)
+    re.search(r'【(\d+:\d+)†source】', answer)
+    return out
+
+
+def incremental_parser(deltas):
+    parser = CitationMarkerParser()
+    out = [parser.feed(delta) for delta in deltas]
+    out.append(parser.flush())
+    parser.answer
+    return out
+
+
+def main():
+    for delta_count in (1_000, 10_000, 100_000):
+        deltas = synthetic_stream(delta_count)
+        for name, func in (("previous", previous_approach), ("incremental", incremental_parser)):
+            runs = 5
+            seconds = min(timeit.repeat(lambda: func(deltas), number=1, repeat=runs))
+            print(f"{name:>12} {len(deltas):>8} deltas: {seconds * 1000:8.2f} ms, "
+                  f"{seconds / len(deltas) * 1e6:6.2f} us/delta")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark for the chat history stores.
+
+Simulates users that each start conversations, exchange messages and then
+list and read their history, against the in-memory and the SQLite store.
+The Cosmos DB store is left out as it needs a live account.
+
+Usage (from src/):
+    python tests/benchmarks/bench_history.py [--users N] [--conversations N] [--messages N]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from backend.history.memory_store import InMemoryHistoryStore  # noqa: E402
+from backend.history.sqlite_store import SQLiteHistoryStore  # noqa: E402
+
+
+async def timed(durations, name, coro):
+    start = time.perf_counter()
+    result = await coro
+    durations.setdefault(name, []).append(time.perf_counter() - start)
+    return result
+
+
+async def read_all(store, user_id, conversation_id):
+    return [message async for message in store.get_messages(user_id, conversation_id)]
+
+
+async def simulate_user(store, durations, conversations, messages):
+    user_id = str(uuid.uuid4())
+    for _ in range(conversations):
+        conversation = await timed(durations, "create_conversation", store.create_conversation(user_id, "Title"))
+        for _ in range(messages // 2):
+            await timed(durations, "create_messages", store.create_messages(conversation["id"], user_id, [
+                (str(uuid.uuid4()), {"role": "user", "content": "question " * 20}),
+                (str(uuid.uuid4()), {"role": "assistant", "content": "answer " * 200}),
+            ]))
+        await timed(durations, "list_first_page", store.get_conversations_page(user_id, limit=25))
+        await timed(durations, "read_conversation", read_all(store, user_id, conversation["id"]))
+
+
+def report(name, durations):
+    print(name)
+    for operation, values in durations.items():
+        values = sorted(values)
+        p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+        print(f"  {operation:>20} {len(values):>7} calls: mean {statistics.mean(values) * 1e3:8.3f} ms, "
+              f"p95 {p95 * 1e3:8.3f} ms")
+
+
+async def bench(name, store, args):
+    durations = {}
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        simulate_user(store, durations, args.conversations, args.messages) for _ in range(args.users)
+    ))
+    elapsed = time.perf_counter() - start
+    await store.close()
+    report(f"{name}: {sum(len(v) for v in durations.values())} operations in {elapsed:.2f} s", durations)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--conversations", type=int, default=10)
+    parser.add_argument("--messages", type=int, default=10)
+    args = parser.parse_args()
+
+    asyncio.run(bench("memory", InMemoryHistoryStore(), args))
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(bench("sqlite", SQLiteHistoryStore(os.path.join(directory, "history.db")), args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark for serializing a streamed chat response as NDJSON.
+
+Replays a recorded stream of response frames through the previous stdlib
+encoder (``json.dumps`` with the custom ``JSONEncoder`` class) and through
+``dumps_json`` and reports throughput and CPU time per streamed token.
+
+A recorded stream is an NDJSON file as returned by /conversation, one frame
+per line. Without one, a synthetic stream shaped like the browse responses is
+used.
+
+Usage (from src/):
+    python tests/benchmarks/bench_ndjson.py [recorded_stream.ndjson ...]
+"""
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from backend.utils import JSONEncoder, dumps_json  # noqa: E402
+
+
+def synthetic_stream(token_count, seed=0):
+    rng = random.Random(seed)
+    history_metadata = {"conversation_id": "5b0fbd2c-8a0e-4ad4-bd27-5ab3a5c1f1a2", "title": "Promissory note"}
+    citations = json.dumps([{"title": f"doc_{i}.pdf", "url": f"https://example.blob.core.windows.net/docs/doc_{i}.pdf"}
+                            for i in range(5)])
+    frames = []
+    for i in range(token_count):
+        messages = [{"role": "assistant", "content": rng.choice(["The ", "borrower ", "shall ", "repay ", "é "])}]
+        if i % 50 == 0:
+            messages.append({"role": "tool", "content": citations})
+        frames.append({
+            "id": "f1b1c7a4-0b7d-4a8c-9a8e-2f9c7a0a8c11",
+            "model": "gpt-4o",
+            "created": 1760000000,
+            "choices": [{"messages": messages}],
+            "history_metadata": history_metadata,
+        })
+    return frames
+
+
+def load_recorded_stream(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def stdlib_encoder(frame):
+    return json.dumps(frame, cls=JSONEncoder)
+
+
+def run(name, func, frames, repeat=5):
+    best_wall = best_cpu = float("inf")
+    size = 0
+    for _ in range(repeat):
+        wall, cpu = time.perf_counter(), time.process_time()
+        size = sum(len((func(frame) + "\n").encode("utf-8")) for frame in frames)
+        best_wall = min(best_wall, time.perf_counter() - wall)
+        best_cpu = min(best_cpu, time.process_time() - cpu)
+    print(f"{name:>8} {len(frames):>8} tokens: {size / best_wall / 1e6:8.1f} MB/s, "
+          f"{best_cpu / len(frames) * 1e6:6.2f} us CPU/token, {size / len(frames):6.1f} bytes/token")
+
+
+def main():
+    if len(sys.argv) > 1:
+        streams = [(path, load_recorded_stream(path)) for path in sys.argv[1:]]
+    else:
+        streams = [(f"synthetic {count}", synthetic_stream(count)) for count in (1_000, 10_000, 100_000)]
+    for label, frames in streams:
+        print(label)
+        for name, func in (("stdlib", stdlib_encoder), ("fast", dumps_json)):
+            run(name, func, frames)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark for conversation title generation.
+
+Times the local keyword title engine over a set of typical first messages
+and, with --llm, the model based generate_title path. The model path needs a
+configured environment (the same .env the app uses, see DOTENV_PATH) and makes
+one chat completion per title.
+
+Usage (from src/):
+    python tests/benchmarks/bench_title.py [--llm] [--count N]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from backend.title_generator import generate_local_title  # noqa: E402
+
+FIRST_MESSAGES = [
+    "Generate a promissory note for a loan of 5000 dollars between two companies",
+    "What are the termination clauses in the master services agreement?",
+    "Summarize the key obligations of the tenant in the lease documents",
+    "Create a template for a non-disclosure agreement with a three year term",
+    "Which contracts mention late payment penalties and what are the rates?",
+    "Draft an employment offer letter for a senior software engineer in Seattle",
+]
+
+
+def conversations(count):
+    return [[{"role": "user", "content": FIRST_MESSAGES[i % len(FIRST_MESSAGES)]}] for i in range(count)]
+
+
+def report(name, durations):
+    durations = sorted(durations)
+    p95 = durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+    print(f"{name:>6} {len(durations):>6} titles: mean {statistics.mean(durations) * 1e3:10.3f} ms, "
+          f"p95 {p95 * 1e3:10.3f} ms")
+
+
+def bench_local(count):
+    durations = []
+    for messages in conversations(count):
+        start = time.perf_counter()
+        generate_local_title(messages)
+        durations.append(time.perf_counter() - start)
+    report("local", durations)
+
+
+async def bench_llm(count):
+    from app import generate_title
+
+    durations = []
+    for messages in conversations(count):
+        start = time.perf_counter()
+        await generate_title(messages)
+        durations.append(time.perf_counter() - start)
+    report("llm", durations)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--llm", action="store_true", help="also time the model based title path")
+    parser.add_argument("--count", type=int, default=None)
+    args = parser.parse_args()
+
+    bench_local(args.count or 10_000)
+    for messages in conversations(len(FIRST_MESSAGES)):
+        print(f"    {messages[0]['content']!r} -> {generate_local_title(messages)!r}")
+    if args.llm:
+        asyncio.run(bench_llm(args.count or 20))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from azure.core.exceptions import ResourceNotFoundError
+
+from backend.api.agent.thread_deletion_queue import ThreadDeletionQueue
+
+
+def make_project_client(side_effect=None):
+    project_client = MagicMock()
+    project_client.agents.threads.delete = AsyncMock(side_effect=side_effect)
+    return project_client
+
+
+@pytest.mark.asyncio
+async def test_enqueued_threads_are_deleted_on_drain():
+    project_client = make_project_client()
+    queue = ThreadDeletionQueue(batch_size=2)
+
+    for i in range(5):
+        queue.enqueue(project_client, f"thread-{i}")
+    await queue.drain()
+
+    deleted = [call.kwargs["thread_id"] for call in project_client.agents.threads.delete.await_args_list]
+    assert sorted(deleted) == [f"thread-{i}" for i in range(5)]
+    assert queue.metrics() == {"queue_depth": 0, "deleted": 5, "retried": 0, "failed": 0, "overflowed": 0}
+
+
+@pytest.mark.asyncio
+async def test_failed_deletes_are_retried():
+    project_client = make_project_client(side_effect=[Exception("throttled"), None])
+    queue = ThreadDeletionQueue(retry_delay=0)
+
+    queue.enqueue(project_client, "thread-0")
+    await queue.drain()
+
+    assert project_client.agents.threads.delete.await_count == 2
+    assert queue.deleted == 1
+    assert queue.retried == 1
+    assert queue.failed == 0
+
+
+@pytest.mark.asyncio
+async def test_deletes_give_up_after_max_attempts():
+    project_client = make_project_client(side_effect=Exception("unavailable"))
+    queue = ThreadDeletionQueue(max_attempts=3, retry_delay=0)
+
+    queue.enqueue(project_client, "thread-0")
+    await queue.drain()
+
+    assert project_client.agents.threads.delete.await_count == 3
+    assert queue.retried == 2
+    assert queue.failed == 1
+
+
+@pytest.mark.asyncio
+async def test_missing_threads_are_not_retried():
+    project_client = make_project_client(side_effect=ResourceNotFoundError("gone"))
+    queue = ThreadDeletionQueue(retry_delay=0)
+
+    queue.enqueue(project_client, "thread-0")
+    await queue.drain()
+
+    project_client.agents.threads.delete.assert_awaited_once()
+    assert queue.failed == 0
+
+
+@pytest.mark.asyncio
+async def test_full_queue_deletes_directly():
+    project_client = make_project_client()
+    queue = ThreadDeletionQueue(max_size=1)
+
+    queue.enqueue(project_client, "thread-0")
+    queue.enqueue(project_client, "thread-1")
+    await queue.drain()
+
+    assert queue.overflowed == 1
+    assert project_client.agents.threads.delete.await_count == 2
@@ -0,0 +1,153 @@
+import asyncio
+import itertools
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from backend.api.agent.thread_deletion_queue import ThreadDeletionQueue
+from backend.api.agent.thread_pool import MAX_INLINE_MESSAGES, AgentThreadPool
+
+
+def make_project_client():
+    counter = itertools.count()
+    project_client = MagicMock()
+    project_client.agents.threads.create = AsyncMock(
+        side_effect=lambda **kwargs: MagicMock(id=f"thread-{next(counter)}")
+    )
+    project_client.agents.threads.delete = AsyncMock()
+    project_client.agents.messages.create = AsyncMock()
+    return project_client
+
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_acquire_uses_pre_created_threads():
+    project_client = make_project_client()
+    pool = AgentThreadPool(project_client, size=2)
+    pool.start()
+    await settle()
+    assert pool.idle_count == 2
+
+    thread = await pool.acquire()
+    assert thread.id == "thread-0"
+    await settle()
+
+    # the pool is topped back up in the background
+    assert pool.idle_count == 2
+    assert project_client.agents.threads.create.await_count == 3
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_acquire_creates_thread_when_pool_disabled():
+    project_client = make_project_client()
+    pool = AgentThreadPool(project_client, size=0)
+    pool.start()
+
+    thread = await pool.acquire()
+    await settle()
+
+    assert thread.id == "thread-0"
+    assert pool.idle_count == 0
+    project_client.agents.threads.create.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_acquire_discards_stale_threads():
+    project_client = make_project_client()
+    pool = AgentThreadPool(project_client, size=1, max_idle_age=-1, deletion_queue=ThreadDeletionQueue())
+    pool.start()
+    await settle()
+
+    thread = await pool.acquire()
+    await settle()
+
+    assert thread.id != "thread-0"
+    project_client.agents.threads.delete.assert_any_await(thread_id="thread-0")
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_release_and_close_delete_threads():
+    project_client = make_project_client()
+    deletion_queue = ThreadDeletionQueue()
+    pool = AgentThreadPool(project_client, size=1, deletion_queue=deletion_queue)
+    pool.start()
+    await settle()
+
+    thread = await pool.acquire()
+    pool.release(thread.id)
+    await settle()
+    await pool.close()
+    await deletion_queue.drain()
+
+    deleted = {call.kwargs["thread_id"] for call in project_client.agents.threads.delete.await_args_list}
+    assert deleted == {"thread-0", "thread-1"}
+    assert pool.idle_count == 0
+
+
+@pytest.mark.asyncio
+async def test_acquire_seeded_sends_messages_inline():
+    project_client = make_project_client()
+    pool = AgentThreadPool(project_client, size=1)
+    pool.start()
+    await settle()
+
+    messages = [
+        {"role": "user", "content": "question"},
+        {"role": "tool", "content": "citations"},
+        {"role": "assistant", "content": "answer"},
+        {"role": "user", "content": "follow up"},
+        {},
+    ]
+    thread, additional_messages, round_trips = await pool.acquire_seeded(messages)
+
+    assert thread.id == "thread-0"
+    assert [(m.role, m.content) for m in additional_messages] == [
+        ("user", "question"),
+        ("assistant", "answer"),
+        ("user", "follow up"),
+    ]
+    assert round_trips == 0
+    project_client.agents.messages.create.assert_not_awaited()
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_acquire_seeded_puts_long_history_on_new_thread():
+    project_client = make_project_client()
+    pool = AgentThreadPool(project_client, size=0)
+
+    messages = [{"role": "user", "content": str(i)} for i in range(MAX_INLINE_MESSAGES + 3)]
+    thread, additional_messages, round_trips = await pool.acquire_seeded(messages)
+
+    create_kwargs = project_client.agents.threads.create.await_args.kwargs
+    assert [m.content for m in create_kwargs["messages"]] == ["0", "1", "2"]
+    assert [m.content for m in additional_messages] == [str(i) for i in range(3, MAX_INLINE_MESSAGES + 3)]
+    assert round_trips == 1
+    project_client.agents.messages.create.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_acquire_seeded_creates_thread_with_long_history_despite_idle_thread():
+    project_client = make_project_client()
+    pool = AgentThreadPool(project_client, size=1)
+    pool.start()
+    await settle()
+    assert pool.idle_count == 1
+
+    messages = [{"role": "user", "content": str(i)} for i in range(MAX_INLINE_MESSAGES + 8)]
+    thread, additional_messages, round_trips = await pool.acquire_seeded(messages)
+
+    create_kwargs = project_client.agents.threads.create.await_args.kwargs
+    assert [m.content for m in create_kwargs["messages"]] == [str(i) for i in range(8)]
+    assert len(additional_messages) == MAX_INLINE_MESSAGES
+    assert round_trips == 1
+    project_client.agents.messages.create.assert_not_awaited()
+    # the idle thread is kept for a run without history
+    assert pool.idle_count == 1
+    await pool.close()
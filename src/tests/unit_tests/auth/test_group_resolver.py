@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from backend.auth.group_resolver import GroupResolver, build_group_filter
+
+
+@pytest_asyncio.fixture
+async def graph_server():
+    requests = []
+    state = {"status": 200}
+
+    async def member_of(request):
+        requests.append(request)
+        await asyncio.sleep(0.02)
+        if state["status"] != 200:
+            return web.Response(status=state["status"], text="unavailable")
+        page = int(request.query.get("page", "0"))
+        body = {"value": [{"id": f"g{page}-{i}"} for i in range(2)]}
+        if page < 2:
+            body["@odata.nextLink"] = str(request.url.with_query({"page": str(page + 1)}))
+        return web.json_response(body)
+
+    app = web.Application()
+    app.router.add_get("/me/transitiveMemberOf", member_of)
+    server = TestServer(app)
+    await server.start_server()
+    server.requests = requests
+    server.state = state
+    yield server
+    await server.close()
+
+
+def make_resolver(server, **kwargs):
+    return GroupResolver(graph_url=str(server.make_url("/me/transitiveMemberOf")), **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_follows_pages_and_caches_groups(graph_server):
+    resolver = make_resolver(graph_server)
+
+    group_ids = await resolver.get_group_ids("token")
+    assert group_ids == ["g0-0", "g0-1", "g1-0", "g1-1", "g2-0", "g2-1"]
+    assert graph_server.requests[0].headers["Authorization"] == "bearer token"
+
+    assert await resolver.get_group_ids("token") == group_ids
+    assert len(graph_server.requests) == 3
+    await resolver.close()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_lookups_share_one_walk(graph_server):
+    resolver = make_resolver(graph_server)
+
+    filters = await asyncio.gather(*(resolver.get_filter("token", "groups") for _ in range(10)))
+
+    assert len(set(filters)) == 1
+    assert len(graph_server.requests) == 3
+    await resolver.close()
+
+
+@pytest.mark.asyncio
+async def test_stale_groups_are_served_and_refreshed_in_background(graph_server):
+    resolver = make_resolver(graph_server, refresh_after=0)
+
+    first = await resolver.get_group_ids("token")
+    assert await resolver.get_group_ids("token") == first
+    assert len(graph_server.requests) == 3
+
+    await asyncio.sleep(0.2)
+    assert len(graph_server.requests) == 6
+    await resolver.close()
+
+
+@pytest.mark.asyncio
+async def test_failures_are_not_cached(graph_server):
+    resolver = make_resolver(graph_server)
+    graph_server.state["status"] = 503
+
+    assert await resolver.get_group_ids("token") == []
+    assert await resolver.get_filter("token", "groups") == "groups/any(g:search.in(g, ''))"
+    assert len(graph_server.requests) == 2
+
+    graph_server.state["status"] = 200
+    assert len(await resolver.get_group_ids("token")) == 6
+    await resolver.close()
+
+
+def test_build_group_filter_splits_large_group_sets():
+    assert build_group_filter("groups", ["b", "a", "b"]) == "groups/any(g:search.in(g, 'a,b', ','))"
+    assert build_group_filter("groups", ["c", "b", "a"], max_groups_per_clause=2) == (
+        "groups/any(g:search.in(g, 'a,b', ',')) or groups/any(g:search.in(g, 'c', ','))"
+    )
@@ -1,12 +1,21 @@
 import pytest
 import sys
 import os
-from unittest.mock import patch, MagicMock
+import time
+from unittest.mock import patch, MagicMock, AsyncMock
 
 # Ensure src/backend is on the Python path for imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../")))
 
 import backend.helpers.azure_credential_utils as azure_credential_utils
+from azure.core.credentials import AccessToken
+
+
+@pytest.fixture(autouse=True)
+def clear_credential_cache():
+    azure_credential_utils.clear_credential_cache()
+    yield
+    azure_credential_utils.clear_credential_cache()
 
 # Synchronous tests
 
@@ -75,4 +84,86 @@ async def test_get_azure_credential_async_non_dev_env(mock_aio_managed_identity_
     mock_getenv.assert_called_once_with("APP_ENV", "prod")
     mock_aio_managed_identity_credential.assert_called_once_with(client_id="test-client-id")
     mock_aio_default_azure_credential.assert_not_called()
-    assert credential == mock_aio_managed_credential
\ No newline at end of file
+    assert credential == mock_aio_managed_credential
+
+
+@patch("backend.helpers.azure_credential_utils.os.getenv")
+@patch("backend.helpers.azure_credential_utils.ManagedIdentityCredential")
+def test_get_azure_credential_is_shared_per_client_id(mock_managed_identity_credential, mock_getenv):
+    """Test get_azure_credential returns one shared credential per client ID."""
+    mock_getenv.return_value = "prod"
+    mock_managed_identity_credential.side_effect = lambda client_id: MagicMock(client_id=client_id)
+
+    first = azure_credential_utils.get_azure_credential(client_id="client-a")
+    second = azure_credential_utils.get_azure_credential(client_id="client-a")
+    other = azure_credential_utils.get_azure_credential(client_id="client-b")
+
+    assert first is second
+    assert first is not other
+    assert mock_managed_identity_credential.call_count == 2
+
+# Access token cache tests
+
+
+@pytest.mark.asyncio
+async def test_access_token_cache_serves_cached_token():
+    """Test AccessTokenCache only calls the credential on the first request."""
+    credential = MagicMock()
+    credential.get_token = AsyncMock(return_value=AccessToken("token-1", int(time.time()) + 3600))
+    cache = azure_credential_utils.AccessTokenCache(credential)
+
+    assert await cache.get_token("scope") == "token-1"
+    assert await cache.get_token("scope") == "token-1"
+
+    credential.get_token.assert_awaited_once_with("scope")
+    assert cache.metrics() == {"hits": 1, "misses": 1, "refreshes": 1, "refresh_failures": 0}
+
+
+@pytest.mark.asyncio
+async def test_access_token_cache_refreshes_in_background_before_expiry():
+    """Test AccessTokenCache serves a soon-to-expire token and refreshes it in the background."""
+    credential = MagicMock()
+    credential.get_token = AsyncMock(side_effect=[
+        AccessToken("old-token", int(time.time()) + 120),
+        AccessToken("new-token", int(time.time()) + 3600),
+    ])
+    cache = azure_credential_utils.AccessTokenCache(credential, refresh_margin=300)
+
+    assert await cache.get_token("scope") == "old-token"
+    assert await cache.get_token("scope") == "old-token"
+    await cache._refresh_tasks["scope"]
+    assert await cache.get_token("scope") == "new-token"
+
+    assert credential.get_token.await_count == 2
+    assert cache.refreshes == 2
+
+
+@pytest.mark.asyncio
+@patch("backend.helpers.azure_credential_utils.get_azure_credential_async")
+async def test_get_azure_access_token_async_uses_shared_cache(mock_get_azure_credential_async):
+    """Test get_azure_access_token_async reuses one token cache per client ID."""
+    credential = MagicMock()
+    credential.get_token = AsyncMock(return_value=AccessToken("token", int(time.time()) + 3600))
+    mock_get_azure_credential_async.return_value = credential
+
+    assert await azure_credential_utils.get_azure_access_token_async("scope", client_id="client") == "token"
+    assert await azure_credential_utils.get_azure_access_token_async("scope", client_id="client") == "token"
+
+    mock_get_azure_credential_async.assert_awaited_once_with(client_id="client")
+    credential.get_token.assert_awaited_once_with("scope")
+
+
+@pytest.mark.asyncio
+@patch("backend.helpers.azure_credential_utils.get_azure_credential_async")
+async def test_get_azure_access_token_async_cache_is_per_environment(mock_get_azure_credential_async, monkeypatch):
+    """Test dev and non-dev callers with the same client ID do not share a token cache."""
+    dev_credential = MagicMock()
+    dev_credential.get_token = AsyncMock(return_value=AccessToken("dev", int(time.time()) + 3600))
+    prod_credential = MagicMock()
+    prod_credential.get_token = AsyncMock(return_value=AccessToken("prod", int(time.time()) + 3600))
+    mock_get_azure_credential_async.side_effect = [dev_credential, prod_credential]
+
+    monkeypatch.setenv("APP_ENV", "dev")
+    assert await azure_credential_utils.get_azure_access_token_async("scope", client_id="client") == "dev"
+    monkeypatch.setenv("APP_ENV", "prod")
+    assert await azure_credential_utils.get_azure_access_token_async("scope", client_id="client") == "prod"
@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from backend.history.client_manager import ConversationClientManager
+
+
+def make_client(ensure_result=(True, "ok")):
+    client = MagicMock()
+    client.ensure = AsyncMock(return_value=ensure_result)
+    client.close = AsyncMock()
+    return client
+
+
+@pytest.mark.asyncio
+async def test_get_client_is_shared():
+    client = make_client()
+    builder = MagicMock(return_value=client)
+    manager = ConversationClientManager(builder, health_check_interval=300)
+
+    assert await manager.get_client() is client
+    assert await manager.get_client() is client
+    builder.assert_called_once()
+    client.ensure.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_get_client_does_not_health_check():
+    client = make_client()
+    manager = ConversationClientManager(MagicMock(return_value=client), health_check_interval=0)
+
+    for _ in range(3):
+        assert await manager.get_client() is client
+    client.ensure.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_failed_health_check_reconnects():
+    broken = make_client(ensure_result=(False, "container not found"))
+    healthy = make_client()
+    builder = MagicMock(side_effect=[broken, healthy])
+    manager = ConversationClientManager(builder, health_check_interval=0)
+
+    await manager.start()
+    broken.close.assert_awaited_once()
+    assert await manager.get_client() is healthy
+    assert await manager.check_health() is True
+
+
+@pytest.mark.asyncio
+async def test_health_checks_run_in_background():
+    client = make_client()
+    manager = ConversationClientManager(MagicMock(return_value=client), health_check_interval=0.01)
+
+    await manager.start()
+    await asyncio.sleep(0.05)
+    assert client.ensure.await_count > 1
+
+    await manager.close()
+    count = client.ensure.await_count
+    await asyncio.sleep(0.03)
+    assert client.ensure.await_count == count
+    client.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_invalidate_and_close():
+    first = make_client()
+    second = make_client()
+    builder = MagicMock(side_effect=[first, second])
+    manager = ConversationClientManager(builder, health_check_interval=300)
+
+    await manager.get_client()
+    await manager.invalidate()
+    first.close.assert_awaited_once()
+
+    assert await manager.get_client() is second
+    await manager.close()
+    second.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_get_client_not_configured():
+    manager = ConversationClientManager(MagicMock(return_value=None))
+
+    assert await manager.get_client() is None
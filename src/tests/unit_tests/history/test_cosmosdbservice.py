@@ -0,0 +1,450 @@
+import asyncio
+import pytest
+from unittest.mock import ANY, AsyncMock, MagicMock
+
+from azure.core.async_paging import AsyncItemPaged
+from azure.cosmos import exceptions
+
+from backend.cache import ConversationListCache
+from backend.history.cosmosdbservice import (CosmosConversationClient,
+                                             start_request_memo)
+
+
+def make_client():
+    client = CosmosConversationClient.__new__(CosmosConversationClient)
+    client.enable_message_feedback = False
+    client.request_charges = {}
+    client.conversation_list_cache = None
+    client.container_client = MagicMock()
+    # shared by every request of the client, charges are read from the response hooks instead
+    client.container_client.client_connection.last_response_headers = {"x-ms-request-charge": "99.0"}
+    client.container_client.execute_item_batch = AsyncMock(side_effect=execute_batch)
+    client.container_client.upsert_item = AsyncMock(side_effect=upsert)
+    client.container_client.patch_item = AsyncMock()
+    return client
+
+
+async def execute_batch(batch_operations, partition_key, response_hook=None):
+    results = [
+        {"statusCode": 200, "requestCharge": 5.0, "resourceBody": args[0] if operation == "upsert" else {}}
+        for operation, args in batch_operations
+    ]
+    if response_hook:
+        response_hook({"x-ms-request-charge": "10.5"}, results)
+    return results
+
+
+async def upsert(item, response_hook=None):
+    if response_hook:
+        response_hook({"x-ms-request-charge": "2.5"}, item)
+    return item
+
+
+def without_batch(client):
+    client.container_client.execute_item_batch.side_effect = exceptions.CosmosHttpResponseError(status_code=400)
+    return client
+
+
+@pytest.mark.asyncio
+async def test_create_message_uses_one_batch():
+    client = make_client()
+
+    message = await client.create_message("m1", "c1", "u1", {"role": "user", "content": "hi"})
+
+    assert message["id"] == "m1"
+    operations = client.container_client.execute_item_batch.await_args.kwargs["batch_operations"]
+    assert [operation for operation, _ in operations] == ["upsert", "patch"]
+    assert operations[1][1] == ("c1", [{"op": "set", "path": "/updatedAt", "value": message["createdAt"]}])
+    assert client.container_client.execute_item_batch.await_args.kwargs["partition_key"] == "u1"
+    client.container_client.upsert_item.assert_not_awaited()
+    client.container_client.patch_item.assert_not_awaited()
+    assert client.request_charges == {"message_batch": 10.5, "message_batch_upsert": 5.0, "message_batch_patch": 5.0}
+
+
+@pytest.mark.asyncio
+async def test_request_charges_are_read_from_each_response():
+    client = make_client()
+
+    await asyncio.gather(
+        client.create_conversation("u1", title="First", conversation_id="c1"),
+        client.create_conversation("u1", title="Second", conversation_id="c2"),
+    )
+    assert client.request_charges == {"create_conversation": 5.0}
+
+    client.container_client.query_items = query_results([{"id": "c1"}])
+    await client.get_conversations("u1", limit=25)
+    response_hook = client.container_client.query_items.call_args.kwargs["response_hook"]
+    # query_items hands the hook the pager and the client's last headers before any request
+    response_hook({"x-ms-request-charge": "99.0"}, AsyncItemPaged(MagicMock()))
+    response_hook({"x-ms-request-charge": "3.0"}, {"Documents": []})
+    assert client.request_charges["get_conversations"] == 3.0
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_charge_is_read_from_the_error():
+    client = make_client()
+    client.container_client.execute_item_batch.side_effect = exceptions.CosmosBatchOperationError(
+        error_index=0,
+        headers={"x-ms-request-charge": "1.5"},
+        status_code=400,
+        message="bad request",
+        operation_responses=[{"statusCode": 400}, {"statusCode": 424}],
+    )
+
+    await client.create_message("m1", "c1", "u1", {"role": "user", "content": "hi"})
+    assert client.request_charges["message_batch"] == 1.5
+    assert client.request_charges["upsert_message"] == 2.5
+
+
+@pytest.mark.asyncio
+async def test_create_message_batch_reports_missing_conversation():
+    client = make_client()
+    client.container_client.execute_item_batch.side_effect = exceptions.CosmosBatchOperationError(
+        error_index=1,
+        headers={},
+        status_code=404,
+        message="not found",
+        operation_responses=[{"statusCode": 424}, {"statusCode": 404}],
+    )
+
+    assert await client.create_message("m1", "c1", "u1", {"role": "user", "content": "hi"}) == "Conversation not found"
+    client.container_client.upsert_item.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_create_message_falls_back_to_upsert_and_patch():
+    client = without_batch(make_client())
+
+    message = await client.create_message("m1", "c1", "u1", {"role": "user", "content": "hi"})
+
+    assert message["conversationId"] == "c1"
+    client.container_client.patch_item.assert_awaited_once_with(
+        item="c1",
+        partition_key="u1",
+        patch_operations=[{"op": "set", "path": "/updatedAt", "value": message["createdAt"]}],
+        response_hook=ANY,
+    )
+
+
+@pytest.mark.asyncio
+async def test_create_message_fallback_reports_missing_conversation():
+    client = without_batch(make_client())
+    client.container_client.patch_item.side_effect = exceptions.CosmosResourceNotFoundError()
+
+    assert await client.create_message("m1", "c1", "u1", {"role": "user", "content": "hi"}) == "Conversation not found"
+
+
+@pytest.mark.asyncio
+async def test_create_messages_keeps_conversation_order():
+    client = make_client()
+
+    messages = await client.create_messages("c1", "u1", [
+        ("t1", {"role": "tool", "content": "[]"}),
+        ("a1", {"role": "assistant", "content": "answer"}),
+    ])
+
+    assert [m["id"] for m in messages] == ["t1", "a1"]
+    assert messages[0]["createdAt"] < messages[1]["createdAt"]
+    operations = client.container_client.execute_item_batch.await_args.kwargs["batch_operations"]
+    assert [operation for operation, _ in operations] == ["upsert", "upsert", "patch"]
+    assert operations[2][1][1][0]["value"] == messages[1]["createdAt"]
+
+
+@pytest.mark.asyncio
+async def test_create_messages_fallback_patches_once():
+    client = without_batch(make_client())
+
+    messages = await client.create_messages("c1", "u1", [
+        ("t1", {"role": "tool", "content": "[]"}),
+        ("a1", {"role": "assistant", "content": "answer"}),
+    ])
+
+    assert [m["id"] for m in messages] == ["t1", "a1"]
+    client.container_client.patch_item.assert_awaited_once()
+    assert client.container_client.patch_item.await_args.kwargs["patch_operations"][0]["value"] == messages[1]["createdAt"]
+
+
+def query_results(*results):
+    # each query_items call returns the next list of results as an async iterator
+    async def iterate(items):
+        for item in items:
+            yield item
+
+    return MagicMock(side_effect=[iterate(items) for items in results])
+
+
+@pytest.mark.asyncio
+async def test_delete_messages_deletes_ids_in_batches():
+    client = make_client()
+    message_ids = [f"m{i}" for i in range(250)]
+    client.container_client.query_items = query_results(message_ids)
+    client.container_client.delete_item = AsyncMock()
+
+    assert await client.delete_messages("c1", "u1") == 250
+
+    query = client.container_client.query_items.call_args.kwargs
+    assert "SELECT VALUE c.id" in query["query"]
+    assert {"name": "@conversationId", "value": "c1"} in query["parameters"]
+    batches = [call.kwargs["batch_operations"] for call in client.container_client.execute_item_batch.await_args_list]
+    assert [len(batch) for batch in batches] == [100, 100, 50]
+    assert [item_id for batch in batches for _, (item_id,) in batch] == message_ids
+    assert all(operation == "delete" for batch in batches for operation, _ in batch)
+    client.container_client.delete_item.assert_not_awaited()
+    client.container_client.read_item.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_delete_items_bounds_concurrency():
+    client = make_client()
+    in_flight = 0
+    max_in_flight = 0
+
+    async def slow_batch(batch_operations, partition_key, response_hook=None):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+
+    client.container_client.execute_item_batch.side_effect = slow_batch
+
+    assert await client.delete_items("u1", [f"m{i}" for i in range(1000)], concurrency=3) == 1000
+    assert client.container_client.execute_item_batch.await_count == 10
+    assert max_in_flight == 3
+
+
+@pytest.mark.asyncio
+async def test_delete_items_falls_back_to_point_deletes():
+    client = without_batch(make_client())
+    client.container_client.delete_item = AsyncMock(
+        side_effect=[None, exceptions.CosmosResourceNotFoundError(status_code=404), None]
+    )
+
+    assert await client.delete_items("u1", ["m1", "m2", "m3"]) == 3
+    assert [call.kwargs["item"] for call in client.container_client.delete_item.await_args_list] == ["m1", "m2", "m3"]
+
+
+@pytest.mark.asyncio
+async def test_delete_conversation_is_a_point_delete():
+    client = make_client()
+    client.container_client.delete_item = AsyncMock(side_effect=exceptions.CosmosResourceNotFoundError(status_code=404))
+
+    assert await client.delete_conversation("u1", "c1") is True
+    client.container_client.delete_item.assert_awaited_once_with(item="c1", partition_key="u1", response_hook=ANY)
+    client.container_client.read_item.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_delete_user_history_deletes_messages_first():
+    client = make_client()
+    client.container_client.query_items = query_results(["m1", "m2"], ["c1"])
+    progress = []
+
+    async def on_progress(count):
+        progress.append(count)
+
+    assert await client.delete_user_history("u1", on_progress=on_progress) == 3
+
+    batches = [call.kwargs["batch_operations"] for call in client.container_client.execute_item_batch.await_args_list]
+    assert batches == [[("delete", ("m1",)), ("delete", ("m2",))], [("delete", ("c1",))]]
+    assert progress == [2, 1]
+
+
+@pytest.mark.asyncio
+async def test_get_delete_job_ignores_other_items():
+    client = make_client()
+    client.container_client.read_item = AsyncMock(return_value={"id": "c1", "type": "conversation"})
+
+    assert await client.get_delete_job("u1", "c1") is None
+
+    client.container_client.read_item = AsyncMock(side_effect=exceptions.CosmosResourceNotFoundError(status_code=404))
+    assert await client.get_delete_job("u1", "j1") is None
+
+
+class FakePages:
+    """Async iterator of query result pages with a continuation token, like AsyncItemPaged.by_page."""
+
+    def __init__(self, pages, continuation_token):
+        self._pages = iter(pages)
+        self.continuation_token = None
+        self._next_token = continuation_token
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            page = next(self._pages)
+        except StopIteration:
+            raise StopAsyncIteration
+        self.continuation_token = self._next_token
+
+        async def items():
+            for item in page:
+                yield item
+
+        return items()
+
+
+def paged_query(pages, continuation_token):
+    fake_pages = FakePages(pages, continuation_token)
+    query = MagicMock()
+    query.by_page = MagicMock(return_value=fake_pages)
+    return MagicMock(return_value=query)
+
+
+@pytest.mark.asyncio
+async def test_get_conversations_page_returns_next_cursor():
+    client = make_client()
+    client.container_client.query_items = paged_query([[{"id": "c1"}, {"id": "c2"}], [{"id": "c3"}]], "token-1")
+
+    conversations, cursor = await client.get_conversations_page("u1", limit=2)
+
+    assert conversations == [{"id": "c1"}, {"id": "c2"}]
+    kwargs = client.container_client.query_items.call_args.kwargs
+    assert kwargs["query"].startswith("SELECT c.id, c.title, c.createdAt, c.updatedAt FROM c")
+    assert "offset" not in kwargs["query"]
+    assert kwargs["partition_key"] == "u1"
+    assert kwargs["max_item_count"] == 2
+    client.container_client.query_items.return_value.by_page.assert_called_once_with(None)
+
+    client.container_client.query_items = paged_query([[{"id": "c3"}]], None)
+    conversations, next_cursor = await client.get_conversations_page("u1", limit=2, cursor=cursor)
+
+    assert conversations == [{"id": "c3"}]
+    assert next_cursor is None
+    client.container_client.query_items.return_value.by_page.assert_called_once_with("token-1")
+
+
+@pytest.mark.asyncio
+async def test_get_conversations_page_rejects_invalid_cursor():
+    client = make_client()
+    client.container_client.query_items = paged_query([], None)
+
+    with pytest.raises(ValueError):
+        await client.get_conversations_page("u1", limit=2, cursor="not base64!")
+
+
+@pytest.mark.asyncio
+async def test_get_conversation_is_a_point_read():
+    client = make_client()
+    client.container_client.read_item = AsyncMock(return_value={"id": "c1", "type": "conversation", "userId": "u1"})
+
+    assert await client.get_conversation("u1", "c1") == {"id": "c1", "type": "conversation", "userId": "u1"}
+    client.container_client.read_item.assert_awaited_once_with(item="c1", partition_key="u1", response_hook=ANY)
+    client.container_client.query_items.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_get_conversation_checks_type():
+    client = make_client()
+    client.container_client.read_item = AsyncMock(return_value={"id": "m1", "type": "message", "userId": "u1"})
+    assert await client.get_conversation("u1", "m1") is None
+
+    client.container_client.read_item = AsyncMock(side_effect=exceptions.CosmosResourceNotFoundError(status_code=404))
+    assert await client.get_conversation("u1", "c1") is None
+
+
+@pytest.mark.asyncio
+async def test_get_conversation_memoized_within_request():
+    client = make_client()
+    client.container_client.read_item = AsyncMock(return_value={"id": "c1", "type": "conversation", "userId": "u1"})
+
+    async def handler():
+        start_request_memo()
+        reads = client.container_client.read_item.await_count
+        await client.get_conversation("u1", "c1")
+        await client.get_conversation("u1", "c1")
+        assert client.container_client.read_item.await_count == reads + 1
+
+        # writes drop the memoized conversation
+        await client.update_conversation_title("u1", "c1", "New title")
+        await client.get_conversation("u1", "c1")
+        assert client.container_client.read_item.await_count == reads + 2
+
+    # each request runs in its own context
+    await asyncio.create_task(handler())
+    await asyncio.create_task(handler())
+    assert client.container_client.read_item.await_count == 4
+
+    # without a memo every lookup is read
+    await client.get_conversation("u1", "c1")
+    assert client.container_client.read_item.await_count == 5
+
+
+@pytest.mark.asyncio
+async def test_get_messages_projects_in_order():
+    client = make_client()
+    client.container_client.query_items = query_results([{"id": "m1"}, {"id": "m2"}])
+
+    messages = [message async for message in client.get_messages("u1", "c1")]
+
+    assert messages == [{"id": "m1"}, {"id": "m2"}]
+    kwargs = client.container_client.query_items.call_args.kwargs
+    assert kwargs["query"].startswith("SELECT c.id, c.role, c.content, c.createdAt, c.feedback FROM c")
+    assert kwargs["query"].endswith("ORDER BY c.createdAt ASC, c.id ASC")
+    assert kwargs["partition_key"] == "u1"
+
+
+@pytest.mark.asyncio
+async def test_get_messages_pages_from_the_tail():
+    client = make_client()
+    client.container_client.query_items = query_results([{"id": "m3"}, {"id": "m2"}])
+
+    messages = [
+        message async for message in client.get_messages("u1", "c1", limit=2, before=("2025-01-01T00:00:03", "m4"))
+    ]
+
+    assert messages == [{"id": "m2"}, {"id": "m3"}]
+    kwargs = client.container_client.query_items.call_args.kwargs
+    assert kwargs["query"].startswith("SELECT TOP @limit")
+    assert "(c.createdAt < @beforeCreatedAt OR (c.createdAt = @beforeCreatedAt AND c.id < @beforeId))" in kwargs["query"]
+    assert kwargs["query"].endswith("ORDER BY c.createdAt DESC, c.id DESC")
+    assert {"name": "@limit", "value": 2} in kwargs["parameters"]
+    assert {"name": "@beforeCreatedAt", "value": "2025-01-01T00:00:03"} in kwargs["parameters"]
+    assert {"name": "@beforeId", "value": "m4"} in kwargs["parameters"]
+
+
+@pytest.mark.asyncio
+async def test_conversation_list_served_from_cache_and_written_through():
+    client = make_client()
+    client.conversation_list_cache = ConversationListCache()
+    first_page = [
+        {"id": "c2", "title": "Second", "createdAt": "2025-01-02T00:00:00", "updatedAt": "2025-01-02T00:00:00"},
+        {"id": "c1", "title": "First", "createdAt": "2025-01-01T00:00:00", "updatedAt": "2025-01-01T00:00:00"},
+    ]
+    client.container_client.query_items = query_results(first_page)
+
+    assert await client.get_conversations("u1", limit=25) == first_page
+    assert await client.get_conversations("u1", limit=25, offset="0") == first_page
+    assert client.container_client.query_items.call_count == 1
+
+    # a new message moves its conversation to the top
+    await client.create_message("m1", "c1", "u1", {"role": "user", "content": "hi"})
+    conversations = await client.get_conversations("u1", limit=25)
+    assert [c["id"] for c in conversations] == ["c1", "c2"]
+    assert conversations[0]["updatedAt"] > "2025-01-02T00:00:00"
+
+    await client.update_conversation_title("u1", "c2", "Renamed")
+    client.container_client.delete_item = AsyncMock()
+    await client.delete_conversation("u1", "c1")
+    created = await client.create_conversation("u1", title="Third", conversation_id="c3")
+
+    conversations = await client.get_conversations("u1", limit=25)
+    assert conversations == [
+        {"id": "c3", "title": "Third", "createdAt": created["createdAt"], "updatedAt": created["updatedAt"]},
+        {"id": "c2", "title": "Renamed", "createdAt": "2025-01-02T00:00:00", "updatedAt": "2025-01-02T00:00:00"},
+    ]
+    assert client.container_client.query_items.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_conversation_list_cache_skips_later_pages():
+    client = make_client()
+    client.conversation_list_cache = ConversationListCache()
+    client.container_client.query_items = query_results([{"id": "c1"}], [{"id": "c0"}], [{"id": "c0"}])
+
+    await client.get_conversations("u1", limit=25)
+    await client.get_conversations("u1", limit=25, offset=25)
+    await client.get_conversations("u1", limit=25, offset=25)
+    assert client.container_client.query_items.call_count == 3
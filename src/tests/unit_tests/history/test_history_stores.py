@@ -0,0 +1,168 @@
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+
+from backend.history.history_store import (DELETE_JOB_STALE_SECONDS,
+                                           is_stale_delete_job)
+from backend.history.memory_store import InMemoryHistoryStore
+from backend.history.sqlite_store import SQLiteHistoryStore
+
+
+@pytest_asyncio.fixture(params=["memory", "sqlite"])
+async def store(request, tmp_path):
+    if request.param == "memory":
+        history_store = InMemoryHistoryStore(enable_message_feedback=True)
+    else:
+        history_store = SQLiteHistoryStore(str(tmp_path / "history.db"), enable_message_feedback=True)
+    yield history_store
+    await history_store.close()
+
+
+async def read_messages(store, *args, **kwargs):
+    return [message async for message in store.get_messages(*args, **kwargs)]
+
+
+@pytest.mark.asyncio
+async def test_conversation_lifecycle(store):
+    success, _ = await store.ensure()
+    assert success
+    conversation = await store.create_conversation("u1", title="Title", conversation_id="c1")
+    assert conversation["id"] == "c1"
+
+    assert (await store.get_conversation("u1", "c1"))["title"] == "Title"
+    assert await store.get_conversation("u2", "c1") is None
+
+    await store.update_conversation_title("u1", "c1", "Renamed")
+    assert (await store.get_conversation("u1", "c1"))["title"] == "Renamed"
+
+    conversation = await store.get_conversation("u1", "c1")
+    await store.upsert_conversation({**conversation, "title": "Upserted"})
+    assert (await store.get_conversation("u1", "c1"))["title"] == "Upserted"
+
+    assert await store.delete_conversation("u1", "c1") is True
+    assert await store.get_conversation("u1", "c1") is None
+    assert await store.delete_conversation("u1", "c1") is True
+
+
+@pytest.mark.asyncio
+async def test_messages_in_order_and_paged_from_the_tail(store):
+    await store.create_conversation("u1", conversation_id="c1")
+    before = (await store.get_conversation("u1", "c1"))["updatedAt"]
+
+    messages = await store.create_messages("c1", "u1", [
+        (f"m{i}", {"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i}"}) for i in range(5)
+    ])
+    assert [message["id"] for message in messages] == ["m0", "m1", "m2", "m3", "m4"]
+    assert (await store.get_conversation("u1", "c1"))["updatedAt"] > before
+
+    all_messages = await read_messages(store, "u1", "c1")
+    assert [message["id"] for message in all_messages] == ["m0", "m1", "m2", "m3", "m4"]
+    assert set(all_messages[0]) == {"id", "role", "content", "createdAt", "feedback"}
+
+    tail = await read_messages(store, "u1", "c1", limit=2)
+    assert [message["id"] for message in tail] == ["m3", "m4"]
+    older = await read_messages(store, "u1", "c1", limit=2, before=(tail[0]["createdAt"], tail[0]["id"]))
+    assert [message["id"] for message in older] == ["m1", "m2"]
+
+    message = await store.create_message("m5", "c1", "u1", {"role": "user", "content": "last"})
+    assert message["conversationId"] == "c1"
+    assert (await store.update_message_feedback("u1", "m5", "positive"))["feedback"] == "positive"
+    assert await store.update_message_feedback("u1", "missing", "positive") is False
+
+
+@pytest.mark.asyncio
+async def test_messages_created_together_are_paged_by_id(store, monkeypatch):
+    # messages written by different requests at the same time share their createdAt
+    monkeypatch.setattr(store, "_new_messages", lambda conversation_id, user_id, messages: [
+        store._new_message(message_id, conversation_id, user_id, message, "2025-01-01T00:00:00")
+        for message_id, message in messages
+    ])
+    await store.create_conversation("u1", conversation_id="c1")
+    await store.create_messages("c1", "u1", [(f"m{i}", {"role": "user", "content": f"message {i}"}) for i in range(5)])
+
+    pages = []
+    before = None
+    while True:
+        page = await read_messages(store, "u1", "c1", limit=2, before=before)
+        if not page:
+            break
+        pages.append([message["id"] for message in page])
+        before = (page[0]["createdAt"], page[0]["id"])
+    assert [message_id for page in reversed(pages) for message_id in page] == ["m0", "m1", "m2", "m3", "m4"]
+
+
+@pytest.mark.asyncio
+async def test_message_for_missing_conversation(store):
+    assert await store.create_message("m1", "missing", "u1", {"role": "user", "content": "hi"}) == "Conversation not found"
+    assert await store.get_item_ids("u1", "message") == []
+
+
+@pytest.mark.asyncio
+async def test_conversation_list_by_offset_and_cursor(store):
+    for i in range(5):
+        await store.create_conversation("u1", title=f"Conversation {i}", conversation_id=f"c{i}")
+        await store.create_message(f"m{i}", f"c{i}", "u1", {"role": "user", "content": "hi"})
+    await store.create_conversation("u2", conversation_id="other")
+
+    newest_first = ["c4", "c3", "c2", "c1", "c0"]
+    conversations = await store.get_conversations("u1", limit=None)
+    assert [c["id"] for c in conversations] == newest_first
+    assert set(conversations[0]) == {"id", "title", "createdAt", "updatedAt"}
+    assert [c["id"] for c in await store.get_conversations("u1", limit=2, offset=2)] == ["c2", "c1"]
+
+    ids, cursor = [], None
+    while True:
+        page, cursor = await store.get_conversations_page("u1", limit=2, cursor=cursor)
+        ids += [c["id"] for c in page]
+        if cursor is None:
+            break
+    assert ids == newest_first
+
+    with pytest.raises(ValueError):
+        await store.get_conversations_page("u1", limit=2, cursor="not a cursor")
+
+
+@pytest.mark.asyncio
+async def test_delete_user_history_and_jobs(store):
+    await store.create_conversation("u1", conversation_id="c1")
+    await store.create_messages("c1", "u1", [("m1", {"role": "user", "content": "hi"}),
+                                             ("m2", {"role": "assistant", "content": "hello"})])
+    await store.create_conversation("u2", conversation_id="c2")
+    await store.save_delete_job("u1", {"id": "j1", "status": "running", "total_count": 3, "deleted_count": 0})
+
+    progress = []
+
+    async def on_progress(count):
+        progress.append(count)
+
+    assert await store.delete_user_history("u1", on_progress=on_progress) == 3
+    assert sum(progress) == 3
+    assert await store.get_item_ids("u1", "conversation") == []
+    assert await store.get_item_ids("u1", "message") == []
+    assert await store.get_item_ids("u2", "conversation") == ["c2"]
+
+    assert (await store.get_delete_job("u1", "j1"))["status"] == "running"
+    assert await store.get_delete_job("u2", "j1") is None
+    assert await store.get_delete_job("u1", "c2") is None
+
+
+@pytest.mark.asyncio
+async def test_delete_finished_delete_jobs(store):
+    await store.create_conversation("u1", conversation_id="c1")
+    for job_id, status in (("j1", "completed"), ("j2", "failed"), ("j3", "running")):
+        await store.save_delete_job("u1", {"id": job_id, "status": status, "total_count": 3, "deleted_count": 0})
+
+    assert await store.delete_finished_delete_jobs("u1") == 2
+    assert await store.get_item_ids("u1", "delete_job") == ["j3"]
+    assert await store.get_item_ids("u1", "conversation") == ["c1"]
+
+
+def test_is_stale_delete_job():
+    now = datetime(2025, 1, 1, 12, 0, 0)
+    recent = (now - timedelta(seconds=5)).isoformat()
+    old = (now - timedelta(seconds=DELETE_JOB_STALE_SECONDS + 1)).isoformat()
+
+    assert not is_stale_delete_job({"status": "running", "updatedAt": recent}, now)
+    assert is_stale_delete_job({"status": "running", "updatedAt": old}, now)
+    assert not is_stale_delete_job({"status": "completed", "updatedAt": old}, now)
@@ -0,0 +1,269 @@
+import asyncio
+import json
+import os
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+# app reads its settings on import
+os.environ["DOTENV_PATH"] = os.path.join(
+    os.path.dirname(__file__), "dotenv_data", "dotenv_with_azure_search_success"
+)
+import app as app_module  # noqa: E402
+from backend.api.agent.thread_deletion_queue import ThreadDeletionQueue  # noqa: E402
+from backend.auth.auth_utils import get_authenticated_user_details  # noqa: E402
+from backend.history.memory_store import InMemoryHistoryStore  # noqa: E402
+from backend.title_generator import generate_local_title  # noqa: E402
+
+
+@pytest.fixture
+def quart_app(monkeypatch):
+    quart_app = app_module.create_app()
+    monkeypatch.setattr(app_module, "app", quart_app)
+    # the process-wide queue may hold a worker of another test's event loop
+    monkeypatch.setattr(app_module, "thread_deletion_queue", ThreadDeletionQueue())
+    return quart_app
+
+
+@pytest.fixture
+def history_client(monkeypatch):
+    client = MagicMock()
+    client.create_conversation = AsyncMock(side_effect=lambda user_id, title, conversation_id: {
+        "id": conversation_id, "title": title, "createdAt": "2024-05-01T00:00:00"
+    })
+    client.create_message = AsyncMock(return_value={"id": "m1"})
+    client.update_conversation_title = AsyncMock()
+    monkeypatch.setattr(app_module.conversation_client_manager, "get_client", AsyncMock(return_value=client))
+    return client
+
+
+def llm_client(title=None, error=None):
+    create = AsyncMock()
+    if error is not None:
+        create.side_effect = error
+    else:
+        create.return_value = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=f'{{"title": "{title}"}}'))]
+        )
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+FIRST_MESSAGES = [{"role": "user", "content": "Generate a promissory note for a loan"}]
+
+
+@pytest.mark.asyncio
+async def test_ai_foundry_client_is_shared_and_closed_on_shutdown(quart_app, monkeypatch):
+    client = MagicMock()
+    client.close = AsyncMock()
+    init_client = AsyncMock(return_value=client)
+    monkeypatch.setattr(app_module, "init_ai_foundry_client", init_client)
+
+    async with quart_app.test_app():
+        clients = await asyncio.gather(*(app_module.get_ai_foundry_client() for _ in range(5)))
+        assert all(shared is client for shared in clients)
+        assert await app_module.get_ai_foundry_client() is client
+        init_client.assert_awaited_once()
+
+    client.close.assert_awaited_once()
+    assert quart_app.ai_foundry_client is None
+
+
+@pytest.mark.asyncio
+async def test_generated_title_replaces_local_title(history_client, monkeypatch):
+    monkeypatch.setattr(app_module, "get_ai_foundry_client", AsyncMock(return_value=llm_client("Loan Note")))
+    history_metadata = {"title": generate_local_title(FIRST_MESSAGES)}
+    persist_task = asyncio.ensure_future(asyncio.sleep(0))
+
+    title = await app_module.generate_conversation_title("u1", "c1", FIRST_MESSAGES, history_metadata, persist_task)
+
+    assert title == "Loan Note"
+    assert history_metadata["title"] == "Loan Note"
+    history_client.update_conversation_title.assert_awaited_once_with("u1", "c1", "Loan Note")
+
+
+@pytest.mark.asyncio
+async def test_failed_title_generation_keeps_local_title(history_client, monkeypatch):
+    client = llm_client(error=RuntimeError("model unavailable"))
+    monkeypatch.setattr(app_module, "get_ai_foundry_client", AsyncMock(return_value=client))
+    local_title = generate_local_title(FIRST_MESSAGES)
+    history_metadata = {"title": local_title}
+
+    title = await app_module.generate_conversation_title("u1", "c1", FIRST_MESSAGES, history_metadata)
+
+    assert title == local_title
+    assert history_metadata["title"] == local_title
+    history_client.update_conversation_title.assert_awaited_once_with("u1", "c1", local_title)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("title_mode, waits_for_title", [("llm", True), ("local_then_llm", False)])
+async def test_new_conversation_title_upgrade(quart_app, history_client, monkeypatch, title_mode, waits_for_title):
+    monkeypatch.setattr(app_module.app_settings.azure_openai, "title_mode", title_mode)
+    monkeypatch.setattr(app_module, "get_ai_foundry_client", AsyncMock(return_value=llm_client("Loan Note")))
+    conversation_internal = AsyncMock(return_value=("ok", 200))
+    monkeypatch.setattr(app_module, "conversation_internal", conversation_internal)
+
+    response = await quart_app.test_client().post("/history/generate", json={"messages": FIRST_MESSAGES})
+    assert response.status_code == 200
+
+    request_json, _, title_task, persist_task = conversation_internal.await_args.args
+    # the conversation is created with the local title, the model title replaces it
+    assert history_client.create_conversation.await_args.kwargs["title"] == generate_local_title(FIRST_MESSAGES)
+    assert (title_task is not None) == waits_for_title
+    await persist_task
+    await asyncio.gather(*app_module.background_tasks)
+    assert request_json["history_metadata"]["title"] == "Loan Note"
+    history_client.update_conversation_title.assert_awaited_once()
+    assert history_client.update_conversation_title.await_args.args[1:] == (
+        request_json["history_metadata"]["conversation_id"], "Loan Note"
+    )
+
+
+async def answer_chunks(*answers):
+    for answer in answers:
+        await asyncio.sleep(0)
+        yield {"answer": answer}
+
+
+async def collect(frames):
+    return [frame async for frame in frames]
+
+
+@pytest.mark.asyncio
+async def test_hold_last_chunk_releases_last_chunk_once_persisted():
+    persisted = asyncio.Event()
+    persist_task = asyncio.ensure_future(persisted.wait())
+    chunks = app_module.hold_last_chunk(answer_chunks("a", "b", "c"), persist_task=persist_task)
+
+    assert [await anext(chunks), await anext(chunks)] == [{"answer": "a"}, {"answer": "b"}]
+    last = asyncio.ensure_future(anext(chunks))
+    await asyncio.sleep(0.01)
+    assert not last.done()
+
+    persisted.set()
+    assert await last == {"answer": "c"}
+    assert await collect(chunks) == []
+
+
+@pytest.mark.asyncio
+async def test_hold_last_chunk_passes_chunks_through_when_nothing_is_pending():
+    persist_task = asyncio.ensure_future(asyncio.sleep(0))
+    await persist_task
+
+    chunks = app_module.hold_last_chunk(answer_chunks("a", "b"), persist_task=persist_task)
+    assert await collect(chunks) == [{"answer": "a"}, {"answer": "b"}]
+
+
+@pytest.mark.asyncio
+async def test_hold_last_chunk_raises_failed_persist_instead_of_last_chunk():
+    async def failing_persist():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("Conversation not found")
+
+    emitted = []
+    with pytest.raises(RuntimeError, match="Conversation not found"):
+        async for chunk in app_module.hold_last_chunk(answer_chunks("a", "b"), persist_task=asyncio.ensure_future(failing_persist())):
+            emitted.append(chunk)
+    assert emitted == [{"answer": "a"}]
+
+
+@pytest.mark.asyncio
+async def test_stream_frames_carry_generated_title(monkeypatch):
+    history_metadata = {"conversation_id": "c1", "title": "Local title"}
+
+    async def generate_title():
+        await asyncio.sleep(0.01)
+        history_metadata["title"] = "Generated title"
+
+    monkeypatch.setattr(app_module, "send_chat_request", lambda body, headers: answer_chunks("a", "b", "c"))
+    frames = await app_module.stream_chat_request(
+        {"history_metadata": history_metadata}, {},
+        title_task=asyncio.ensure_future(generate_title()),
+        persist_task=asyncio.ensure_future(asyncio.sleep(0)),
+    )
+    lines = [json.loads(line) for line in await collect(app_module.format_as_ndjson(frames))]
+
+    assert [line["choices"][0]["messages"][0]["content"] for line in lines] == ["a", "b", "c"]
+    assert lines[0]["history_metadata"]["title"] == "Local title"
+    assert lines[-1]["history_metadata"]["title"] == "Generated title"
+
+
+@pytest.mark.asyncio
+async def test_stream_reports_failed_persist(monkeypatch):
+    async def failing_persist():
+        raise RuntimeError("Conversation not found")
+
+    monkeypatch.setattr(app_module, "send_chat_request", lambda body, headers: answer_chunks("a", "b"))
+    persist_task = asyncio.ensure_future(failing_persist())
+    frames = await app_module.stream_chat_request({"history_metadata": {}}, {}, persist_task=persist_task)
+    lines = [json.loads(line) for line in await collect(app_module.format_as_ndjson(frames))]
+
+    assert lines[-1] == {"error": "Conversation not found"}
+    assert all("error" not in line for line in lines[:-1])
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("age_seconds, status", [(5, "running"), (3600, "failed")])
+async def test_delete_all_status_fails_interrupted_jobs(quart_app, history_client, age_seconds, status):
+    updated_at = (datetime.utcnow() - timedelta(seconds=age_seconds)).isoformat()
+    history_client.get_delete_job = AsyncMock(return_value={
+        "id": "j1", "status": "running", "total_count": 10, "deleted_count": 4, "updatedAt": updated_at,
+    })
+    history_client.save_delete_job = AsyncMock()
+
+    response = await quart_app.test_client().get("/history/delete_all/status?job_id=j1")
+
+    assert response.status_code == 200
+    assert (await response.get_json())["status"] == status
+    assert history_client.save_delete_job.await_count == (status == "failed")
+
+
+@pytest.mark.asyncio
+async def test_history_read_pages_messages_created_together(quart_app, monkeypatch):
+    store = InMemoryHistoryStore()
+    monkeypatch.setattr(store, "_new_messages", lambda conversation_id, user_id, messages: [
+        store._new_message(message_id, conversation_id, user_id, message, "2025-01-01T00:00:00")
+        for message_id, message in messages
+    ])
+    monkeypatch.setattr(app_module.conversation_client_manager, "get_client", AsyncMock(return_value=store))
+    user_id = get_authenticated_user_details(request_headers={})["user_principal_id"]
+    await store.create_conversation(user_id, conversation_id="c1")
+    await store.create_messages("c1", user_id, [(f"m{i}", {"role": "user", "content": "hi"}) for i in range(5)])
+    client = quart_app.test_client()
+
+    message_ids = []
+    before = None
+    while True:
+        response = await client.post("/history/read", json={"conversation_id": "c1", "limit": 2, "before": before})
+        page = await response.get_json()
+        message_ids = [message["id"] for message in page["messages"]] + message_ids
+        if not page["has_more"]:
+            break
+        before = page["next_before"]
+    assert message_ids == ["m0", "m1", "m2", "m3", "m4"]
+
+    response = await client.post("/history/read", json={"conversation_id": "c1", "limit": 2, "before": "not a cursor"})
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("offset", ["abc", "-1", "1.5", "0 limit 1000"])
+async def test_history_list_rejects_invalid_offset(quart_app, history_client, offset):
+    history_client.get_conversations = AsyncMock(return_value=[])
+
+    response = await quart_app.test_client().get("/history/list", query_string={"offset": offset})
+
+    assert response.status_code == 400
+    history_client.get_conversations.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_history_list_passes_offset_as_integer(quart_app, history_client):
+    history_client.get_conversations = AsyncMock(return_value=[])
+
+    response = await quart_app.test_client().get("/history/list", query_string={"offset": "25"})
+
+    assert response.status_code == 200
+    assert history_client.get_conversations.await_args.kwargs["offset"] == 25
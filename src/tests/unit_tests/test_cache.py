@@ -0,0 +1,157 @@
+import pytest
+
+from backend.cache import (ConversationListCache, SectionContentCache,
+                           SQLiteCache, TTLCache, section_cache_key)
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_ttl_cache_expires_entries():
+    cache = TTLCache(max_size=2, ttl=-1)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_section_cache_key_normalizes_text_and_includes_versions():
+    key = section_cache_key("Introduction", "The  intro", "prompt", "index", "1")
+    assert key == section_cache_key(" introduction ", "the intro\n", "prompt", "index", "1")
+    assert key != section_cache_key("Introduction", "The intro", "other prompt", "index", "1")
+    assert key != section_cache_key("Introduction", "The intro", "prompt", "other-index", "1")
+    assert key != section_cache_key("Introduction", "The intro", "prompt", "index", "2")
+
+
+@pytest.mark.asyncio
+async def test_section_content_cache_memory_hits_and_bypass():
+    cache = SectionContentCache(max_size=4)
+    assert await cache.get("key") is None
+    await cache.set("key", "content")
+
+    assert await cache.get("key") == "content"
+    assert await cache.get("key", bypass=True) is None
+    assert cache.metrics() == {"memory_hits": 1, "disk_hits": 0, "misses": 1, "bypassed": 1, "size": 1}
+
+
+@pytest.mark.asyncio
+async def test_section_content_cache_reads_through_sqlite_tier(tmp_path):
+    path = str(tmp_path / "sections.db")
+    writer = SectionContentCache(sqlite_path=path)
+    await writer.set("key", "content")
+    writer.close()
+
+    reader = SectionContentCache(sqlite_path=path)
+    assert await reader.get("key") == "content"
+    assert await reader.get("key") == "content"
+    assert reader.disk_hits == 1
+    assert reader.memory_hits == 1
+    reader.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_cache_expires_entries(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "sections.db"), ttl=-1)
+    await cache.set("key", "content")
+    assert await cache.get("key") is None
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_conversation_list_cache_matches_limit_and_cursor():
+    cache = ConversationListCache()
+    await cache.set("u1", 25, [{"id": "c1"}])
+
+    assert await cache.get("u1", 25) == {"conversations": [{"id": "c1"}], "next_cursor": None}
+    assert await cache.get("u1", 10) is None
+    # a page listed by offset has no cursor for the next page
+    assert await cache.get("u1", 25, with_cursor=True) is None
+
+    await cache.set("u1", 25, [{"id": "c1"}], "cursor-2")
+    assert await cache.get("u1", 25, with_cursor=True) == {"conversations": [{"id": "c1"}], "next_cursor": "cursor-2"}
+
+
+@pytest.mark.asyncio
+async def test_conversation_list_cache_touch_of_uncached_conversation_invalidates():
+    cache = ConversationListCache()
+    await cache.set("u1", 25, [{"id": "c1", "updatedAt": "t1"}])
+
+    await cache.touch("u1", "c9", "t9")
+    assert await cache.get("u1", 25) is None
+
+
+@pytest.mark.asyncio
+async def test_conversation_list_cache_shared_between_workers(tmp_path):
+    path = str(tmp_path / "conversations.db")
+    worker_a = ConversationListCache(sqlite_path=path)
+    worker_b = ConversationListCache(sqlite_path=path)
+
+    await worker_a.set("u1", 25, [{"id": "c1", "title": "Old"}])
+    await worker_b.update("u1", "c1", title="New")
+    assert (await worker_a.get("u1", 25))["conversations"] == [{"id": "c1", "title": "New"}]
+
+    await worker_b.invalidate("u1")
+    assert await worker_a.get("u1", 25) is None
+    worker_a.close()
+    worker_b.close()
+
+
+def conversation_list(count):
+    return [{"id": f"c{i}", "updatedAt": f"t{i}"} for i in reversed(range(count))]
+
+
+async def first_two_pages(cache, conversations, limit):
+    # the first page from the cache when cached, the second one as the store would list it
+    cached = await cache.get("u1", limit)
+    first = cached["conversations"] if cached is not None else conversations[:limit]
+    return first, conversations[limit:2 * limit]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("cursor", [None, "cursor-2"])
+async def test_conversation_list_cache_pages_stay_consistent_after_add(cursor):
+    cache = ConversationListCache()
+    conversations = conversation_list(5)
+    await cache.set("u1", 2, conversations[:2], *([cursor] if cursor else []))
+
+    new = {"id": "c5", "updatedAt": "t5"}
+    conversations.insert(0, new)
+    await cache.add("u1", new)
+
+    first, second = await first_two_pages(cache, conversations, 2)
+    assert [c["id"] for c in first + second] == ["c5", "c4", "c3", "c2"]
+
+
+@pytest.mark.asyncio
+async def test_conversation_list_cache_pages_stay_consistent_after_delete():
+    cache = ConversationListCache()
+    conversations = conversation_list(5)
+    await cache.set("u1", 2, conversations[:2])
+
+    conversations = [c for c in conversations if c["id"] != "c4"]
+    await cache.remove("u1", "c4")
+
+    first, second = await first_two_pages(cache, conversations, 2)
+    assert [c["id"] for c in first + second] == ["c3", "c2", "c1", "c0"]
+
+
+@pytest.mark.asyncio
+async def test_conversation_list_cache_patches_a_partial_last_page():
+    cache = ConversationListCache()
+    await cache.set("u1", 25, conversation_list(2), None)
+
+    await cache.add("u1", {"id": "c2", "updatedAt": "t2"})
+    await cache.remove("u1", "c0")
+
+    assert await cache.get("u1", 25, with_cursor=True) == {
+        "conversations": [{"id": "c2", "updatedAt": "t2"}, {"id": "c1", "updatedAt": "t1"}],
+        "next_cursor": None,
+    }
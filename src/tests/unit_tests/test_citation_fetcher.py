@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from backend.citation_fetcher import CitationContentFetcher, CitationFetchError
+
+
+@pytest_asyncio.fixture
+async def search_server():
+    requests = []
+
+    async def document(request):
+        requests.append(request)
+        await asyncio.sleep(0.05)
+        if request.match_info["name"] == "missing":
+            return web.Response(status=404, text="not found")
+        if request.match_info["name"] == "list":
+            return web.json_response(["not", "a", "document"])
+        return web.json_response({"content": f"content of {request.match_info['name']}"})
+
+    app = web.Application()
+    app.router.add_get("/docs/{name}", document)
+    server = TestServer(app)
+    await server.start_server()
+    server.requests = requests
+    yield server
+    await server.close()
+
+
+async def token_provider():
+    return "token"
+
+
+@pytest.mark.asyncio
+async def test_fetch_caches_content(search_server):
+    fetcher = CitationContentFetcher(token_provider)
+    url = str(search_server.make_url("/docs/a"))
+
+    assert await fetcher.fetch(url) == "content of a"
+    assert await fetcher.fetch(url) == "content of a"
+
+    assert len(search_server.requests) == 1
+    assert search_server.requests[0].headers["Authorization"] == "Bearer token"
+    assert (fetcher.hits, fetcher.misses) == (1, 1)
+    await fetcher.close()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_fetches_share_one_request(search_server):
+    fetcher = CitationContentFetcher(token_provider)
+    url = str(search_server.make_url("/docs/a"))
+
+    contents = await asyncio.gather(*(fetcher.fetch(url) for _ in range(10)))
+
+    assert contents == ["content of a"] * 10
+    assert len(search_server.requests) == 1
+    await fetcher.close()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_shared_fetch(search_server):
+    fetcher = CitationContentFetcher(token_provider)
+    url = str(search_server.make_url("/docs/a"))
+
+    first = asyncio.create_task(fetcher.fetch(url))
+    second = asyncio.create_task(fetcher.fetch(url))
+    await asyncio.sleep(0.01)
+    first.cancel()
+
+    assert await second == "content of a"
+    assert len(search_server.requests) == 1
+    await fetcher.close()
+
+
+@pytest.mark.asyncio
+async def test_failures_are_not_cached(search_server):
+    fetcher = CitationContentFetcher(token_provider)
+    url = str(search_server.make_url("/docs/missing"))
+
+    for _ in range(2):
+        with pytest.raises(CitationFetchError, match="status code 404"):
+            await fetcher.fetch(url)
+    assert len(search_server.requests) == 2
+    await fetcher.close()
+
+
+@pytest.mark.asyncio
+async def test_non_object_body_is_a_fetch_error(search_server):
+    fetcher = CitationContentFetcher(token_provider)
+
+    with pytest.raises(CitationFetchError, match="Exception: Expected a JSON object, got list"):
+        await fetcher.fetch(str(search_server.make_url("/docs/list")))
+    await fetcher.close()
+
+
+@pytest.mark.asyncio
+async def test_expired_content_is_fetched_again(search_server):
+    fetcher = CitationContentFetcher(token_provider, ttl=-1)
+    url = str(search_server.make_url("/docs/a"))
+
+    await fetcher.fetch(url)
+    await fetcher.fetch(url)
+    assert len(search_server.requests) == 2
+    await fetcher.close()
@@ -0,0 +1,116 @@
+import json
+
+from backend.citations import (CitationMarkerParser, CitationSet,
+                               convert_citation_markers, parse_tool_output)
+
+
+def test_convert_citation_markers():
+    doc_mapping = {}
+    text = "A【3:0†source】 B【4:1†source】 C【3:0†source】"
+    assert convert_citation_markers(text, doc_mapping) == "A[1] B[2] C[1]"
+    assert doc_mapping == {"3:0": "[1]", "4:1": "[2]"}
+
+
+def test_citation_marker_parser_converts_whole_markers():
+    parser = CitationMarkerParser()
+    assert parser.feed("Intro【3:0†source】 and more") == "Intro[1] and more"
+    assert parser.flush() == ""
+    assert parser.marker_count == 1
+
+
+def test_citation_marker_parser_carries_split_markers():
+    parser = CitationMarkerParser()
+    deltas = ["Hello 【", "3", ":0†so", "urce】 world【4:1†source】", "!"]
+    emitted = [parser.feed(delta) for delta in deltas] + [parser.flush()]
+
+    assert emitted == ["Hello ", "", "", "[1] world[2]", "!", ""]
+    assert "".join(emitted) == "Hello [1] world[2]!"
+    assert parser.answer == "".join(deltas)
+    assert parser.marker_count == 2
+
+
+def test_citation_marker_parser_releases_non_markers():
+    parser = CitationMarkerParser()
+    assert parser.feed("bracket 【") == "bracket "
+    assert parser.feed("not a marker") == "【not a marker"
+    assert parser.feed("dangling 【12:") == "dangling "
+    assert parser.flush() == "【12:"
+    assert parser.marker_count == 0
+
+
+def test_citation_marker_parser_shares_doc_mapping():
+    doc_mapping = {"3:0": "[1]"}
+    parser = CitationMarkerParser(doc_mapping)
+    assert parser.feed("【5:2†source】【3:0†source】") == "[2][1]"
+    assert doc_mapping == {"3:0": "[1]", "5:2": "[2]"}
+
+
+def test_parse_tool_output():
+    assert parse_tool_output('{"metadata": {"titles": ["a"]}}') == {"metadata": {"titles": ["a"]}}
+    assert parse_tool_output("{'metadata': {'titles': ['a']}}") == {"metadata": {"titles": ["a"]}}
+    assert parse_tool_output({"metadata": {}}) == {"metadata": {}}
+
+
+def test_citation_set_add_dedupes_by_url():
+    citations = CitationSet()
+    assert citations.add("doc1", "https://a")
+    assert not citations.add("doc1 again", "https://a")
+    assert citations.add("doc2", "https://b")
+    assert citations.to_list() == [
+        {"title": "doc1", "url": "https://a"},
+        {"title": "doc2", "url": "https://b"},
+    ]
+
+
+def test_citation_set_upsert_by_title():
+    citations = CitationSet()
+    citations.add("doc1", "https://a")
+    citations.upsert("doc1", "https://a2")
+    citations.upsert("doc2", "https://b")
+
+    assert citations.to_list() == [
+        {"title": "doc1", "url": "https://a2"},
+        {"title": "doc2", "url": "https://b"},
+    ]
+    # the replaced URL can be added again
+    assert citations.add("doc3", "https://a")
+    assert len(citations) == 3
+
+
+def test_citation_set_upsert_updates_first_citation_of_a_title():
+    citations = CitationSet()
+    citations.add("doc1", "https://a")
+    citations.add("doc1", "https://b")
+    citations.add("doc2", "https://c")
+    citations.take_changes(3)
+
+    citations.upsert("doc1", "https://a2")
+    assert citations.take_changes(3) == (0, [{"title": "doc1", "url": "https://a2"},
+                                             {"title": "doc1", "url": "https://b"},
+                                             {"title": "doc2", "url": "https://c"}])
+
+
+def test_citation_set_to_json_is_cached_until_changed():
+    citations = CitationSet()
+    citations.add("doc1", "https://a")
+    serialized = citations.to_json()
+    assert citations.to_json() is serialized
+    assert json.loads(serialized) == [{"title": "doc1", "url": "https://a"}]
+
+    citations.upsert("doc1", "https://b")
+    assert json.loads(citations.to_json()) == [{"title": "doc1", "url": "https://b"}]
+
+
+def test_citation_set_take_changes():
+    citations = CitationSet()
+    citations.add("doc1", "https://a")
+    citations.add("doc2", "https://b")
+    assert citations.take_changes(0) == (0, [{"title": "doc1", "url": "https://a"},
+                                             {"title": "doc2", "url": "https://b"}])
+    assert citations.take_changes(2) == (2, [])
+
+    citations.add("doc3", "https://c")
+    citations.upsert("doc2", "https://b2")
+    assert citations.take_changes(2) == (1, [{"title": "doc2", "url": "https://b2"},
+                                             {"title": "doc3", "url": "https://c"}])
+    assert citations.take_changes(3) == (3, [])
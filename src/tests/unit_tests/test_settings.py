@@ -34,3 +34,8 @@ def test_dotenv_with_azure_search_success(app_settings):
     assert payload["parameters"] is not None
     assert payload["parameters"]["endpoint"] is not None
     print(payload)
+
+    # The per-user access filter is passed in, not kept on the shared settings
+    filtered = app_settings.datasource.construct_payload_configuration(filter="groups/any(g:search.in(g, 'a'))")
+    assert filtered["parameters"]["filter"] == "groups/any(g:search.in(g, 'a'))"
+    assert "filter" not in app_settings.datasource.construct_payload_configuration()["parameters"]
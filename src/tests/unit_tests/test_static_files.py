@@ -0,0 +1,103 @@
+import gzip
+import os
+
+import pytest
+from quart import Quart
+
+from backend.static_files import (IMMUTABLE_CACHE_CONTROL,
+                                  REVALIDATE_CACHE_CONTROL,
+                                  PrecomputedResponse, StaticAssets,
+                                  choose_encoding)
+
+SCRIPT = b"console.log('hello');" * 100
+
+
+@pytest.fixture
+def assets(tmp_path):
+    (tmp_path / "index-AbCd12_-.js").write_bytes(SCRIPT)
+    (tmp_path / "index-AbCd12_-.js.gz").write_bytes(gzip.compress(SCRIPT))
+    (tmp_path / "index-AbCd12_-.js.br").write_bytes(b"brotli")
+    (tmp_path / "logo.svg").write_bytes(b"<svg/>")
+    return StaticAssets(str(tmp_path))
+
+
+@pytest.fixture
+def app():
+    return Quart(__name__)
+
+
+def test_choose_encoding():
+    available = {"br", "gzip"}
+    assert choose_encoding("gzip, deflate, br", available) == "br"
+    assert choose_encoding("gzip, br;q=0", available) == "gzip"
+    assert choose_encoding("*", {"gzip"}) == "gzip"
+    assert choose_encoding("identity", available) is None
+    assert choose_encoding(None, available) is None
+
+
+@pytest.mark.asyncio
+async def test_serves_negotiated_variant_of_hashed_asset(app, assets):
+    async with app.app_context():
+        response = await assets.send("index-AbCd12_-.js", {"Accept-Encoding": "gzip"})
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.headers["Cache-Control"] == IMMUTABLE_CACHE_CONTROL
+        assert "Expires" not in response.headers
+        assert response.headers["Vary"] == "Accept-Encoding"
+        assert response.mimetype in ("text/javascript", "application/javascript")
+        assert gzip.decompress(await response.get_data()) == SCRIPT
+
+        identity = await assets.send("index-AbCd12_-.js", {})
+        assert "Content-Encoding" not in identity.headers
+        assert await identity.get_data() == SCRIPT
+
+        brotli = await assets.send("index-AbCd12_-.js", {"Accept-Encoding": "br, gzip"})
+        assert brotli.headers["Content-Encoding"] == "br"
+        assert brotli.headers["ETag"] != identity.headers["ETag"]
+
+        not_modified = await assets.send("index-AbCd12_-.js", {
+            "Accept-Encoding": "gzip", "If-None-Match": brotli.headers["ETag"],
+        })
+        assert not_modified.status_code == 304
+
+
+@pytest.mark.asyncio
+async def test_unhashed_and_missing_assets(app, assets, tmp_path):
+    async with app.app_context():
+        response = await assets.send("logo.svg", {"Accept-Encoding": "gzip"})
+        assert response.headers["Cache-Control"] == REVALIDATE_CACHE_CONTROL
+        assert "Content-Encoding" not in response.headers
+
+        (tmp_path / "logo.svg").write_bytes(b"<svg></svg>")
+        changed = await assets.send("logo.svg", {"If-None-Match": response.headers["ETag"]})
+        assert changed.status_code == 200
+
+        assert await assets.send("missing.js", {}) is None
+        assert await assets.send("../secret", {}) is None
+        assert await assets.send("index-AbCd12_-.js.gz", {}) is None
+
+
+@pytest.mark.asyncio
+async def test_precomputed_response(app):
+    body = b'{"title": "Contoso"}' * 100
+    page = PrecomputedResponse(body, "application/json")
+    async with app.app_context():
+        response = page.send({"Accept-Encoding": "gzip"})
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert gzip.decompress(await response.get_data()) == body
+
+        assert page.send({"If-None-Match": response.headers["ETag"]}).status_code == 304
+
+    small = PrecomputedResponse(b"{}", "application/json")
+    assert set(small.bodies) == {None}
+
+
+@pytest.mark.asyncio
+async def test_preload_hashes_assets_ahead_of_requests(app, assets, monkeypatch):
+    await assets.preload()
+    assert {os.path.basename(path) for path in assets._assets} == {"index-AbCd12_-.js", "logo.svg"}
+
+    # preloaded assets are served without reading the file again
+    monkeypatch.setattr("backend.static_files.StaticAsset", None)
+    async with app.app_context():
+        response = await assets.send("logo.svg", {})
+        assert response.status_code == 200
@@ -0,0 +1,26 @@
+from backend.title_generator import DEFAULT_TITLE, generate_local_title
+
+
+def test_generate_local_title_keeps_keywords_in_order():
+    messages = [{"role": "user", "content": "Generate a promissory note for a loan of 5000 dollars between two companies"}]
+    assert generate_local_title(messages) == "Promissory Note Loan Dollars"
+
+
+def test_generate_local_title_prefers_repeated_keywords():
+    messages = [{"role": "user", "content": "What are the termination clauses? List every clause about termination fees."}]
+    assert generate_local_title(messages, max_words=2) == "Termination Clauses"
+
+
+def test_generate_local_title_uses_first_user_message_and_keeps_acronyms():
+    messages = [
+        {"role": "user", "content": "Explain the NDA obligations"},
+        {"role": "assistant", "content": "Sure, here they are"},
+        {"role": "user", "content": "And the penalties?"},
+    ]
+    assert generate_local_title(messages) == "NDA Obligations"
+
+
+def test_generate_local_title_fallbacks():
+    assert generate_local_title([]) == DEFAULT_TITLE
+    assert generate_local_title([{"role": "user", "content": "  ?! "}]) == DEFAULT_TITLE
+    assert generate_local_title([{"role": "user", "content": "what is this"}]) == "what is this"
@@ -1,6 +1,19 @@
 import pytest
 
-from backend.utils import format_as_ndjson, parse_multi_columns
+import asyncio
+import dataclasses
+import json
+import sys
+from datetime import date, datetime, timezone
+from types import SimpleNamespace
+
+from quart import Quart, jsonify, request
+
+from backend.citations import CitationSet
+from backend.utils import (STREAM_PROTOCOL_COMPACT, STREAM_PROTOCOL_FULL,
+                           CompactStreamFormatter, FastJSONProvider,
+                           dumps_json, format_as_ndjson, get_stream_protocol,
+                           map_as_completed, parse_multi_columns)
 
 
 @pytest.mark.asyncio
@@ -9,7 +22,7 @@ async def test_format_as_ndjson():
         yield {"message": "test message\n"}
 
     async for event in format_as_ndjson(dummy_generator()):
-        assert event == '{"message": "test message\\n"}\n'
+        assert event == '{"message":"test message\\n"}\n'
 
 
 @pytest.mark.asyncio
@@ -19,7 +32,50 @@ async def test_format_as_ndjson_exception():
         yield {"message": "test message\n"}
 
     async for event in format_as_ndjson(dummy_generator()):
-        assert event == '{"error": "test exception"}'
+        assert event == '{"error":"test exception"}'
+
+
+@dataclasses.dataclass
+class DummyCitation:
+    title: str
+    url: str
+
+
+def test_dumps_json_is_compact_and_handles_dataclasses():
+    assert dumps_json({"citation": DummyCitation("Título", "https://a"), 1: None}) == (
+        '{"citation":{"title":"Título","url":"https://a"},"1":null}'
+    )
+
+
+def test_dumps_json_matches_stdlib_encoder(monkeypatch):
+    event = {"choices": [{"messages": [{"role": "assistant", "content": "é\n"}]}], "created": 1}
+    expected = dumps_json(event)
+    monkeypatch.setattr("backend.utils.orjson", None)
+    assert dumps_json(event) == expected
+
+
+@pytest.mark.asyncio
+async def test_fast_json_provider_serves_responses():
+    app = Quart(__name__)
+    app.json = FastJSONProvider(app)
+
+    @app.route("/echo", methods=["POST"])
+    async def echo():
+        return jsonify(await request.get_json())
+
+    response = await app.test_client().post("/echo", json={"b": DummyCitation("t", "u"), "a": [1]})
+    assert response.status_code == 200
+    assert await response.get_data(as_text=True) == '{"a":[1],"b":{"title":"t","url":"u"}}\n'
+
+
+def test_fast_json_provider_matches_default_provider_for_dates():
+    app = Quart(__name__)
+    value = {"at": datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc), "on": date(2024, 5, 1)}
+    expected = app.json.dumps(value)
+
+    app.json = FastJSONProvider(app)
+    assert json.loads(app.json.dumps(value)) == json.loads(expected)
+    assert json.loads(expected)["at"] == "Wed, 01 May 2024 12:30:00 GMT"
 
 
 def test_parse_multi_columns():
@@ -29,3 +85,101 @@ def test_parse_multi_columns():
     assert parse_multi_columns(test_pipes) == ["col1", "col2", "col3"]
     assert parse_multi_columns(test_commas) == ["col1", "col2", "col3"]
     assert parse_multi_columns(test_single) == ["col1"]
+
+
+def test_get_stream_protocol():
+    assert get_stream_protocol({}, {}) == STREAM_PROTOCOL_FULL
+    assert get_stream_protocol({"stream_protocol": "compact"}, {}) == STREAM_PROTOCOL_COMPACT
+    assert get_stream_protocol({}, {"X-Stream-Protocol": "Compact"}) == STREAM_PROTOCOL_COMPACT
+    assert get_stream_protocol({"stream_protocol": "full"}, {"X-Stream-Protocol": "compact"}) == STREAM_PROTOCOL_FULL
+    assert get_stream_protocol({}, None) == STREAM_PROTOCOL_FULL
+
+
+def test_compact_stream_formatter(monkeypatch):
+    settings = SimpleNamespace(azure_ai=SimpleNamespace(agent_model_deployment_name="gpt-4o"))
+    monkeypatch.setitem(sys.modules, "backend.settings", SimpleNamespace(app_settings=settings))
+    history_metadata = {"conversation_id": "c1"}
+    formatter = CompactStreamFormatter(history_metadata)
+    citations = CitationSet()
+
+    first = formatter.format({"answer": "Hello"})
+    assert first["protocol"] == STREAM_PROTOCOL_COMPACT
+    assert first["model"] == "gpt-4o"
+    assert first["history_metadata"] == history_metadata
+    assert first["delta"] == "Hello"
+    assert "choices" not in first
+
+    citations.add("doc1", "https://a")
+    assert formatter.format({"answer": " [1]", "citations": citations}) == {
+        "delta": " [1]",
+        "citations": [{"title": "doc1", "url": "https://a"}],
+        "citation_offset": 0,
+    }
+    # citations already sent are not repeated
+    assert formatter.format({"answer": " world", "citations": citations}) == {"delta": " world"}
+    assert formatter.format({"citations": citations}) is None
+
+    citations.add("doc2", "https://b")
+    assert formatter.format({"citations": citations}) == {
+        "citations": [{"title": "doc2", "url": "https://b"}],
+        "citation_offset": 1,
+    }
+
+
+@pytest.mark.asyncio
+async def test_map_as_completed_bounds_concurrency_and_yields_in_completion_order():
+    running = 0
+    peak = 0
+
+    async def work(delay):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(delay)
+        running -= 1
+        if delay == 0.02:
+            raise ValueError("failed")
+        return delay * 100
+
+    results = [item async for item in map_as_completed(work, [0.05, 0.01, 0.02, 0.0], concurrency=2)]
+
+    assert peak == 2
+    assert [index for index, _, _ in results] == [1, 2, 3, 0]
+    assert results[0][1:] == (1.0, None)
+    assert isinstance(results[1][2], ValueError)
+
+
+@pytest.mark.asyncio
+async def test_map_as_completed_cancels_pending_work():
+    cancelled = []
+
+    async def work(delay):
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.append(delay)
+            raise
+        return delay
+
+    results = map_as_completed(work, [0.0, 10], concurrency=2)
+    assert (await results.__anext__())[0] == 0
+    await results.aclose()
+    await asyncio.sleep(0)
+    assert cancelled == [10]
+
+
+def test_compact_stream_formatter_resends_changed_history_metadata(monkeypatch):
+    settings = SimpleNamespace(azure_ai=SimpleNamespace(agent_model_deployment_name="gpt-4o"))
+    monkeypatch.setitem(sys.modules, "backend.settings", SimpleNamespace(app_settings=settings))
+    history_metadata = {"conversation_id": "c1", "title": "placeholder"}
+    formatter = CompactStreamFormatter(history_metadata)
+
+    assert formatter.format({"answer": "a"})["history_metadata"]["title"] == "placeholder"
+    assert formatter.format({"answer": "b"}) == {"delta": "b"}
+
+    history_metadata["title"] = "Generated title"
+    assert formatter.format({"answer": "c"}) == {
+        "delta": "c",
+        "history_metadata": {"conversation_id": "c1", "title": "Generated title"},
+    }
+    assert formatter.format({"answer": "d"}) == {"delta": "d"}